@@ -30,8 +30,17 @@ Routes
 ------
     transcribe: Setup and initiate an AWS transcription job
     upload: Get a pre-signed S3 URL to upload the audio sample to
+    multipart_upload: Start a multipart upload and get pre-signed URLs
+    for its parts, for uploading large audio samples in parallel
+    complete_multipart_upload: Complete a multipart upload
+    abort_multipart_upload: Abandon a multipart upload
     results: Get the results of the transcription formatted as .srt
 
+Event Handlers
+--------------
+    transcribe_job_state_changed: Record the state of a Transcribe job
+    when AWS Transcribe reports that it has changed
+
 Functions
 ---------
     run_transcription_job: 
@@ -42,22 +51,64 @@ Functions
 
     generate_srt_file:
 
+    get_content_hash:
+
+    get_audio_file_key:
+
+    audio_exists:
+
+    is_expired:
+
+    get_reusable_transcribe_job:
+
+    get_srt_cache_key:
+
+    get_cached_srt:
+
+    cache_srt:
+
+    get_client:
+
+    get_job_status_store:
+
 Attributes
 ----------
 S3_BUCKET_NAME (str): Name of the S3 bucket to generate pre-signed 
 URLs for
 EXPIRATION (int): The lifetime in seconds the pre-signed URL is 
 valid for
+SRT_CACHE_SIZE (int): The number of generated .srt files a warm lambda
+container keeps in memory
+MAX_POOL_CONNECTIONS (int): The size of the connection pool of each
+AWS client
+LONG_POLL_MAX_WAIT (int): The longest time in seconds a call to
+/results will wait for a job to finish
+MULTIPART_EXPIRATION (int): The lifetime in seconds of the pre-signed
+multipart upload part URLs
+MAX_MULTIPART_PARTS (int): The most parts a multipart upload can have
+CONTENT_CACHE_TTL (int): How long in seconds uploaded audio, and the
+Transcribe job and .srt generated from it, are reused for identical
+audio
+SRT_CUE_LIMITS (srtUtils.CueLimits): How transcripts are split into
+subtitles
+SRT_RENDER_REVISION (int): Revision of the subtitle rendering, part of
+the cache key of generated .srt files
 """
 
+import re
 import time
 import uuid
-import urllib
+import hashlib
+import datetime
+import urllib.request
+import collections
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-from chalicelib.srtUtils import getPhrasesFromTranscript, getPhraseText
+from chalicelib.srtUtils import iterPhrasesFromTranscript, renderSRT, CueLimits
+from chalicelib.jobStatus import s3JobStatusStore
 from chalice import Chalice, Response
 
 #TODO add number of speakers switch
@@ -69,8 +120,57 @@ app.debug = True
 S3_BUCKET_NAME = "autosubgen-iodboi"
 # The time in seconds that the pre-signed url is valid for, 2 mins is the default
 EXPIRATION = 120
+# The number of generated srt's kept in memory between invocations of a warm lambda
+SRT_CACHE_SIZE = 32
+# The number of pooled HTTP connections each AWS client keeps open
+MAX_POOL_CONNECTIONS = 25
+# The longest a /results request will wait for a job to finish, this must stay below the 29 second API Gateway timeout
+LONG_POLL_MAX_WAIT = 20
+# The time in seconds that pre-signed multipart upload part URLs are valid for, the parts of a long
+# recording are uploaded over a longer period than a single upload so these are valid for an hour
+MULTIPART_EXPIRATION = 3600
+# The S3 limit on the number of parts in a multipart upload
+MAX_MULTIPART_PARTS = 10000
+# Audio uploaded with its SHA-256 is stored under the hash and reused, along with its Transcribe job and .srt,
+# when the same audio is uploaded again within this many seconds. Transcribe deletes jobs after 90 days so
+# this must be shorter than that, expire '<hash>.mp3' objects with an S3 lifecycle rule of the same length
+CONTENT_CACHE_TTL = 30 * 24 * 3600
+# How transcripts are split into subtitles, changing these means cached .srt files are rendered again
+SRT_CUE_LIMITS = CueLimits()
+# Bump this when a change to srtUtils changes the subtitles generated from the same transcript and limits
+SRT_RENDER_REVISION = 1
 ##------------------------------------
 
+## A SHA-256 hex digest, and the S3 key of audio uploaded under its hash
+CONTENT_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+CONTENT_KEY_RE = re.compile(r"^([0-9a-f]{64})\.mp3$")
+
+## Settings shared by every AWS client. Clients are created once per lambda container (see get_client)
+## so their connection pools, and the keep-alive connections in them, are reused by warm invocations.
+## TCP keep-alive stops idle pooled connections being dropped between invocations
+BOTO_CONFIG = Config(max_pool_connections=MAX_POOL_CONNECTIONS,
+                     tcp_keepalive=True,
+                     connect_timeout=5,
+                     read_timeout=30,
+                     retries={"max_attempts": 5})
+
+## AWS clients created so far keyed by service name
+BOTO_CLIENTS = {}
+
+## In-process LRU cache of generated srt's keyed by get_srt_cache_key(), this survives
+## for as long as the lambda container stays warm
+SRT_CACHE = collections.OrderedDict()
+
+class transcriptionJobFailedError(Exception):
+    """
+    The Transcribe job finished in a failed state
+    """
+    pass
+
+## Store of the job states reported by Transcribe, created on first use (see get_job_status_store).
+## Set this to a chalicelib.jobStatus.localJobStatusStore() to run without AWS
+JOB_STATUS_STORE = None
+
 @app.route("/transcribe/{audio_file_uuid}", methods=["GET"])
 def transcribe(audio_file_uuid):
     """Setup and start a new AWS Transcribe job
@@ -84,6 +184,11 @@ def transcribe(audio_file_uuid):
     "status" value of "success" is returned to the user along with the
     name of the Transcribe job.
 
+    Audio uploaded under its hash ('<sha256>.mp3') gets a job named
+    after the hash, so if that job already exists and hasn't failed it
+    is reused rather than the same audio being transcribed again. A 
+    failed job is deleted and started again.
+
     If there is an error looking up the Transcribe job a HTTP 400
     json blob will be returned with a "status" value of "error". 
 
@@ -103,12 +208,28 @@ def transcribe(audio_file_uuid):
 
     timestamp = str(time.time()).split(".")[0]
 
+    content_key = CONTENT_KEY_RE.match(audio_file_uuid)
+
     ## Transcripton job name
-    transcription_job_name = "AutoSubGen_%s_%s"%(timestamp, uuid.uuid4().hex)
+    if content_key:
+        transcription_job_name = "AutoSubGen_%s"%(content_key.group(1))
+    else:
+        transcription_job_name = "AutoSubGen_%s_%s"%(timestamp, uuid.uuid4().hex)
 
-    ## Set up a new transcription job
+    ## Set up a new transcription job, or reuse the one for this audio
     try:
-        ret = run_transcribe_job(transcription_job_name, audio_file_uuid)
+        ret = None
+        if content_key:
+            ret = get_reusable_transcribe_job(transcription_job_name)
+
+        if ret is None:
+            try:
+                ret = run_transcribe_job(transcription_job_name, audio_file_uuid)
+            except ClientError as err:
+                ##Another request started the job for the same audio first, so use that one
+                if not content_key or err.response["Error"]["Code"] != "ConflictException":
+                    raise
+                ret = get_client("transcribe").get_transcription_job(TranscriptionJobName=transcription_job_name)
     except Exception as err:
         ##Log error and send HTTP 400 response
         print("[-] Unhandled Exception: %s"%(err))
@@ -117,6 +238,12 @@ def transcribe(audio_file_uuid):
                     body={'status': 'error',\
                     'response': "Error setting up transcription job %s"%(transcription_job_name)})
 
+    ## Record the initial state so /results requests can wait on it
+    try:
+        get_job_status_store().put(transcription_job_name, ret["TranscriptionJob"]["TranscriptionJobStatus"])
+    except Exception as err:
+        print("[-] Error recording the status of transcription job %s: %s"%(transcription_job_name, err))
+
     ## Success - HTTP 200 response
     return Response(status_code=200,\
                     headers={'Content-Type': 'application/json'},\
@@ -124,6 +251,28 @@ def transcribe(audio_file_uuid):
                     'response': ret["TranscriptionJob"]["TranscriptionJobName"]})
 
 
+@app.on_cw_event({"source": ["aws.transcribe"],
+                  "detail-type": ["Transcribe Job State Change"]})
+def transcribe_job_state_changed(event):
+    """Record the new state of a Transcribe job
+
+    AWS Transcribe emits an event whenever a job changes state, this
+    handler writes the new state of srtGen's jobs to the job status 
+    store so that any /results requests waiting on the job return as
+    soon as it has completed or failed.
+    """
+    transcription_job_name = event.detail["TranscriptionJobName"]
+
+    ## Ignore any other Transcribe jobs in the account
+    if not transcription_job_name.startswith("AutoSubGen_"):
+        return
+
+    state = event.detail["TranscriptionJobStatus"]
+    print("[+] Transcription job %s is now %s"%(transcription_job_name, state))
+
+    get_job_status_store().put(transcription_job_name, state, event.detail.get("FailureReason"))
+
+
 @app.route("/results/{transcription_job_name}", methods=["GET"])
 def results(transcription_job_name):
     """Check whether Transcribe job has completed & return .srt
@@ -134,10 +283,22 @@ def results(transcription_job_name):
     If the job has not completed a HTTP 200 json blob with a "status"
     of "running" will be returned. 
 
+    Clients can long-poll by adding a 'wait' query parameter with a 
+    number of seconds (at most LONG_POLL_MAX_WAIT), in which case the
+    request only returns "running" after waiting that long for the 
+    job to finish. It returns as soon as Transcribe reports that the 
+    job has completed or failed.
+
     If the job has completed then the Transcribe results are taken
     and used to generate a .srt file that is returned to the user in
     a HTTP 200 json blob with a "status" value of "success".
 
+    Generated .srt files are cached, first in memory and then as
+    '<transcription_job_name>.<render version>.srt' in the S3 bucket
+    (see get_srt_cache_key), so repeated requests for a completed job
+    are answered without contacting Transcribe or regenerating the
+    subtitles.
+
     If there is an error looking up the Transcribe job a HTTP 400
     json blob will be returned with a "status" value of "error". 
     You will most likely see an error when the name of the supplied 
@@ -145,17 +306,43 @@ def results(transcription_job_name):
 
     Route
     -----
-    url = /results/{transcription_job_name}
+    url = /results/{transcription_job_name}?wait={seconds}
 
     Returns
     -------
         Response() HTTP 200: On success
         Response() HTTP 400: On failure
     """
-    #todo save generated srt's to s3 for future retreval without regen
-
     print("results requested for %s"%(transcription_job_name))
 
+    ##Return a previously generated srt if there is one
+    srt_data = get_cached_srt(transcription_job_name)
+    if srt_data is not None:
+        return Response(status_code=200,\
+                    headers={'Content-Type': 'application/json'},\
+                    body={'status': 'success',\
+                    'response': srt_data})
+
+    ##Wait for the job to finish if the client asked to long-poll
+    query_params = app.current_request.query_params or {}
+    try:
+        wait = min(max(float(query_params.get("wait", 0)), 0), LONG_POLL_MAX_WAIT)
+    except ValueError:
+        wait = 0
+
+    status = None
+    if wait:
+        try:
+            status = get_job_status_store().wait_for_terminal_state(transcription_job_name, wait)
+        except Exception as err:
+            print("[-] Error waiting for the status of transcription job %s: %s"%(transcription_job_name, err))
+
+    if status and status["TranscriptionJobStatus"] == "FAILED":
+        return Response(status_code=400, \
+                    headers={'Content-Type': 'application/json'}, \
+                    body={'status': 'error',\
+                    'response': "Transcription job %s failed: %s"%(transcription_job_name, status["FailureReason"])})
+
     try:
         transcript_file_uri = check_if_transcribe_job_complete(transcription_job_name)
 
@@ -165,6 +352,13 @@ def results(transcription_job_name):
                     body={'status': 'running',
                     'response' :""})
 
+    except transcriptionJobFailedError as err:
+        print("[-] Transcription job %s failed: %s"%(transcription_job_name, err))
+        return Response(status_code=400, \
+                    headers={'Content-Type': 'application/json'}, \
+                    body={'status': 'error',\
+                    'response': "Transcription job %s failed: %s"%(transcription_job_name, err)})
+
     except Exception as err:
         print("[-] Error %s"%(err))
         return Response(status_code=400, \
@@ -172,13 +366,14 @@ def results(transcription_job_name):
                     body={'status': 'error',\
                     'response': "Error getting information about transcription job %s. Check the job name is valid."%(transcription_job_name)})
 
-    ##Download trnscription data 
-    transcript_data = download_transcript(transcript_file_uri)
+    ##Download trnscription data, streamed so the whole transcript is never held in memory
+    with download_transcript(transcript_file_uri, stream=True) as transcript_data:
 
-    ##Convert the transcription data into srt format
-    srt_data = generate_srt_file(transcript_data)
+        ##Convert the transcription data into srt format
+        srt_data = generate_srt_file(transcript_data)
 
-    ##ToDo - caching of srt's
+    ##Save the srt for future retrieval without regeneration
+    cache_srt(transcription_job_name, srt_data)
 
     return Response(status_code=200,\
                     headers={'Content-Type': 'application/json'},\
@@ -200,33 +395,54 @@ def upload():
     200 json blob with a "status" of "success" will be returned
     along with the pre-signed URL itself.
 
+    Clients can pass the SHA-256 of the audio as the 'sha256' query 
+    parameter, the audio is then uploaded as '<sha256>.mp3'. If that
+    object was uploaded within CONTENT_CACHE_TTL a HTTP 200 json blob 
+    with a "status" of "exists" is returned along with the key instead,
+    and the client can go straight to /transcribe.
+
     If there is an error looking up the Transcribe job a HTTP 400
     json blob will be returned with a "status" value of "error". 
 
     Route
     -----
-    url = /get_audio_upload_url
+    url = /get_audio_upload_url?sha256={hash}
 
     Returns
     -------
         Response() HTTP 200: On success
         Response() HTTP 400: On failure
     """
-    s3_client = boto3.client("s3")
+    try:
+        content_hash = get_content_hash()
+    except ValueError as e:
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': str(e)})
+
+    s3_client = get_client("s3")
 
-    # Generate a random S3 key name
-    audio_file_uuid = uuid.uuid4().hex
+    # Name the S3 key after the hash of the audio, or generate a random name
+    audio_file_key = get_audio_file_key(content_hash)
+
+    if content_hash and audio_exists(audio_file_key):
+        print("[+] Audio %s has been uploaded before"%(audio_file_key))
+        return Response(status_code=200,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'exists',
+                    'response': audio_file_key})
 
     fields = None
     conditions = None
-    print("**** %s.mp3"%(audio_file_uuid))
+    print("**** %s"%(audio_file_key))
     try:
 
         # Generate the presigned URL for put requests
         # presigned_url = s3_client.generate_presigned_url(ClientMethod='put_object',
         #     Params={"Bucket": S3_BUCKET_NAME, "Key": upload_key}, ExpiresIn=EXPIRATION)
         presigned_url = s3_client.generate_presigned_post(S3_BUCKET_NAME,
-                                            "%s.mp3"%(audio_file_uuid),
+                                            audio_file_key,
                                             Fields=fields,
                                             Conditions=conditions,
                                             ExpiresIn=EXPIRATION)
@@ -242,6 +458,165 @@ def upload():
                     body={'status': 'success',
                     'response': presigned_url})
 
+@app.route("/get_audio_multipart_upload_urls", methods=["GET"])
+def multipart_upload():
+    """Start a multipart upload and return pre-signed URLs for its parts
+
+    Large audio samples can be uploaded in parts, several at a time,
+    rather than in a single POST. This starts an S3 multipart upload
+    for a new randomly named key and returns a pre-signed URL for
+    each part, the client PUTs each part to its URL and then calls
+    /complete_audio_multipart_upload with the ETag of every part.
+
+    The number of parts is given by the 'parts' query parameter. As 
+    with /get_audio_upload_url the SHA-256 of the audio can be passed
+    as the 'sha256' query parameter, and if the audio has been uploaded
+    before a "status" of "exists" is returned along with its key.
+
+    If the request is successful a HTTP 200 json blob with a "status"
+    of "success" will be returned along with the key, the upload id 
+    and the list of part URLs.
+
+    If there is an error a HTTP 400 json blob will be returned with a
+    "status" value of "error". 
+
+    Route
+    -----
+    url = /get_audio_multipart_upload_urls?parts={count}&sha256={hash}
+
+    Returns
+    -------
+        Response() HTTP 200: On success
+        Response() HTTP 400: On failure
+    """
+    query_params = app.current_request.query_params or {}
+    try:
+        part_count = int(query_params.get("parts", 0))
+    except ValueError:
+        part_count = 0
+
+    if not 0 < part_count <= MAX_MULTIPART_PARTS:
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': "The number of parts must be between 1 and %d"%(MAX_MULTIPART_PARTS)})
+
+    try:
+        content_hash = get_content_hash()
+    except ValueError as e:
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': str(e)})
+
+    s3_client = get_client("s3")
+
+    # Name the S3 key after the hash of the audio, or generate a random name
+    audio_file_key = get_audio_file_key(content_hash)
+
+    if content_hash and audio_exists(audio_file_key):
+        print("[+] Audio %s has been uploaded before"%(audio_file_key))
+        return Response(status_code=200,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'exists',
+                    'response': audio_file_key})
+
+    try:
+        upload_id = s3_client.create_multipart_upload(Bucket=S3_BUCKET_NAME, Key=audio_file_key)["UploadId"]
+
+        part_urls = [s3_client.generate_presigned_url(ClientMethod="upload_part",
+                                                      Params={"Bucket": S3_BUCKET_NAME,
+                                                              "Key": audio_file_key,
+                                                              "UploadId": upload_id,
+                                                              "PartNumber": part_number},
+                                                      ExpiresIn=MULTIPART_EXPIRATION)
+                     for part_number in range(1, part_count + 1)]
+
+    except ClientError as e:
+        print("[-] Error: %s"%(e))
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': "Error starting multipart upload"})
+
+    return Response(status_code=200,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'success',
+                    'response': {"key": audio_file_key,
+                                 "upload_id": upload_id,
+                                 "urls": part_urls}})
+
+
+@app.route("/complete_audio_multipart_upload", methods=["POST"])
+def complete_multipart_upload():
+    """Complete a multipart upload started by /get_audio_multipart_upload_urls
+
+    The request body is a json object with the "key" and "upload_id"
+    returned when the upload was started, and "parts", a list of the
+    {"PartNumber", "ETag"} of each uploaded part.
+
+    Route
+    -----
+    url = /complete_audio_multipart_upload
+
+    Returns
+    -------
+        Response() HTTP 200: On success
+        Response() HTTP 400: On failure
+    """
+    body = app.current_request.json_body or {}
+
+    try:
+        get_client("s3").complete_multipart_upload(Bucket=S3_BUCKET_NAME,
+                                                   Key=body["key"],
+                                                   UploadId=body["upload_id"],
+                                                   MultipartUpload={"Parts": [{"PartNumber": int(part["PartNumber"]), "ETag": part["ETag"]}
+                                                                              for part in body["parts"]]})
+    except (ClientError, KeyError, TypeError, ValueError) as e:
+        print("[-] Error: %s"%(e))
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': "Error completing multipart upload"})
+
+    return Response(status_code=200,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'success',
+                    'response': body["key"]})
+
+
+@app.route("/abort_audio_multipart_upload", methods=["POST"])
+def abort_multipart_upload():
+    """Abandon a multipart upload started by /get_audio_multipart_upload_urls
+
+    The parts already uploaded are deleted. The request body is a json 
+    object with the "key" and "upload_id" of the upload.
+
+    Route
+    -----
+    url = /abort_audio_multipart_upload
+
+    Returns
+    -------
+        Response() HTTP 200: On success
+        Response() HTTP 400: On failure
+    """
+    body = app.current_request.json_body or {}
+
+    try:
+        get_client("s3").abort_multipart_upload(Bucket=S3_BUCKET_NAME, Key=body["key"], UploadId=body["upload_id"])
+    except (ClientError, KeyError, TypeError) as e:
+        print("[-] Error: %s"%(e))
+        return Response(status_code=400,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'error',
+                    'response': "Error aborting multipart upload"})
+
+    return Response(status_code=200,
+                    headers={'Content-Type': 'application/json'},
+                    body={'status': 'success',
+                    'response': body["key"]})
+
 ##Functions below are not directly callable via the 'api' 
 
 def run_transcribe_job(transcription_job_name, audio_file_uuid):
@@ -263,7 +638,7 @@ def run_transcribe_job(transcription_job_name, audio_file_uuid):
     """
     print("[+] Starting AWS Transcribe job")
 
-    transcribe_client = boto3.client("transcribe")
+    transcribe_client = get_client("transcribe")
 
     print("s3://%s/%s"%(S3_BUCKET_NAME, audio_file_uuid))
 
@@ -273,12 +648,45 @@ def run_transcribe_job(transcription_job_name, audio_file_uuid):
                                                              Media={"MediaFileUri": "s3://%s/%s"%(S3_BUCKET_NAME, audio_file_uuid)})
     except ClientError as err:
         print("[-] ERROR: %s"%(err))
-        reaise
+        raise
 
     print("[+] Transcription job running .....")
     return response
 
 
+def get_reusable_transcribe_job(transcription_job_name):
+    """Look up an existing Transcribe job that can be reused
+
+    Used for jobs named after the hash of their audio. A job that is
+    queued, running or completed is reused, a failed job is deleted
+    so that it can be started again under the same name.
+
+    Returns
+    -------
+        None - There is no job that can be reused
+        Response() object: The job, in the same form as the response
+        of run_transcribe_job
+    """
+    transcribe_client = get_client("transcribe")
+
+    try:
+        response = transcribe_client.get_transcription_job(TranscriptionJobName=transcription_job_name)
+
+    except ClientError as err:
+        ##Transcribe reports a job that doesn't exist as a BadRequestException
+        if err.response["Error"]["Code"] != "BadRequestException":
+            print("[-] Error looking up transcription job %s: %s"%(transcription_job_name, err))
+        return None
+
+    if response["TranscriptionJob"]["TranscriptionJobStatus"] == "FAILED":
+        print("[+] Deleting failed transcription job %s so it can be run again"%(transcription_job_name))
+        transcribe_client.delete_transcription_job(TranscriptionJobName=transcription_job_name)
+        return None
+
+    print("[+] Reusing transcription job %s"%(transcription_job_name))
+    return response
+
+
 def check_if_transcribe_job_complete(transcription_job_name):
     """Check if the specified AWS Transcribe job has completed yet
 
@@ -291,11 +699,18 @@ def check_if_transcribe_job_complete(transcription_job_name):
         transcript_file_uri (str): URI pointing to the raw results of 
         the Transcribe job
 
+    Raises
+    ------
+        transcriptionJobFailedError - The Transcribe job failed
+
     """
-    transcribe_client = boto3.client("transcribe")
+    transcribe_client = get_client("transcribe")
 
     response = transcribe_client.get_transcription_job(TranscriptionJobName=transcription_job_name )
 
+    if response["TranscriptionJob"]["TranscriptionJobStatus"] == "FAILED":
+        raise transcriptionJobFailedError(response["TranscriptionJob"].get("FailureReason", "unknown reason"))
+
     if 'TranscriptFileUri' in response["TranscriptionJob"]["Transcript"]:
         print("\n[+] Transcription complete!")
 
@@ -307,18 +722,29 @@ def check_if_transcribe_job_complete(transcription_job_name):
         return None
 
 
-def download_transcript(transcript_file_uri):
+def download_transcript(transcript_file_uri, stream=False):
     """Download and decode Transcribe job results
 
     Download the Transcribe Job results from the 
     supplied URL and format them as a string
 
+    Args
+    ----
+    stream (bool): Return the open HTTP response rather than the
+    decoded data so the transcript can be parsed incrementally
+    (default is False)
+
     Returns
     -------
-    transcript_data (str): The transcription data
+    transcript_data (str): The transcription data, or a file-like
+    object when 'stream' is set
     """
     print("[+] Downloading completed transcript.....")
     response = urllib.request.urlopen(transcript_file_uri)
+
+    if stream:
+        return response
+
     transcript_data = response.read().decode("utf-8")
 
     return transcript_data
@@ -328,39 +754,224 @@ def generate_srt_file(transcript_data):
         """Take an AWS Transcript results and format it as .srt subtitles
         
         Now take the transcript file and reformat it into an .srt file for
-        use in video players. This functions code was mostly taken 
-        from the module srtUtils: 
-        (https://github.com/aws-samples/aws-transcribe-captioning-tools/blob/master/src/srtUtils.py)
+        use in video players. The rendering is done by srtUtils.renderSRT
+        which shares its cue renderer with srtUtils.writeSRT (originally
+        from https://github.com/aws-samples/aws-transcribe-captioning-tools/blob/master/src/srtUtils.py)
         
+        Args
+        ----
+        transcript_data (str or file-like): The Transcribe results, a
+        file-like object is parsed incrementally as it is read
+
         Returns
         -------
         srt_data (str): String representing the contents of the srt subtitle file
         """
-        srt_data = ""
-
-        ##Modified from the standard strUtil functions to not require a file to write to  - TODO URL
-
-        # Create the SRT File for the original transcript and write it out.
-        phrases = getPhrasesFromTranscript( transcript_data )
-
-        x = 1
-        for phrase in phrases:
-
-            # determine how many words are in the phrase
-            length = len(phrase["words"])
-            
-            # write out the phrase number
-            srt_data += str(x) + "\n"
-            x += 1
-            
-            # write out the start and end time
-            srt_data +=  phrase["start_time"] + " --> " + phrase["end_time"] + "\n"
-                        
-            # write out the full phase.  Use spacing if it is a word, or punctuation without spacing
-            out = getPhraseText( phrase )
-
-            # write out the srt file
-            srt_data += out + "\n\n"
-            
+        # Create the SRT data for the original transcript, each cue is
+        # rendered as soon as its phrase has been built
+        phrases = iterPhrasesFromTranscript( transcript_data, limits=SRT_CUE_LIMITS )
+
+        srt_data = renderSRT( phrases )
+
+        return srt_data
+
+
+def get_content_hash():
+    """Return the 'sha256' query parameter of the current request
+
+    Returns
+    -------
+        None - The parameter wasn't given
+        content_hash (str): The SHA-256 hex digest of the audio, in 
+        lower case
+
+    Raises
+    ------
+        ValueError - The parameter isn't a SHA-256 hex digest
+    """
+    query_params = app.current_request.query_params or {}
+
+    content_hash = query_params.get("sha256")
+    if content_hash is None:
+        return None
+
+    content_hash = content_hash.lower()
+    if not CONTENT_HASH_RE.match(content_hash):
+        raise ValueError("The sha256 parameter must be a SHA-256 hex digest")
+
+    return content_hash
+
+
+def get_audio_file_key(content_hash=None):
+    """Return the S3 key to upload audio to, '<content_hash>.mp3' or
+    a randomly generated name if there is no hash
+    """
+    return "%s.mp3"%(content_hash or uuid.uuid4().hex)
+
+
+def audio_exists(audio_file_key):
+    """Check if audio was uploaded to the S3 bucket under this key
+    within CONTENT_CACHE_TTL
+
+    Errors are logged and treated as the audio not existing, it is 
+    then just uploaded again.
+
+    Returns
+    -------
+        bool: True if the audio can be reused
+    """
+    try:
+        response = get_client("s3").head_object(Bucket=S3_BUCKET_NAME, Key=audio_file_key)
+
+    except ClientError as err:
+        if err.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            print("[-] Error looking up %s in S3: %s"%(audio_file_key, err))
+        return False
+
+    return not is_expired(response["LastModified"])
+
+
+def is_expired(last_modified):
+    """Check if an S3 object last modified at 'last_modified' (a 
+    datetime) is older than CONTENT_CACHE_TTL
+    """
+    age = datetime.datetime.now(datetime.timezone.utc) - last_modified
+
+    return age.total_seconds() > CONTENT_CACHE_TTL
+
+
+def get_srt_cache_key(transcription_job_name):
+    """Return the key a generated .srt for a Transcribe job is cached under
+
+    Content addressed jobs are reused for as long as CONTENT_CACHE_TTL,
+    so the key is '<transcription_job_name>.<render version>.srt' where
+    the version is a hash of SRT_RENDER_REVISION and SRT_CUE_LIMITS. A
+    deploy that changes how subtitles are rendered then misses the 
+    cache rather than serving .srt files rendered the old way.
+    """
+    settings = [SRT_RENDER_REVISION] + [(name, getattr(SRT_CUE_LIMITS, name)) for name in CueLimits.__slots__]
+    render_version = hashlib.sha256(repr(settings).encode("utf-8")).hexdigest()[:12]
+
+    return "%s.%s.srt"%(transcription_job_name, render_version)
+
+
+def get_cached_srt(transcription_job_name):
+    """Look up a previously generated .srt for a Transcribe job
+
+    The in-memory cache of this lambda container is checked first,
+    then the object in the S3 bucket named by get_srt_cache_key().
+    An S3 hit is added to the in-memory cache. A .srt written to S3 
+    more than CONTENT_CACHE_TTL ago is treated as a miss and is 
+    generated again, as the job it came from may be reused for new
+    uploads of the same audio.
+
+    Returns
+    -------
+        None - No .srt has been generated for this job yet
+        srt_data (str): The contents of the cached .srt subtitle file
+    """
+    cache_key = get_srt_cache_key(transcription_job_name)
+
+    srt_data = SRT_CACHE.get(cache_key)
+    if srt_data is not None:
+        SRT_CACHE.move_to_end(cache_key)
+        print("[+] Using in-memory cached srt for %s"%(transcription_job_name))
         return srt_data
 
+    s3_client = get_client("s3")
+
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=cache_key)
+        srt_data = response["Body"].read().decode("utf-8")
+
+    except ClientError as err:
+        ##A missing object is the normal cache miss, anything else is logged and treated as a miss
+        if err.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            print("[-] Error reading cached srt from S3: %s"%(err))
+        return None
+
+    if is_expired(response["LastModified"]):
+        print("[+] S3 cached srt for %s has expired"%(transcription_job_name))
+        return None
+
+    print("[+] Using S3 cached srt for %s"%(transcription_job_name))
+    remember_srt(cache_key, srt_data)
+
+    return srt_data
+
+
+def cache_srt(transcription_job_name, srt_data):
+    """Save a generated .srt for future retrieval without regeneration
+
+    The .srt is kept in the in-memory cache of this lambda container 
+    and written to the S3 bucket, both under get_srt_cache_key().
+    Failing to write to S3 is not fatal, the .srt will just be 
+    regenerated the next time it is requested.
+    """
+    cache_key = get_srt_cache_key(transcription_job_name)
+    remember_srt(cache_key, srt_data)
+
+    s3_client = get_client("s3")
+
+    try:
+        s3_client.put_object(Bucket=S3_BUCKET_NAME,
+                             Key=cache_key,
+                             Body=srt_data.encode("utf-8"),
+                             ContentType="application/x-subrip")
+    except ClientError as err:
+        print("[-] Error saving generated srt to S3: %s"%(err))
+
+
+def remember_srt(cache_key, srt_data):
+    """Add a .srt to the in-memory cache, evicting the least recently
+    used entries beyond SRT_CACHE_SIZE
+    """
+    SRT_CACHE[cache_key] = srt_data
+    SRT_CACHE.move_to_end(cache_key)
+
+    while len(SRT_CACHE) > SRT_CACHE_SIZE:
+        SRT_CACHE.popitem(last=False)
+
+
+def get_client(service_name):
+    """Return the shared AWS client for a service
+
+    Clients are created lazily the first time they are needed and
+    then kept for the lifetime of the lambda container, so warm 
+    invocations skip client construction, credential resolution and
+    the TLS handshake of a new connection.
+
+    Args
+    ----
+    service_name (str): The name of the AWS service e.g. "s3"
+
+    Returns
+    -------
+        botocore.client.BaseClient: The client for the service
+    """
+    client = BOTO_CLIENTS.get(service_name)
+
+    if client is None:
+        client = boto3.client(service_name, config=BOTO_CONFIG)
+        BOTO_CLIENTS[service_name] = client
+
+    return client
+
+
+def get_job_status_store():
+    """Return the store that Transcribe job states are recorded in
+
+    By default this is an S3 backed store using the S3_BUCKET_NAME
+    bucket, it is created the first time it is needed.
+
+    Returns
+    -------
+        chalicelib.jobStatus.jobStatusStore: The job status store
+    """
+    global JOB_STATUS_STORE
+
+    if JOB_STATUS_STORE is None:
+        JOB_STATUS_STORE = s3JobStatusStore(get_client("s3"), S3_BUCKET_NAME)
+
+    return JOB_STATUS_STORE
+
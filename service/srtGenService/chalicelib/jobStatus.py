@@ -0,0 +1,183 @@
+#######################################################################
+##
+## Name: jobStatus.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Transcribe job status stores
+
+The srtGen service records the state of each Transcribe job when AWS
+Transcribe reports that the job has changed state, so that the
+/results route can wait for a job to finish instead of clients
+having to repeatedly poll Transcribe.
+
+Classes
+-------
+
+    * jobStatusStore - Base class defining the interface of a store
+    * s3JobStatusStore - Stores each job status as a small json object in S3
+    * localJobStatusStore - In-memory stand-in for running and testing offline
+
+Attributes
+----------
+TERMINAL_STATES (tuple): The Transcribe job states after which a job
+will not change state again
+"""
+
+import abc
+import json
+import time
+import threading
+
+from botocore.exceptions import ClientError
+
+TERMINAL_STATES = ("COMPLETED", "FAILED")
+
+
+class jobStatusStore(abc.ABC):
+    """
+    Interface of a Transcribe job status store. Subclasses implement
+    get() and put(), wait_for_terminal_state() can be overriden where
+    the backend is able to notify waiters directly.
+
+    Methods
+    -------
+    get(transcription_job_name)
+        Return the recorded status of a job, None if nothing has been recorded
+
+    put(transcription_job_name, state, failure_reason)
+        Record a new state for a job
+
+    wait_for_terminal_state(transcription_job_name, timeout)
+        Block until a job has completed or failed, or the timeout expires
+    """
+
+    ##How often to check the store for a change while waiting, in seconds
+    poll_interval = 1.0
+
+    @abc.abstractmethod
+    def get(self, transcription_job_name):
+        """
+        Return the recorded status of a job, None if nothing has been recorded
+        """
+
+    @abc.abstractmethod
+    def put(self, transcription_job_name, state, failure_reason=None):
+        """
+        Record a new state for a job and return the status stored
+        """
+
+    def make_status(self, transcription_job_name, state, failure_reason=None):
+        """
+        Build the status record stored for a job
+        """
+        return {"TranscriptionJobName": transcription_job_name,
+                "TranscriptionJobStatus": state,
+                "FailureReason": failure_reason,
+                "UpdatedAt": time.time()}
+
+    def wait_for_terminal_state(self, transcription_job_name, timeout):
+        """
+        Wait until the recorded state of a job is COMPLETED or FAILED
+
+        By default this checks the store every poll_interval seconds.
+        The caller keeps running, and a Lambda is billed, for the whole
+        wait: what waiting saves is the client's requests and the 
+        Transcribe status checks, not compute time.
+
+        Args
+        ----
+        transcription_job_name (str): The name of the Transcribe job
+        timeout (float): The maximum time in seconds to wait
+
+        Returns
+        -------
+            dict: The last status recorded for the job, None if no status
+            has been recorded
+        """
+        deadline = time.time() + timeout
+
+        while True:
+            status = self.get(transcription_job_name)
+
+            remaining = deadline - time.time()
+            if (status and status["TranscriptionJobStatus"] in TERMINAL_STATES) or remaining <= 0:
+                return status
+
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class s3JobStatusStore(jobStatusStore):
+    """
+    Job status store that keeps each status as the json object
+    'status/<transcription_job_name>.json' in an S3 bucket. S3 can't
+    notify waiters, so wait_for_terminal_state() reads the object every
+    poll_interval seconds.
+    """
+
+    def __init__(self, s3_client, s3_bucket_name, prefix="status/"):
+        """
+        Args
+        ----
+        s3_client (botocore.client.BaseClient): The S3 client to use
+        s3_bucket_name (str): The bucket to write the status objects to
+        prefix (str): The key prefix of the status objects (default is 'status/')
+        """
+        self.s3_client = s3_client
+        self.s3_bucket_name = s3_bucket_name
+        self.prefix = prefix
+
+    def get(self, transcription_job_name):
+        try:
+            response = self.s3_client.get_object(Bucket=self.s3_bucket_name, Key="%s%s.json"%(self.prefix, transcription_job_name))
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+
+        return json.loads(response["Body"].read().decode("utf-8"))
+
+    def put(self, transcription_job_name, state, failure_reason=None):
+        status = self.make_status(transcription_job_name, state, failure_reason)
+
+        self.s3_client.put_object(Bucket=self.s3_bucket_name,
+                                  Key="%s%s.json"%(self.prefix, transcription_job_name),
+                                  Body=json.dumps(status).encode("utf-8"),
+                                  ContentType="application/json")
+        return status
+
+
+class localJobStatusStore(jobStatusStore):
+    """
+    In-memory job status store for running the service locally (e.g.
+    'chalice local') or in tests without any AWS resources. Waiters
+    are woken up as soon as put() records a new state.
+    """
+
+    def __init__(self):
+        self.statuses = {}
+        self.condition = threading.Condition()
+
+    def get(self, transcription_job_name):
+        with self.condition:
+            return self.statuses.get(transcription_job_name)
+
+    def put(self, transcription_job_name, state, failure_reason=None):
+        status = self.make_status(transcription_job_name, state, failure_reason)
+
+        with self.condition:
+            self.statuses[transcription_job_name] = status
+            self.condition.notify_all()
+
+        return status
+
+    def wait_for_terminal_state(self, transcription_job_name, timeout):
+        def is_terminal():
+            status = self.statuses.get(transcription_job_name)
+            return status is not None and status["TranscriptionJobStatus"] in TERMINAL_STATES
+
+        with self.condition:
+            self.condition.wait_for(is_terminal, timeout)
+            return self.statuses.get(transcription_job_name)
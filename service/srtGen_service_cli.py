@@ -25,6 +25,10 @@ reformat the results from that subscription to but in .srt format.
 Finally the client downloads the subtitle file generated by the 
 service.
 
+The SHA-256 of the extracted audio is sent with the upload requests,
+if the service already has the same audio the upload is skipped and 
+the earlier Transcribe job and its subtitles are reused.
+
 This script requires the boto3 modules to be installed but does not 
 require any local AWS credentials as boto is only used for uploading
 the mp3 file via a pre-signed S3 URL obtained from the service.
@@ -43,6 +47,9 @@ There are a number of commandline options to control the script's execution:
 * `-o` - The file that the generatwed subtitles should be saved to, if this is left blank the contents of the .srt is just printed to the screen
 * `-b` - Define the bitrate used to extract the audio from the video source (default is 48000 bps)
 * `-m` - Path to save the extracted mp3 audio to, if no path is supplied a temporary file is used and deleted upon completion
+* `-d` - The maximum time in seconds to wait for the Transcribe job to finish (default is 6 hours)
+* `--part-size` - Audio larger than this many MB is uploaded in parts of this size, in parallel (default is 8)
+* `--upload-concurrency` - Number of parts to upload in parallel (default is 4)
 * `-v` - Verbose output
 
 Classes
@@ -58,6 +65,10 @@ Attributes
 ----------
 MODULE_LOCATION (str): This is a dynamically generated absolute path showing where the 
 executing script is located in the filesystem.
+LONG_POLL_WAIT (int): How long in seconds the service is asked to wait for the
+transcription job to finish on each request for the results
+HTTP_RETRIES (int): How many times a failed request to the service or S3
+is retried, with exponential backoff
 """
 
 import os
@@ -71,16 +82,34 @@ import configparser
 
 import boto3
 from botocore.exceptions import ClientError, ProfileNotFound
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from jobPoller import jobPoller, jobFailedError, jobTimeoutError, RUNNING, COMPLETED, FAILED, DEFAULT_DEADLINE
+from transferUtils import multipartFormEncoder, upload_presigned_parts, transferProgress, hashingReader, hash_file, DEFAULT_PART_SIZE, \
+    HASH_CHUNK_SIZE
 
 ##The absolute path location of this file
 MODULE_LOCATION = os.path.abspath(os.path.dirname(__file__))
 
+##How long the service should hold each results request open waiting for the job to finish
+LONG_POLL_WAIT = 20
+
+##Retries for connection errors and 5xx responses, idempotent requests only (so not the presigned POST)
+HTTP_RETRIES = 5
+
 class srtGenError(Exception):
     """
     Generic exception wrapper
     """
     pass
 
+class multipartNotSupportedError(srtGenError):
+    """
+    The service doesn't have the multipart upload routes
+    """
+    pass
+
 class srtGen(object):
     """
     A class to wrap all the functionality required to extract audio, 
@@ -97,9 +126,19 @@ class srtGen(object):
         Request a pre-signed S3 URL from the transcription service and
         use that URL to upload the extracted mp3 audio to S3 
 
+    upload_in_parts()
+        Upload the extracted mp3 audio to S3 in parallel parts using
+        pre-signed multipart upload URLs from the transcription service
+
+    audio_already_uploaded()
+        Check if the service reported that it already has the audio
+
     start_transcription()
         Configures and runs an AWS Transcribe job on the uploaded mp3
 
+    check_results()
+        Ask the service for the results of the transcription job
+
     download_srt()
         Wait until the transcription job is complete and download the
         generated .srt file
@@ -108,15 +147,34 @@ class srtGen(object):
         Save and/or display the download .srt subtitle file
     """
 
-    def __init__(self, config_filepath=None):
+    def __init__(self, config_filepath=None, deadline=DEFAULT_DEADLINE, part_size=DEFAULT_PART_SIZE, upload_concurrency=4):
         """
         Args
         ----
         config_filepath (str): Filepath of configuration file to use 
         (default is 'MODULE_LOCATION/config.ini')
+        deadline (float): The maximum time in seconds to wait for the
+        Transcribe job to finish (default is 6 hours)
+        part_size (int): Audio larger than this many bytes is uploaded
+        in parts of this size, in parallel (default is 8MB)
+        upload_concurrency (int): Number of parts to upload in parallel
+        (default is 4)
         """
 
         self.timestamp = str(time.time()).split(".")[0]
+        self.deadline = deadline
+        self.part_size = part_size
+        self.upload_concurrency = upload_concurrency
+
+        ##SHA-256 of the extracted audio, found as it is extracted
+        self.audio_hash = None
+
+        ##One session for every request so connections to the service and S3 are reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(upload_concurrency, 10),
+                              max_retries=Retry(total=HTTP_RETRIES, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504)))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         ##Read config file - if non given assume a file called "config.ini" in the same dir as this script
         if not config_filepath:
@@ -175,6 +233,8 @@ class srtGen(object):
         ##Bitrate to use for audio extraction
         self.bitrate = bitrate
 
+        self.audio_hash = None
+
         ##Location to write srt file to
         if srt_filepath:
             self.srt_filepath = os.path.expandvars(os.path.expanduser(srt_filepath))
@@ -217,6 +277,10 @@ class srtGen(object):
         you can specify a particular ffmpeg binary to use by setting
         the FFMPEG_BIN_PATH variable at the top of this script.
 
+        ffmpeg writes the audio to a pipe, which is hashed as it is 
+        written to the file, so the audio doesn't need to be read again
+        to find the hash sent with the upload request.
+
         Returns
         -------
             bool: True on success
@@ -230,13 +294,19 @@ class srtGen(object):
         
         print("[+] Writing extracted audio to: %s" % (self.audio_filepath))
 
-        extract_cmd = [self.ffmpeg_bin_path, "-y", "-loglevel", "error", "-stats", "-i", self.video_filepath, "-f", "mp3", "-ab", str(self.bitrate), "-vn", self.audio_filepath]
+        extract_cmd = [self.ffmpeg_bin_path, "-y", "-loglevel", "error", "-stats", "-i", self.video_filepath, "-f", "mp3", "-ab", str(self.bitrate), "-vn", "pipe:1"]
 
-        try:
-            subprocess.run(extract_cmd, capture_output=False, check=True)
-        except subprocess.CalledProcessError as err:
+        with subprocess.Popen(extract_cmd, stdout=subprocess.PIPE) as process, open(self.audio_filepath, "wb") as f:
+            reader = hashingReader(process.stdout)
+            for chunk in iter(lambda: reader.read(HASH_CHUNK_SIZE), b""):
+                f.write(chunk)
+
+        if process.returncode != 0:
+            err = subprocess.CalledProcessError(process.returncode, extract_cmd)
             print("[-] Error extracting audio: %s"%(err))
-            raise
+            raise err
+
+        self.audio_hash = reader.hexdigest()
 
         return True
 
@@ -247,6 +317,15 @@ class srtGen(object):
         that allows us to upload the audio file for subsequent 
         transcription while also bypassing the 10MB upload limite of 
         the AWS API Gateway
+
+        Audio larger than one part is uploaded in parallel parts (see
+        upload_in_parts), falling back to a single upload only if the 
+        service doesn't have the multipart upload routes. A single upload is
+        streamed from the file so the request is never held in memory.
+
+        The SHA-256 of the audio is sent with the request, if the 
+        service reports that it already has the audio nothing is 
+        uploaded.
         
         Returns
         -------
@@ -262,11 +341,22 @@ class srtGen(object):
             srtGenError: There was an error parsing or processing the 
             request for a pre-sgned S3 URL
         """
+        ##The hash is found during extraction, the file only needs reading again if it wasn't extracted here
+        if self.audio_hash is None:
+            print("[+] Hashing extracted audio")
+            self.audio_hash = hash_file(self.audio_filepath)
+
+        if os.path.getsize(self.audio_filepath) > self.part_size:
+            try:
+                return self.upload_in_parts()
+            except multipartNotSupportedError as err:
+                print("[-] The service does not support multipart uploads (%s), uploading in one request instead"%(err))
+
         print("[+] Requesting upload URL")
 
         # Retrieve a presigned S3 POST URL
         try:
-            response = requests.get("%s/get_audio_upload_url" % (self.api_url))
+            response = self.session.get("%s/get_audio_upload_url" % (self.api_url), params={"sha256": self.audio_hash})
             #print(response.json)
             response.raise_for_status()
 
@@ -283,6 +373,9 @@ class srtGen(object):
             print("[-] Error in response from service: %s"%(response.json()["response"]))
             raise srtGenError("Error in response from service: %s"%(response.json()["response"]))
 
+        if self.audio_already_uploaded(response):
+            return True
+
         print("[+] Upload URL received")
 
         try:
@@ -295,17 +388,16 @@ class srtGen(object):
             self.audio_uuid_filename = s3_data['fields']['key']
 
         except Exception as err:
-            print("[-] Error parsing the response from the service: %s"(err))
-            raise srtGenError("Error parsing the response from the service: %s"(err))
+            print("[-] Error parsing the response from the service: %s"%(err))
+            raise srtGenError("Error parsing the response from the service: %s"%(err))
 
         print("[+] Uploading extracted audio to %s"%(self.audio_uuid_filename))
         ## now upload the generted audiofile to the temporary S3 URL and name the file as the UUID
-        with open("%s"%(self.audio_filepath), 'rb') as f:
-            files = {'file': ("%s" % (self.audio_uuid_filename), f)}
+        progress = transferProgress(os.path.getsize(self.audio_filepath))
+        with multipartFormEncoder(s3_data['fields'], 'file', self.audio_uuid_filename, self.audio_filepath, progress=progress) as body:
 
             try:
-                http_response = requests.post(self.s3_presigned_url, data=s3_data['fields'], files=files)
-                #http_response = requests.put(self.s3_presigned_url, data=f)
+                http_response = self.session.post(self.s3_presigned_url, data=body, headers={"Content-Type": body.content_type})
                 http_response.raise_for_status()
 
             except requests.exceptions.RequestException as err:
@@ -316,6 +408,9 @@ class srtGen(object):
                 print("[-] Unexpected error: %s"%(err))
                 raise
 
+            finally:
+                progress.finish()
+
         # If successful, returns HTTP status code 204 http_response.status_code
         if http_response.status_code == 204:
             print("[+] Upload successful")
@@ -326,6 +421,96 @@ class srtGen(object):
         return True
 
 
+    def upload_in_parts(self):
+        """
+        Upload the audio file to S3 as a multipart upload. The service 
+        starts the upload and returns a pre-signed URL for each part,
+        the parts are uploaded in parallel straight to S3 and the 
+        service is then asked to complete the upload. If any part fails
+        the upload is aborted.
+
+        Returns
+        -------
+            bool: True on Success
+
+        Raises
+        ------
+            requests.exceptions.RequestException: There was an error 
+            talking to the service or uploading a part
+
+            multipartNotSupportedError: The service doesn't have the 
+            multipart upload routes
+
+            srtGenError: The service returned an error
+        """
+        size = os.path.getsize(self.audio_filepath)
+        part_count = (size + self.part_size - 1) // self.part_size
+
+        print("[+] Requesting %d multipart upload URLs"%(part_count))
+
+        response = self.session.get("%s/get_audio_multipart_upload_urls" % (self.api_url),
+                                    params={"parts": part_count, "sha256": self.audio_hash})
+
+        ##Only a service deployed before multipart uploads were added is worth retrying as a single upload
+        if response.status_code in (404, 405):
+            raise multipartNotSupportedError("HTTP %d from get_audio_multipart_upload_urls"%(response.status_code))
+
+        response.raise_for_status()
+
+        if response.json()["status"] == "error":
+            print("[-] Error in response from service: %s"%(response.json()["response"]))
+            raise srtGenError("Error in response from service: %s"%(response.json()["response"]))
+
+        if self.audio_already_uploaded(response):
+            return True
+
+        upload = response.json()["response"]
+        self.audio_uuid_filename = upload["key"]
+
+        print("[+] Uploading extracted audio to %s in %d parts"%(self.audio_uuid_filename, part_count))
+
+        progress = transferProgress(size)
+        try:
+            parts = upload_presigned_parts(self.session, upload["urls"], self.audio_filepath, self.part_size,
+                                           max_concurrency=self.upload_concurrency, progress=progress)
+            progress.finish()
+
+            response = self.session.post("%s/complete_audio_multipart_upload" % (self.api_url),
+                                         json={"key": upload["key"], "upload_id": upload["upload_id"], "parts": parts})
+            response.raise_for_status()
+
+        except Exception as err:
+            print("\n[-] Error uploading audio to the returned S3 URLs: %s"%(err))
+            try:
+                self.session.post("%s/abort_audio_multipart_upload" % (self.api_url),
+                                  json={"key": upload["key"], "upload_id": upload["upload_id"]})
+            except requests.exceptions.RequestException:
+                pass
+            raise srtGenError("Error uploading audio to the returned S3 URLs: %s"%(err))
+
+        print("[+] Upload successful")
+
+        return True
+
+
+    def audio_already_uploaded(self, response):
+        """
+        Check whether the service replied to a request for upload URLs
+        that it already has this audio, and if so use the key it gave
+
+        Returns
+        -------
+            bool: True if the upload can be skipped
+        """
+        if response.json()["status"] != "exists":
+            return False
+
+        self.audio_uuid_filename = response.json()["response"]
+        print("[+] The service already has this audio as %s, skipping the upload"%(self.audio_uuid_filename))
+
+        return True
+
+
     def start_transcription(self):
         """
         Configure and start an AWS Transcribe job using the uploaded
@@ -345,7 +530,7 @@ class srtGen(object):
         ## Pass the UUID to the lambda which will then setup & run the Transcription job using the
         ## previously updated file
         try:
-            response = requests.get("%s/transcribe/%s" % (self.api_url, self.audio_uuid_filename))
+            response = self.session.get("%s/transcribe/%s" % (self.api_url, self.audio_uuid_filename))
         
         except requests.exceptions.RequestException as err:
             print("[-] Error setting up transcription job. Check the lambda has the correct Transcribe permissions. %s"%(err))
@@ -367,58 +552,83 @@ class srtGen(object):
         return True
 
 
-    def download_srt(self):
+    def check_results(self):
         """
-        Download the .srt formatted subtitle file from the service
+        Ask the service for the results of the transcription job. The
+        request asks the service to long-poll, i.e. to only reply once
+        the job has finished or LONG_POLL_WAIT seconds have passed.
 
         Returns
         -------
-            bool: True on success
+            tuple: (state, result) where state is one of the jobPoller
+            states RUNNING, COMPLETED or FAILED, and result is the .srt
+            data when COMPLETED or the error from the service when FAILED
 
         Raises
         ------
             requests.exceptions.RequestException - There was an error 
-            starting the Transcribe job
+            contacting the service
         """
-        print("[+] Waiting for Transcribe job %s to complete: "%(self.transcription_job_name), end="")
+        try:
+            response = self.session.get("%s/results/%s" % (self.api_url, self.transcription_job_name),
+                                    params={"wait": LONG_POLL_WAIT},
+                                    timeout=LONG_POLL_WAIT + 30)
+            #print("%s"%(response.text))
 
-        error_count = 0
-        while True:
-            try:
-                response = requests.get("%s/results/%s" % (self.api_url, self.transcription_job_name))
-                #print("%s"%(response.text))
+        except requests.exceptions.RequestException as err:
+            print("[-] Error getting results from the service. Ensure you have your lambda at %s set up correctly."%(self.api_url))
+            raise
 
-                if response.json()["status"] == "running":
-                    #print("Job %s still running"%(self.transcription_job_name))
-                    sys.stdout.write(".")
-                    sys.stdout.flush()
-                    time.sleep(10.0)
-                    continue
+        if response.json()["status"] == "running":
+            return RUNNING, None
 
-                elif response.json()["status"] == "error":
-                    print("Error with Transcription Job %s"%(response.json()["response"]))
-                    raise srtGenError()
+        elif response.json()["status"] == "error":
+            return FAILED, response.json()["response"]
 
-                else:
-                    print("DONE!\n[+] Transcibe job complete")
-                    break
+        return COMPLETED, response.json()["response"]
 
 
-            except requests.exceptions.RequestException as err:
-                print("[-] Error getting results from the service. Ensure you have your lambda at %s set up correctly."%(self.api_url))
-                
-                ##Only raise an error if 3 or more http/network errors are received
-                if error_count >=3:
-                    raise
+    def download_srt(self):
+        """
+        Download the .srt formatted subtitle file from the service
 
-                error_count+=1
-                continue
+        The service long-polls so results are downloaded as soon as the
+        job completes. If the service replies straight away the interval
+        between requests backs off with jitter (see jobPoller). Several
+        consecutive errors, a failed job or the deadline passing aborts.
 
-            except Exception as err:
-                print("[-] Unexpected error: %s"%(err))
-                raise
+        Returns
+        -------
+            bool: True on success
 
-        self.srt_data = response.json()["response"]
+        Raises
+        ------
+            requests.exceptions.RequestException - There was an error 
+            getting the results from the service
+
+            srtGenError: The Transcribe job failed or did not finish 
+            before the deadline
+        """
+        print("[+] Waiting for Transcribe job %s to complete: "%(self.transcription_job_name), end="")
+
+        poller = jobPoller(self.check_results,
+                           deadline=self.deadline,
+                           min_delay=1.0,
+                           max_delay=10.0,
+                           progress=lambda state: print(".", end="", flush=True))
+
+        try:
+            self.srt_data = poller.wait()
+
+        except jobFailedError as err:
+            print("\nError with Transcription Job %s"%(err))
+            raise srtGenError("Error with Transcription Job %s"%(err))
+
+        except jobTimeoutError as err:
+            print("\n[-] Gave up waiting for the transcription job: %s"%(err))
+            raise srtGenError("Gave up waiting for the transcription job: %s"%(err))
+
+        print("DONE!\n[+] Transcibe job complete")
         print("[+] Transciption data downloaded")
 
         return True
@@ -463,12 +673,18 @@ if __name__ == "__main__":
     parser.add_argument("-o", "--srt-output", help="Location to save the .srt subtitle file that is generated. If none is specified it will just be printed to stdout")
     parser.add_argument("-b", "--bitrate", default=48000, type=int ,help="The bitrate ffmpeg will use to extract the audio from the source (default=48000 bps)")
     parser.add_argument("-m", "--mp3-output", help="Location of where the MP3 audio file should be extracted to, if none is given a temporary file is used and deleted at the end of the execution.")
+    parser.add_argument("-d", "--deadline", default=DEFAULT_DEADLINE, type=float, help="Maximum time in seconds to wait for the Transcribe job to finish (default=21600)")
+    parser.add_argument("--part-size", default=DEFAULT_PART_SIZE // (1024 * 1024), type=int, help="Audio larger than this many MB is uploaded in parallel parts of this size, at least 5 (default=8)")
+    parser.add_argument("--upload-concurrency", default=4, type=int, help="Number of parts to upload in parallel (default=4)")
     #TODO
     parser.add_argument("-v", "--verbose", action="store_true", help="increase output verbosity")
     args = parser.parse_args()
 
+    if args.part_size < 5:
+        parser.error("--part-size must be at least 5 MB")
+
     try:
-        srt_gen_obj = srtGen()
+        srt_gen_obj = srtGen(deadline=args.deadline, part_size=args.part_size * 1024 * 1024, upload_concurrency=args.upload_concurrency)
         srt_gen_obj(args.input_filepath, mp3_filepath=args.mp3_output, srt_filepath=args.srt_output, bitrate=args.bitrate)
 
     except srtGenError as err:
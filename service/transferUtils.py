@@ -0,0 +1,669 @@
+#######################################################################
+##
+## Name: transferUtils.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""S3 transfer helpers
+
+A small S3 multipart upload engine with a tunable part size and number
+of parallel part uploads, and progress reporting with throughput. It
+can upload:
+
+* A stream (e.g. the stdout of an ffmpeg process), each part being
+  uploaded as soon as it has been read so producing the data and
+  uploading it overlap
+* A file, resuming an earlier multipart upload of the same file that
+  was interrupted. The upload id is kept in a small json state file
+  and only the parts S3 doesn't already have are sent
+
+Clients without AWS credentials (e.g. the service client) upload with
+presigned URLs instead: multipartFormEncoder streams a file as the body
+of a presigned POST without building the request in memory, and
+upload_presigned_parts() sends a file to a set of presigned multipart
+upload part URLs in parallel.
+
+Usage
+-----
+
+```
+uploader = multipartUploader(s3_client, part_size=16 * 1024 * 1024, max_concurrency=8,
+                             progress=transferProgress())
+with subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE) as process:
+    uploader.upload_stream(process.stdout, "my-bucket", "audio.mp3")
+
+uploader.upload_file("audio.flac", "my-bucket", "audio.flac", resume_filepath="audio.flac.upload.json")
+```
+
+Classes
+-------
+
+    * multipartUploader - Upload a stream or file to S3 in parts, in parallel
+    * multipartFormEncoder - Streaming multipart/form-data body for a presigned POST
+    * hashingReader - Wraps a stream and hashes the data as it is read
+    * transferProgress - Progress callback that prints the amount transferred and the throughput
+
+Functions
+---------
+
+    * upload_presigned_parts - Upload a file to presigned multipart upload part URLs, in parallel
+    * hash_file - SHA-256 of a file, read in chunks
+
+Attributes
+----------
+MIN_PART_SIZE (int): The smallest part size S3 accepts for all but the
+last part of a multipart upload
+DEFAULT_PART_SIZE (int): Default size of each uploaded part in bytes
+HASH_CHUNK_SIZE (int): Size of the reads used to hash files
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import threading
+import concurrent.futures
+
+from botocore.exceptions import ClientError
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def read_part(stream, size):
+    """
+    Read up to 'size' bytes from a stream. Pipes return whatever is
+    available on each read, so keep reading until there is a full
+    part or the stream ends.
+
+    Returns
+    -------
+        bytes: The data read, shorter than 'size' only at the end of the stream
+    """
+    chunks = []
+    remaining = size
+
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def hash_file(filepath, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Calculate the SHA-256 of a file without reading it all into memory
+
+    Returns
+    -------
+        str: The hex digest
+    """
+    digest = hashlib.sha256()
+
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class hashingReader(object):
+    """
+    Wrap a binary stream so that everything read from it is also
+    hashed, e.g. to get the hash of audio that is being uploaded 
+    straight from ffmpeg without reading it a second time
+    """
+
+    def __init__(self, stream, algorithm="sha256"):
+        self.stream = stream
+        self.digest = hashlib.new(algorithm)
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+class transferProgress(object):
+    """
+    Progress callback for multipartUploader. Called with the number of
+    bytes transferred since the last call (the same convention as the
+    boto3 transfer Callback), from any thread, and prints the total
+    transferred and the throughput at most every 'interval' seconds.
+    """
+
+    def __init__(self, total=None, interval=0.5, out=sys.stdout, clock=time.monotonic):
+        """
+        Args
+        ----
+        total (int): Total number of bytes to transfer, if known [optional]
+        interval (float): Minimum time in seconds between updates (default is 0.5)
+        out (file): Where to print the progress (default is sys.stdout)
+        clock (callable): Function giving the current time in seconds
+        """
+        self.total = total
+        self.interval = interval
+        self.out = out
+        self.clock = clock
+
+        self.transferred = 0
+        self.skipped = 0
+        self.start = clock()
+        self.last_update = None
+        self.lock = threading.Lock()
+
+    def __call__(self, bytes_amount):
+        with self.lock:
+            self.transferred += bytes_amount
+            now = self.clock()
+            if self.last_update is None or now - self.last_update >= self.interval:
+                self.last_update = now
+                self.show(now)
+
+    def skip(self, bytes_amount):
+        """
+        Count bytes that didn't need transferring (e.g. parts already
+        uploaded before a resume) without them counting towards the throughput
+        """
+        with self.lock:
+            self.transferred += bytes_amount
+            self.skipped += bytes_amount
+
+    def throughput(self, now=None):
+        """
+        Returns
+        -------
+            float: Average bytes per second transferred so far
+        """
+        elapsed = (now or self.clock()) - self.start
+        return (self.transferred - self.skipped) / elapsed if elapsed > 0 else 0.0
+
+    def show(self, now, end=""):
+        mb = self.transferred / 1048576.0
+        if self.total:
+            line = "%.1f/%.1f MB (%d%%)"%(mb, self.total / 1048576.0, 100 * self.transferred // self.total)
+        else:
+            line = "%.1f MB"%(mb)
+        print("\r[+] Uploaded %s at %.2f MB/s   "%(line, self.throughput(now) / 1048576.0), end=end, file=self.out, flush=True)
+
+    def finish(self):
+        """
+        Print the final totals
+        """
+        with self.lock:
+            self.show(self.clock(), end="\n")
+
+
+class multipartFormEncoder(object):
+    """
+    A multipart/form-data request body that is generated as it is read,
+    so a file can be sent as a form upload (e.g. to an S3 presigned 
+    POST URL) without the whole request being built in memory. It has
+    read() and __len__() so requests streams it with a Content-Length
+    header rather than chunked encoding, which S3 doesn't accept.
+
+    Usage
+    -----
+
+    ```
+    body = multipartFormEncoder(presigned["fields"], "file", "audio.mp3", "/tmp/audio.mp3")
+    requests.post(presigned["url"], data=body, headers={"Content-Type": body.content_type})
+    ```
+    """
+
+    def __init__(self, fields, file_field, filename, filepath, progress=None):
+        """
+        Args
+        ----
+        fields (dict): Form fields sent before the file
+        file_field (str): Name of the form field holding the file, for
+        a presigned POST this must be the last field
+        filename (str): The filename sent with the file
+        filepath (str): Path of the file to send
+        progress (callable): Called with the number of bytes of the 
+        file read each time some is read [optional]
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=%s"%(boundary)
+        self.progress = progress
+
+        head = []
+        for name, value in (fields or {}).items():
+            head.append('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'%(boundary, name, value))
+        head.append('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                    'Content-Type: application/octet-stream\r\n\r\n'%(boundary, file_field, filename))
+
+        self.head = "".join(head).encode("utf-8")
+        self.tail = ("\r\n--%s--\r\n"%(boundary)).encode("utf-8")
+        self.file_obj = open(filepath, "rb")
+        self.length = len(self.head) + os.path.getsize(filepath) + len(self.tail)
+
+        self.position = 0
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.file_obj.close()
+
+    def read(self, size=-1):
+        """
+        Read the next part of the body
+
+        Args
+        ----
+        size (int): The most bytes to return, -1 for the rest of the body
+
+        Returns
+        -------
+            bytes: The data read, empty at the end of the body
+        """
+        if size is None or size < 0:
+            size = self.length - self.position
+
+        chunks = []
+        head_end = len(self.head)
+        file_end = self.length - len(self.tail)
+
+        while size > 0 and self.position < self.length:
+            if self.position < head_end:
+                chunk = self.head[self.position:self.position + size]
+
+            elif self.position < file_end:
+                chunk = self.file_obj.read(min(size, file_end - self.position))
+                if not chunk:
+                    raise IOError("%s was truncated while it was being uploaded"%(self.file_obj.name))
+                if self.progress:
+                    self.progress(len(chunk))
+
+            else:
+                offset = self.position - file_end
+                chunk = self.tail[offset:offset + size]
+
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+
+        return b"".join(chunks)
+
+
+def upload_presigned_parts(session, urls, filepath, part_size, max_concurrency=4, progress=None):
+    """
+    Upload a file to the presigned part URLs of an S3 multipart upload,
+    several parts at once. Each worker reads only the part it is 
+    sending so at most max_concurrency parts are in memory at a time.
+    Completing (or aborting) the multipart upload is left to whoever 
+    created it.
+
+    Args
+    ----
+    session (requests.Session): The session to make the requests with,
+    so connections are reused and its retry settings apply
+    urls (list): The presigned URL of each part, in part number order
+    filepath (str): The file to upload
+    part_size (int): The size of every part but the last, this must be
+    the part size the URLs were requested for
+    max_concurrency (int): Number of parts to upload at once (default is 4)
+    progress (callable): Called with the number of bytes uploaded after 
+    each part [optional]
+
+    Returns
+    -------
+        list: The {PartNumber, ETag} of each part, as needed to complete
+        the multipart upload
+
+    Raises
+    ------
+        requests.exceptions.RequestException: A part could not be uploaded
+    """
+    def upload_part(part_number):
+        with open(filepath, "rb") as f:
+            f.seek((part_number - 1) * part_size)
+            body = f.read(part_size)
+
+        response = session.put(urls[part_number - 1], data=body)
+        response.raise_for_status()
+
+        if progress:
+            progress(len(body))
+
+        return {"PartNumber": part_number, "ETag": response.headers["ETag"]}
+
+    with concurrent.futures.ThreadPoolExecutor(max_concurrency) as pool:
+        return list(pool.map(upload_part, range(1, len(urls) + 1)))
+
+
+class multipartUploader(object):
+    """
+    Upload data to S3 as a multipart upload, up to max_concurrency
+    parts at once. At most max_concurrency parts (plus the one being
+    read) are held in memory at a time.
+
+    Methods
+    -------
+    upload_stream(stream, bucket, key)
+        Upload everything read from a binary stream to an S3 object
+
+    upload_file(filepath, bucket, key, resume_filepath)
+        Upload a file, resuming an interrupted upload of it if possible
+    """
+
+    def __init__(self, s3_client, part_size=DEFAULT_PART_SIZE, max_concurrency=4, progress=None):
+        """
+        Args
+        ----
+        s3_client (botocore.client.BaseClient): The S3 client to use
+        part_size (int): Size of each part in bytes, at least
+        MIN_PART_SIZE (default is DEFAULT_PART_SIZE)
+        max_concurrency (int): Number of parts to upload at once (default is 4)
+        progress (callable): Called with the number of bytes uploaded
+        after each part, e.g. a transferProgress [optional]
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError("S3 multipart upload parts must be at least %d bytes"%(MIN_PART_SIZE))
+
+        self.s3_client = s3_client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.progress = progress
+
+
+    def upload_stream(self, stream, bucket, key, on_eof=None):
+        """
+        Upload everything read from a binary stream to an S3 object. A
+        stream shorter than one part is sent with a single put_object.
+        If anything fails the multipart upload is aborted so no
+        orphaned parts are left (and billed) in the bucket.
+
+        Args
+        ----
+        stream (file): Binary file-like object to read from
+        bucket (str): The S3 bucket to upload to
+        key (str): The key of the object to create
+        on_eof (callable): Called once the stream has been read to the
+        end, before the upload is completed. Raising from it aborts
+        the upload, e.g. when the process writing the stream failed. 
+        Returning False discards the upload, e.g. when it turns out S3
+        already has the data [optional]
+
+        Returns
+        -------
+            int: The number of bytes read from the stream
+        """
+        data = read_part(stream, self.part_size)
+
+        if len(data) < self.part_size:
+            if on_eof and on_eof() is False:
+                return len(data)
+            self.s3_client.put_object(Bucket=bucket, Key=key, Body=data)
+            if self.progress:
+                self.progress(len(data))
+            return len(data)
+
+        upload_id = self.s3_client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+        try:
+            parts, size = self._upload_parts(stream, bucket, key, upload_id, data)
+
+            if on_eof and on_eof() is False:
+                self.s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                return size
+
+            self.s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                     MultipartUpload={"Parts": parts})
+        except BaseException:
+            self.s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+
+        return size
+
+
+    def _upload_parts(self, stream, bucket, key, upload_id, data):
+        """
+        Read the rest of the stream, uploading each part as it is read
+
+        Returns
+        -------
+            tuple: (parts, size) where parts is the list of
+            {PartNumber, ETag} dicts needed to complete the upload
+        """
+        ##Stops the stream being read further ahead than the uploads can keep up with
+        slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        def upload_part(part_number, body):
+            try:
+                return self._upload_part(bucket, key, upload_id, part_number, body)
+            finally:
+                slots.release()
+
+        futures = []
+        size = 0
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_concurrency) as pool:
+            try:
+                while data:
+                    slots.acquire()
+
+                    ##Fail early rather than reading the rest of the stream if a part has already failed
+                    for future in futures:
+                        if future.done() and future.exception():
+                            slots.release()
+                            raise future.exception()
+
+                    futures.append(pool.submit(upload_part, len(futures) + 1, data))
+                    size += len(data)
+
+                    data = read_part(stream, self.part_size)
+
+                parts = [future.result() for future in futures]
+
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return parts, size
+
+
+    def _upload_part(self, bucket, key, upload_id, part_number, body):
+        """
+        Upload a single part and report the progress
+
+        Returns
+        -------
+            dict: The {PartNumber, ETag} of the uploaded part
+        """
+        response = self.s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                              PartNumber=part_number, Body=body)
+        if self.progress:
+            self.progress(len(body))
+
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+
+    def upload_file(self, filepath, bucket, key, resume_filepath=None):
+        """
+        Upload a file to S3. Files no bigger than one part are sent
+        with a single put_object, larger files as a multipart upload.
+
+        When resume_filepath is given the id of the multipart upload is
+        saved to it, and if the upload is interrupted it is left open
+        in S3 rather than aborted. Uploading the same file again to the
+        same key with the same resume_filepath picks the upload up where
+        it stopped: parts that S3 already has are skipped if their ETag
+        matches the MD5 of the local data, so a file rewritten with the
+        same content (e.g. audio extracted again) resumes and any part 
+        whose data has changed is sent again (ETags of SSE-KMS encrypted 
+        parts never match, so those parts are always sent again). A saved
+        upload to another bucket or key, or of a file of another size, is
+        aborted and a new upload is started.
+
+        Args
+        ----
+        filepath (str): The file to upload
+        bucket (str): The S3 bucket to upload to
+        key (str): The key of the object to create
+        resume_filepath (str): Path of the json file that records the
+        upload so it can be resumed [optional]
+
+        Returns
+        -------
+            str: The key the file was uploaded to
+        """
+        size = os.path.getsize(filepath)
+
+        if size <= self.part_size:
+            with open(filepath, "rb") as f:
+                self.s3_client.put_object(Bucket=bucket, Key=key, Body=f)
+            if self.progress:
+                self.progress(size)
+            return key
+
+        uploaded = {}
+        state = self._load_resume_state(resume_filepath, bucket, key, size)
+
+        if state:
+            uploaded = self._list_parts(bucket, key, state["upload_id"])
+            if uploaded is None:
+                state = None
+            else:
+                print("[+] Resuming upload of %s to s3://%s/%s, S3 already has %d parts"%(filepath, bucket, key, len(uploaded)))
+
+        if state:
+            upload_id = state["upload_id"]
+        else:
+            upload_id = self.s3_client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+            self._save_resume_state(resume_filepath, {"bucket": bucket, "key": key, "upload_id": upload_id,
+                                                      "part_size": self.part_size, "size": size})
+
+        def upload_file_part(part_number):
+            with open(filepath, "rb") as f:
+                f.seek((part_number - 1) * self.part_size)
+                body = f.read(self.part_size)
+
+            etag = uploaded.get(part_number)
+            if etag and etag.strip('"') == hashlib.md5(body).hexdigest():
+                if self.progress and hasattr(self.progress, "skip"):
+                    self.progress.skip(len(body))
+                return {"PartNumber": part_number, "ETag": etag}
+
+            return self._upload_part(bucket, key, upload_id, part_number, body)
+
+        part_count = (size + self.part_size - 1) // self.part_size
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(self.max_concurrency) as pool:
+                parts = list(pool.map(upload_file_part, range(1, part_count + 1)))
+
+            self.s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                     MultipartUpload={"Parts": parts})
+        except BaseException:
+            if resume_filepath:
+                print("[-] Upload of %s interrupted, it will be resumed the next time it is uploaded"%(filepath))
+            else:
+                self.s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+
+        if resume_filepath and os.path.exists(resume_filepath):
+            os.remove(resume_filepath)
+
+        return key
+
+
+    def _list_parts(self, bucket, key, upload_id):
+        """
+        Get the parts S3 already has for a multipart upload
+
+        Returns
+        -------
+            dict: Maps part number to ETag, None if the upload no longer 
+            exists (e.g. it was completed, aborted or expired)
+        """
+        parts = {}
+        marker = 0
+
+        while True:
+            try:
+                response = self.s3_client.list_parts(Bucket=bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+            except ClientError as err:
+                if err.response["Error"]["Code"] in ("NoSuchUpload", "404"):
+                    return None
+                raise
+
+            for part in response.get("Parts", []):
+                parts[part["PartNumber"]] = part["ETag"]
+
+            if not response.get("IsTruncated"):
+                return parts
+            marker = response["NextPartNumberMarker"]
+
+
+    def _load_resume_state(self, resume_filepath, bucket, key, size):
+        """
+        Load the record of an earlier upload, if it was an upload of a
+        file of the same size to the same bucket and key with the current
+        part size. An upload that can't be resumed is aborted so its parts
+        don't stay in the bucket.
+
+        Returns
+        -------
+            dict: The saved state, None if there is nothing to resume
+        """
+        if not resume_filepath or not os.path.exists(resume_filepath):
+            return None
+
+        try:
+            with open(resume_filepath) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (state.get("bucket") != bucket or state.get("key") != key or 
+            state.get("part_size") != self.part_size or state.get("size") != size):
+            self._abort_upload(state)
+            return None
+
+        return state
+
+
+    def _abort_upload(self, state):
+        """
+        Abort the upload recorded in a resume state, if it still exists
+        """
+        if not all(state.get(field) for field in ("bucket", "key", "upload_id")):
+            return
+
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=state["bucket"], Key=state["key"], UploadId=state["upload_id"])
+        except ClientError as err:
+            ##Failing to clean up an old upload shouldn't stop a new one
+            if err.response["Error"]["Code"] not in ("NoSuchUpload", "404"):
+                print("[-] Unable to abort the earlier upload to s3://%s/%s: %s"%(state["bucket"], state["key"], err))
+
+
+    def _save_resume_state(self, resume_filepath, state):
+        """
+        Record an upload so that it can be resumed
+        """
+        if not resume_filepath:
+            return
+
+        with open(resume_filepath, "w") as f:
+            json.dump(state, f)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+#######################################################################
+##
+## Name: bench_segmentation.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Cue segmentation parameter sweep benchmark
+
+Segments a transcript with a sweep of line lengths and pause lengths,
+comparing the streaming `iterCuesFromItems` engine (which parses the
+transcript again for every setting) with a transcript loaded once into
+`TranscriptTimings`, using the pure Python and (if NumPy is installed)
+the NumPy backend. Every backend must render the same SRT documents.
+
+Usage
+-----
+
+```
+python3 bench_segmentation.py transcript.json -r 3
+```
+
+* `transcript` - A Transcribe JSON file, if none is given a three hour
+  transcript is generated
+* `-r` - The number of runs, the best run is reported (default is 3)
+"""
+
+import json
+import random
+import timeit
+import argparse
+
+from srtUtils import CueLimits, TranscriptTimings, iterPhrasesFromTranscript, renderSRT, numpy
+
+
+def generate_transcript(seconds):
+    """
+    Generate a Transcribe JSON transcript of speech with pauses and
+    sentences of random lengths
+
+    Args
+    ----
+    seconds (int): Length of the recording in seconds
+
+    Returns
+    -------
+        str: The transcript JSON
+    """
+    random.seed(0)
+    words = ["the", "subtitle", "transcribe", "a", "of", "recording", "segmentation", "to", "and", "speaker"]
+    items = []
+    position = 0
+
+    while position < seconds * 1000:
+        position += random.choice((10, 50, 150, 800, 1500))
+        length = random.randrange(120, 700)
+        items.append({"start_time": "%.3f"%(position / 1000.0), "end_time": "%.3f"%((position + length) / 1000.0),
+                      "alternatives": [{"confidence": "1.0", "content": random.choice(words)}], "type": "pronunciation"})
+        position += length
+
+        if random.random() < 0.1:
+            items.append({"alternatives": [{"confidence": "0.0", "content": random.choice(".,?")}], "type": "punctuation"})
+
+    return json.dumps({"results": {"transcripts": [{"transcript": ""}], "items": items}, "status": "COMPLETED"})
+
+
+def run(transcript, repeat):
+    """
+    Time rendering the transcript with every setting of the sweep with
+    each backend and print the results
+
+    Args
+    ----
+    transcript (str): The transcript JSON
+    repeat (int): Number of runs, the fastest is reported
+    """
+    sweep = [CueLimits(maxLineChars=line_chars, splitPauseMs=pause_ms) for line_chars in (32, 37, 42) for pause_ms in (500, 1000, 2000)]
+
+    def streaming():
+        return [renderSRT(iterPhrasesFromTranscript(transcript, limits=limits)) for limits in sweep]
+
+    def loaded(backend):
+        timings = TranscriptTimings(json.loads(transcript)["results"]["items"], backend)
+        return [timings.renderSRT(limits) for limits in sweep]
+
+    cases = [("iterCuesFromItems", streaming), ("TranscriptTimings python", lambda: loaded("python"))]
+    if numpy is not None:
+        cases.append(("TranscriptTimings numpy", lambda: loaded("numpy")))
+    else:
+        print("[-] NumPy is not installed, skipping the numpy backend")
+
+    print("[+] Rendering %d settings, best of %d runs" % (len(sweep), repeat))
+
+    expected = streaming()
+    baseline = None
+    for name, func in cases:
+        if func() != expected:
+            print("[-] %s rendered different subtitles" % (name))
+
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        if baseline is None:
+            baseline = best
+        print("    %-26s %8.1f ms  %6.1f ms/setting  %5.2fx" % (name, best * 1000, best * 1000 / len(sweep), baseline / best))
+
+
+## Implement a simple CLI
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("transcript", nargs="?", help="Transcribe JSON file to segment (default=a generated three hour transcript)")
+    parser.add_argument("-r", "--repeat", default=3, type=int, help="Number of runs, the best run is reported (default=3)")
+    args = parser.parse_args()
+
+    if args.transcript:
+        with open(args.transcript, encoding="utf-8") as f:
+            transcript = f.read()
+    else:
+        transcript = generate_transcript(3 * 3600)
+
+    run(transcript, args.repeat)
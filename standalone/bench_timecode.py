@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+#######################################################################
+##
+## Name: bench_timecode.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Timecode formatting microbenchmark
+
+Compares the original float based `getTimeCode` implementation with
+the integer millisecond formatters in srtUtils, both one call per
+timecode and in bulk with `formatTimeCodes`.
+
+Usage
+-----
+
+```
+python3 bench_timecode.py -n 20000 -r 5
+```
+
+* `-n` - The number of cue boundaries to format per run (default is 20000)
+* `-r` - The number of runs, the best run is reported (default is 5)
+"""
+
+import random
+import timeit
+import argparse
+
+from srtUtils import getTimeCode, formatTimeCode, formatTimeCodes
+
+
+def legacy_get_time_code(seconds):
+    """
+    The getTimeCode implementation this benchmark measures against,
+    including its hard coded hour field
+    """
+    t_hund = int(seconds % 1 * 1000)
+    t_seconds = int( seconds )
+    t_secs = ((float( t_seconds) / 60) % 1) * 60
+    t_mins = int( t_seconds / 60 )
+    return str( "%02d:%02d:%02d,%03d" % (00, t_mins, int(t_secs), t_hund ))
+
+
+def run(count, repeat):
+    """
+    Time each formatter over the same set of cue boundaries spread
+    across a three hour recording and print the results
+
+    Args
+    ----
+    count (int): Number of cue boundaries to format per run
+    repeat (int): Number of runs, the fastest is reported
+    """
+    random.seed(0)
+    boundaries_ms = sorted(random.randrange(0, 3 * 3600 * 1000) for _ in range(count))
+    boundaries_secs = [ms / 1000.0 for ms in boundaries_ms]
+
+    cases = [
+        ("legacy getTimeCode", lambda: [legacy_get_time_code(s) for s in boundaries_secs]),
+        ("getTimeCode", lambda: [getTimeCode(s) for s in boundaries_secs]),
+        ("formatTimeCode", lambda: [formatTimeCode(ms) for ms in boundaries_ms]),
+        ("formatTimeCodes (bulk)", lambda: formatTimeCodes(boundaries_ms)),
+    ]
+
+    print("[+] Formatting %d timecodes, best of %d runs" % (count, repeat))
+
+    baseline = None
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        if baseline is None:
+            baseline = best
+        print("    %-24s %8.1f ms  %6.0f ns/timecode  %5.2fx" % (name, best * 1000, best * 1e9 / count, baseline / best))
+
+
+## Implement a simple CLI
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", default=20000, type=int, help="Number of cue boundaries to format per run (default=20000)")
+    parser.add_argument("-r", "--repeat", default=5, type=int, help="Number of runs, the best run is reported (default=5)")
+    args = parser.parse_args()
+
+    run(args.count, args.repeat)
@@ -0,0 +1,358 @@
+#######################################################################
+##
+## Name: contentCache.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Content addressed cache of transcription results
+
+The standalone client names the uploaded audio and the Transcribe job
+after the SHA-256 of the extracted audio, so transcribing the same
+audio again can reuse the earlier upload, job and transcript rather
+than paying for them a second time. This module keeps the local side
+of that: an index of the audio hashes seen and the files cached for
+them (e.g. the Transcribe JSON), with expiry and a limit on the number
+of entries.
+
+The media files each hash was extracted from are recorded too, so a
+cached transcript can be found from the media file alone, e.g. to 
+render its subtitles again without any network calls.
+
+Usage
+-----
+
+```
+cache = contentCache()
+transcript_filepath = cache.get_file(audio_hash, "json")
+if transcript_filepath is None:
+    ...
+    cache.put_data(audio_hash, "json", transcript_data)
+    cache.add_source(audio_hash, video_filepath)
+
+audio_hash = cache.find_source(video_filepath)
+```
+
+Classes
+-------
+
+    * contentCache - Index of audio hashes and the files cached for them
+
+Attributes
+----------
+DEFAULT_CACHE_DIR (str): Where the cache is kept by default
+DEFAULT_TTL (float): Default lifetime in seconds of a cache entry
+DEFAULT_MAX_ENTRIES (int): Default number of entries kept
+"""
+
+import os
+import json
+import time
+import shutil
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".srtgen", "cache")
+
+##AWS Transcribe deletes jobs after 90 days, keep entries for less than that
+DEFAULT_TTL = 30 * 24 * 3600.0
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class contentCache(object):
+    """
+    Index of audio content hashes, stored as 'index.json' in the cache
+    directory alongside the cached files. Entries expire 'ttl' seconds
+    after they were last written, and beyond 'max_entries' the least
+    recently used entries are evicted along with their files. The
+    index can be shared by the threads of a batch.
+
+    Methods
+    -------
+    get(content_hash)
+        Return the entry for a hash, None if there isn't one
+
+    put(content_hash, **fields)
+        Add or update fields of the entry for a hash
+
+    put_file(content_hash, name, filepath)
+        Copy a file into the cache and record it in the entry for a hash
+
+    put_data(content_hash, name, data)
+        Write data to a file in the cache and record it in the entry for a hash
+
+    get_file(content_hash, name)
+        Return the path of a file cached for a hash, None if there isn't one
+
+    add_source(content_hash, filepath)
+        Record that the audio with a hash was extracted from a media file
+
+    find_source(filepath)
+        Return the hash of the audio extracted from a media file
+
+    path(filename)
+        Return the full path of a cached file
+
+    evict()
+        Remove expired entries and enforce max_entries
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        """
+        Args
+        ----
+        cache_dir (str): Directory to keep the cache in (default is DEFAULT_CACHE_DIR)
+        ttl (float): Seconds an entry stays valid after it was last
+        written, None to never expire (default is DEFAULT_TTL)
+        max_entries (int): The most entries to keep (default is DEFAULT_MAX_ENTRIES)
+        clock (callable): Function giving the current time in seconds
+        """
+        self.cache_dir = os.path.expandvars(os.path.expanduser(cache_dir))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self.index_filepath = os.path.join(self.cache_dir, "index.json")
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+    def path(self, filename):
+        """
+        Return the full path of a file in the cache directory
+        """
+        return os.path.join(self.cache_dir, filename)
+
+
+    def get(self, content_hash):
+        """
+        Look up the entry for a hash, marking it as recently used
+
+        Args
+        ----
+        content_hash (str): The SHA-256 hex digest of the audio
+
+        Returns
+        -------
+            dict: The entry, None if there is no entry or it has expired
+        """
+        with self.lock:
+            index = self._load()
+            entry = index.get(content_hash)
+
+            if entry is None:
+                return None
+
+            if self._expired(entry):
+                self._remove(index, content_hash)
+                self._save(index)
+                return None
+
+            entry["used"] = self.clock()
+            self._save(index)
+
+            return dict(entry)
+
+
+    def put(self, content_hash, **fields):
+        """
+        Add or update fields of the entry for a hash, the entry's expiry
+        starts again
+
+        Args
+        ----
+        content_hash (str): The SHA-256 hex digest of the audio
+        fields: The values to store, e.g. s3_key or transcription_job_name
+        """
+        self._update(content_hash, fields)
+
+
+    def put_file(self, content_hash, name, filepath):
+        """
+        Copy a file into the cache as '<content_hash>.<name>' and record
+        it under 'name' in the entry for the hash
+
+        Args
+        ----
+        content_hash (str): The SHA-256 hex digest of the audio
+        name (str): What the file is, e.g. "srt"
+        filepath (str): The file to copy into the cache
+        """
+        self._store(content_hash, name, lambda tmp_filepath: shutil.copyfile(filepath, tmp_filepath))
+
+
+    def put_data(self, content_hash, name, data):
+        """
+        Write data to the cache as '<content_hash>.<name>' and record it
+        under 'name' in the entry for the hash
+
+        Args
+        ----
+        content_hash (str): The SHA-256 hex digest of the audio
+        name (str): What the data is, e.g. "json"
+        data (str or bytes): The data to write, str is written as UTF-8
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        def write(tmp_filepath):
+            with open(tmp_filepath, "wb") as f:
+                f.write(data)
+
+        self._store(content_hash, name, write)
+
+
+    def get_file(self, content_hash, name):
+        """
+        Return the path of the file cached under 'name' for a hash
+
+        Returns
+        -------
+            str: The path of the file, None if there is no such file or
+            the entry has expired
+        """
+        entry = self.get(content_hash)
+        if not entry or name not in entry:
+            return None
+
+        filepath = self.path(entry[name])
+        if not os.path.exists(filepath):
+            return None
+
+        return filepath
+
+
+    def add_source(self, content_hash, filepath):
+        """
+        Record that the audio with a hash was extracted from a media
+        file. The file's size and modification time are recorded too,
+        so a file that has since changed isn't matched by find_source
+        """
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+
+        with self.lock:
+            index = self._load()
+
+            entry = index.get(content_hash)
+            if entry is None:
+                return
+
+            entry.setdefault("sources", {})[filepath] = [stat.st_size, stat.st_mtime]
+            self._save(index)
+
+
+    def find_source(self, filepath):
+        """
+        Look up the hash of the audio extracted from a media file, if
+        the file hasn't changed since
+
+        Returns
+        -------
+            str: The SHA-256 hex digest of the audio, None if the file 
+            isn't in the cache
+        """
+        filepath = os.path.abspath(filepath)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+
+        with self.lock:
+            index = self._load()
+
+        for content_hash, entry in index.items():
+            if entry.get("sources", {}).get(filepath) == [stat.st_size, stat.st_mtime] and not self._expired(entry):
+                return content_hash
+
+        return None
+
+
+    def evict(self):
+        """
+        Remove expired entries, and the least recently used entries
+        beyond max_entries, along with their cached files
+        """
+        with self.lock:
+            index = self._load()
+            self._evict(index)
+            self._save(index)
+
+
+    def _store(self, content_hash, name, write):
+        """
+        Have 'write' create the file '<content_hash>.<name>', through a
+        temporary file so a reader never sees it half written, and 
+        record it in the entry for the hash
+        """
+        filename = "%s.%s"%(content_hash, name)
+        tmp_filepath = self.path("%s.%d.%d.tmp"%(filename, os.getpid(), threading.get_ident()))
+
+        write(tmp_filepath)
+        os.replace(tmp_filepath, self.path(filename))
+
+        self._update(content_hash, {name: filename}, filename=filename)
+
+
+    def _update(self, content_hash, fields, filename=None):
+        """
+        Add or update fields of the entry for a hash and restart its
+        expiry. A cached file is added to the entry's 'files', the files
+        that are deleted along with the entry.
+        """
+        with self.lock:
+            index = self._load()
+
+            entry = index.get(content_hash, {})
+            entry.update(fields)
+            if filename is not None and filename not in entry.setdefault("files", []):
+                entry["files"].append(filename)
+            entry["created"] = entry["used"] = self.clock()
+            index[content_hash] = entry
+
+            self._evict(index)
+            self._save(index)
+
+
+    def _expired(self, entry):
+        return self.ttl is not None and self.clock() - entry.get("created", 0) > self.ttl
+
+
+    def _evict(self, index):
+        for content_hash in [h for h, entry in index.items() if self._expired(entry)]:
+            self._remove(index, content_hash)
+
+        if self.max_entries is not None and len(index) > self.max_entries:
+            by_use = sorted(index, key=lambda h: index[h].get("used", 0))
+            for content_hash in by_use[:len(index) - self.max_entries]:
+                self._remove(index, content_hash)
+
+
+    def _remove(self, index, content_hash):
+        """
+        Drop an entry and delete any files cached for it
+        """
+        entry = index.pop(content_hash)
+
+        for filename in entry.get("files", []):
+            try:
+                os.remove(self.path(filename))
+            except OSError:
+                pass
+
+
+    def _load(self):
+        try:
+            with open(self.index_filepath) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save(self, index):
+        ##Write to a temporary file then rename so a crash never leaves a half written index
+        tmp_filepath = "%s.%d.tmp"%(self.index_filepath, os.getpid())
+        with open(tmp_filepath, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_filepath, self.index_filepath)
@@ -0,0 +1,331 @@
+#######################################################################
+##
+## Name: jobPoller.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Adaptive job status poller
+
+A reusable poller for waiting on long running jobs such as AWS
+Transcribe jobs. Rather than checking at a fixed rate it:
+
+* Estimates when the job should be done from the duration of the media
+  being processed and checks only occasionally until then
+* Backs off exponentially, with random jitter, once the job is overdue
+  so that many concurrent pollers don't hit the API in lock step, up
+  to a short interval so a late job is still noticed soon after it ends
+* Backs off after errors rather than retrying straight away, and only
+  gives up after several consecutive errors
+* Enforces an overall deadline
+* Reports the terminal states of the job, a failed job raises
+  jobFailedError rather than being polled forever
+
+Usage
+-----
+
+```
+def check_status():
+    job = transcribe_client.get_transcription_job(TranscriptionJobName=name)["TranscriptionJob"]
+    if job["TranscriptionJobStatus"] == "COMPLETED":
+        return COMPLETED, job["Transcript"]["TranscriptFileUri"]
+    if job["TranscriptionJobStatus"] == "FAILED":
+        return FAILED, job.get("FailureReason")
+    return RUNNING, None
+
+transcript_file_uri = jobPoller(check_status, media_duration=1800).wait()
+```
+
+From asyncio code pass a coroutine function as check_status and await
+wait_async() instead, the waiting is then done with asyncio.sleep so no
+thread is tied up per job.
+
+Classes
+-------
+
+    * jobPoller - Poll a job until it completes, fails or the deadline passes
+    * jobFailedError - Raised when the job reports that it failed
+    * jobTimeoutError - Raised when the deadline passes before the job finishes
+
+Attributes
+----------
+RUNNING, COMPLETED, FAILED (str): The states a status check reports
+QUEUE_OVERHEAD (float): Rough time in seconds a job spends queued and
+starting up, regardless of its length
+REALTIME_FACTOR (float): Rough processing time per second of media
+DEFAULT_DEADLINE (float): Default time in seconds to wait before giving up
+"""
+
+import time
+import random
+import asyncio
+
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+##Rough figures for how long a Transcribe job takes, used to decide when to start checking often
+QUEUE_OVERHEAD = 10.0
+REALTIME_FACTOR = 0.25
+
+##Give up on a job after 6 hours
+DEFAULT_DEADLINE = 6 * 3600.0
+
+
+class jobFailedError(Exception):
+    """
+    The job finished in a failed state
+    """
+    pass
+
+
+class jobTimeoutError(Exception):
+    """
+    The job did not finish before the deadline
+    """
+    pass
+
+
+class jobPoller(object):
+    """
+    Poll the status of a job until it reaches a terminal state
+
+    Methods
+    -------
+    wait()
+        Block until the job completes and return its result
+
+    wait_async()
+        Coroutine version of wait() for use with asyncio
+
+    next_delay()
+        Work out how long to wait before the next status check
+    """
+
+    def __init__(self, check_status, media_duration=None, deadline=DEFAULT_DEADLINE,
+                 min_delay=2.0, max_delay=60.0, overdue_max_delay=15.0, backoff=1.5, jitter=0.2, max_errors=5,
+                 progress=None, sleep=time.sleep, clock=time.monotonic):
+        """
+        Args
+        ----
+        check_status (callable): Called with no arguments to check the
+        job, it returns a (state, result) tuple where state is one of
+        RUNNING, COMPLETED or FAILED and result is the job result when
+        COMPLETED or the reason for failure when FAILED
+        media_duration (float): Duration in seconds of the media being
+        processed, used to estimate when the job will finish [optional]
+        deadline (float): Seconds after which to give up waiting, None
+        to wait forever (default is DEFAULT_DEADLINE)
+        min_delay (float): Smallest interval between checks in seconds
+        max_delay (float): Largest interval between checks in seconds,
+        before the job is expected to have finished
+        overdue_max_delay (float): Largest interval between checks in
+        seconds once the job is overdue, so a job that finishes late is
+        still noticed promptly, never more than max_delay
+        backoff (float): Multiplier applied to the interval after each
+        check once the job is overdue, or after an error
+        jitter (float): Fraction by which each interval is randomly
+        lengthened or shortened
+        max_errors (int): Number of consecutive failed status checks
+        after which the error is raised
+        progress (callable): Called with the state after every
+        successful status check [optional]
+        sleep (callable): Function used to sleep (default is time.sleep)
+        clock (callable): Function giving the current time in seconds
+        (default is time.monotonic)
+        """
+        self.check_status = check_status
+        self.deadline = deadline
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.overdue_max_delay = min(overdue_max_delay, max_delay)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_errors = max_errors
+        self.progress = progress
+        self.sleep = sleep
+        self.clock = clock
+
+        ##When the job is expected to finish, relative to the start of polling
+        if media_duration:
+            self.expected_duration = QUEUE_OVERHEAD + media_duration * REALTIME_FACTOR
+        else:
+            self.expected_duration = 0.0
+
+        self.delay = min_delay
+        self.error_count = 0
+
+
+    def next_delay(self, elapsed):
+        """
+        Work out how long to wait before the next status check
+
+        Until the job is expected to have finished it is checked every
+        max_delay seconds, but never later than the expected finish.
+        After that the interval starts at min_delay and grows by
+        'backoff' each time up to overdue_max_delay. Either way the 
+        interval is jittered.
+
+        Args
+        ----
+        elapsed (float): Seconds since polling started
+
+        Returns
+        -------
+            float: Seconds to wait before the next check
+        """
+        if elapsed < self.expected_duration:
+            delay = min(self.expected_duration - elapsed, self.max_delay)
+        else:
+            delay = self.delay
+            self.delay = min(self.delay * self.backoff, self.overdue_max_delay)
+
+        delay *= 1.0 + random.uniform(-self.jitter, self.jitter)
+
+        return max(delay, self.min_delay)
+
+
+    def wait(self):
+        """
+        Poll the job until it completes, fails or the deadline passes
+
+        Returns
+        -------
+            The result reported by check_status when the job completes
+
+        Raises
+        ------
+            jobFailedError: The job reported that it failed
+            jobTimeoutError: The deadline passed before the job finished
+            Exception: The last error raised by check_status after
+            max_errors consecutive failed checks
+        """
+        start = self.clock()
+        self.error_count = 0
+
+        while True:
+            check_start = self.clock()
+
+            try:
+                state, result = self.check_status()
+
+            except Exception as err:
+                if self.handle_error(err):
+                    raise
+
+            else:
+                if self.handle_state(state, result):
+                    return result
+
+            self.sleep(self.time_to_next_check(start, check_start))
+
+
+    async def wait_async(self):
+        """
+        Coroutine version of wait(), check_status must be a coroutine
+        function. The sleep function is not used, waiting is done with
+        asyncio.sleep so it does not hold a thread.
+
+        Returns
+        -------
+            The result reported by check_status when the job completes
+
+        Raises
+        ------
+            The same exceptions as wait()
+        """
+        start = self.clock()
+        self.error_count = 0
+
+        while True:
+            check_start = self.clock()
+
+            try:
+                state, result = await self.check_status()
+
+            except Exception as err:
+                if self.handle_error(err):
+                    raise
+
+            else:
+                if self.handle_state(state, result):
+                    return result
+
+            await asyncio.sleep(self.time_to_next_check(start, check_start))
+
+
+    def handle_error(self, err):
+        """
+        Record a failed status check
+
+        Returns
+        -------
+            bool: True if there have been too many consecutive errors
+            and the error should be raised
+        """
+        self.error_count += 1
+        if self.error_count >= self.max_errors:
+            return True
+
+        print("[-] Error checking job status (%d/%d), retrying: %s"%(self.error_count, self.max_errors, err))
+
+        ##Back off after errors too so a failing API isn't hammered
+        self.delay = min(self.delay * self.backoff, self.overdue_max_delay)
+
+        return False
+
+
+    def handle_state(self, state, result):
+        """
+        Record the state reported by a successful status check
+
+        Returns
+        -------
+            bool: True if the job has completed
+
+        Raises
+        ------
+            jobFailedError: The job reported that it failed
+        """
+        self.error_count = 0
+
+        if self.progress:
+            self.progress(state)
+
+        if state == FAILED:
+            raise jobFailedError(result)
+
+        return state == COMPLETED
+
+
+    def time_to_next_check(self, start, check_start):
+        """
+        Work out how long to sleep before the next status check
+
+        Args
+        ----
+        start (float): Clock time when polling started
+        check_start (float): Clock time when the last check started
+
+        Returns
+        -------
+            float: Seconds to sleep
+
+        Raises
+        ------
+            jobTimeoutError: The deadline has passed
+        """
+        now = self.clock()
+        delay = self.next_delay(now - start)
+
+        ##The interval is measured from the start of the last check, so a slow (e.g. long-polling) check isn't followed by a full wait
+        delay = max(delay - (now - check_start), 0.0)
+
+        if self.deadline is not None:
+            remaining = self.deadline - (now - start)
+            if remaining <= 0:
+                raise jobTimeoutError("Job did not finish within %d seconds"%(self.deadline))
+            delay = min(delay, remaining)
+
+        return delay
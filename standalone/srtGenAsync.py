@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+
+#######################################################################
+##
+## Name: srtGenAsync.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+
+"""srtGen asyncio pipeline
+
+An asyncio version of the srtGen standalone pipeline, for transcribing
+very large numbers of files or for running as a long lived ingest
+daemon that watches a directory for new recordings.
+
+Every step of the pipeline is a coroutine: ffmpeg runs as an asyncio
+subprocess and the Transcribe job is waited on with asyncio.sleep, so
+thousands of jobs can be waiting on AWS Transcribe in one event loop
+without a thread per job. boto3 has no asyncio API so the blocking
+calls are run on thread pools: the silence detection of the extract
+stage and the S3 uploads each have a pool the size of their stage's
+limit, so they never queue behind each other, and the short Transcribe
+and S3 request/response calls share a pool of --io-workers threads.
+The transcribe stage's --max-jobs limit is on jobs in flight, their
+status checks are bounded by that shared pool rather than by the
+limit.
+
+Usage
+-----
+
+Transcribe a directory, glob pattern or manifest file (see the batch
+mode of `srtGen_standalone_cli.py`):
+
+```
+python3 srtGenAsync.py "talks/*.mp4" -s my-srtgen-transcription-bucket -o subtitles/
+```
+
+Or keep running and transcribe every recording that appears in a directory:
+
+```
+python3 srtGenAsync.py incoming/ --watch -s my-srtgen-transcription-bucket -o subtitles/
+```
+
+* `-o` - The directory to write the .srt files to (default is next to each input)
+* `-b` - Define the bitrate used to extract the audio from the video source (default depends on the profile, 48000 bps for mp3)
+* `--profile` - How the audio is extracted: `mp3`, `speech`, `opus` or `flac` (default is `mp3`, see srtGen_standalone_cli.py)
+* `--trim-silence` - Cut long pauses out of the audio before it is uploaded
+* `-p` - The AWS profile to use
+* `-s` - The name of the S3 bucket to upload the extracted audio to
+* `-d` - The maximum time in seconds to wait for each Transcribe job to finish (default is 6 hours)
+* `--extract-workers` - Number of ffmpeg audio extractions to run at once (default is the number of CPUs)
+* `--upload-workers` - Number of S3 uploads to run at once (default is 4)
+* `--max-jobs` - Number of Transcribe jobs to keep in flight at once (default is 100)
+* `--io-workers` - Number of threads shared by the short AWS API calls (default is 10)
+* `--watch` - Keep watching the input directory and transcribe new files as they appear
+* `--interval` - How often to scan the watched directory, in seconds (default is 10)
+* `--max-line-chars`, `--max-cue-duration`, `--min-gap`, `--split-pause` and `--phrase-length` - How the transcript is split into subtitles, see srtGen_standalone_cli.py
+* `--translate`, `--translate-align` and `--translation-memory-size` - Also write translated subtitles, see srtGen_standalone_cli.py
+* `--cache-dir` - Directory of the local cache of transcripts (default is ~/.srtgen/cache)
+* `--no-cache` - Don't use the local cache
+
+Classes
+-------
+
+    * srtGenAsync - Run the srtGen pipeline for many files in an asyncio event loop
+"""
+
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+import concurrent.futures
+
+import srtGen_standalone_cli
+from srtGen_standalone_cli import srtGenStandalone, srtGenError, expand_batch_inputs, ffmpeg_extract_command, MEDIA_EXTENSIONS, \
+    EXTRACTION_PROFILES, DEFAULT_PROFILE, add_cue_arguments, get_cue_limits, add_translate_arguments, get_translate_languages, \
+    get_translation_memory
+from contentCache import contentCache, DEFAULT_CACHE_DIR
+from jobPoller import jobPoller, jobFailedError, jobTimeoutError, DEFAULT_DEADLINE
+from transferUtils import HASH_CHUNK_SIZE
+
+
+class srtGenAsync(object):
+    """
+    Run the srtGen pipeline for many files concurrently in an asyncio
+    event loop. Each stage has its own concurrency limit, and a file
+    moves on to the next stage as soon as its previous stage finishes.
+
+    Methods
+    -------
+    transcribe()
+        Transcribe a single file
+
+    transcribe_many()
+        Transcribe a list of files
+
+    watch()
+        Transcribe new files as they appear in a directory, forever
+
+    close()
+        Shut down the thread pools
+    """
+
+    def __init__(self, sgs, extract_workers=None, upload_workers=4, max_jobs=100, io_workers=10):
+        """
+        Args
+        ----------
+        sgs (srtGenStandalone): Configured instance whose AWS clients
+        and settings are shared by every file
+        extract_workers (int): Number of ffmpeg extractions to run at
+        once (default is the number of CPUs)
+        upload_workers (int): Number of S3 uploads to run at once (default is 4)
+        max_jobs (int): Number of Transcribe jobs in flight at once,
+        keep this within the account's Transcribe concurrency quota
+        (default is 100)
+        io_workers (int): Number of threads shared by the short AWS API
+        calls, uploads have their own threads. There is no benefit in
+        going above the size of the boto3 connection pool (default is 10)
+        """
+        self.sgs = sgs
+        self.extract_workers = extract_workers or os.cpu_count()
+        self.upload_workers = upload_workers
+        self.max_jobs = max_jobs
+
+        ##Each stage that blocks for a long time gets threads to match its limit, the short calls share the io pool
+        self.extract_executor = concurrent.futures.ThreadPoolExecutor(self.extract_workers)
+        self.upload_executor = concurrent.futures.ThreadPoolExecutor(self.upload_workers)
+        self.executor = concurrent.futures.ThreadPoolExecutor(io_workers)
+
+        ##The semaphores are created by the event loop that uses them, see get_limits()
+        self.limits = None
+
+
+    def get_limits(self):
+        """
+        Create the per stage semaphores on first use, from inside the
+        running event loop
+
+        Returns
+        -------
+            tuple: The (extract, upload, transcribe) semaphores
+        """
+        if self.limits is None:
+            self.limits = (asyncio.Semaphore(self.extract_workers),
+                           asyncio.Semaphore(self.upload_workers),
+                           asyncio.Semaphore(self.max_jobs))
+        return self.limits
+
+
+    def close(self):
+        """
+        Shut down the thread pools
+        """
+        for executor in (self.extract_executor, self.upload_executor, self.executor):
+            executor.shutdown(wait=True)
+
+
+    async def run_in_executor(self, func, *args, executor=None):
+        """
+        Run a blocking function on a thread pool and wait for its
+        result, by default the pool used for AWS API calls
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor or self.executor, func, *args)
+
+
+    async def extract_audio(self, job):
+        """
+        Extract the audio of a file using an asyncio ffmpeg subprocess.
+        When trimming silence the pauses are found first, on the extract
+        stage's thread pool.
+
+        ffmpeg writes the audio to a pipe, which is written to the job's
+        audio file and hashed on the way (see run_ffmpeg_extract()), so
+        the audio doesn't need to be read again to name the job.
+
+        Args
+        ----
+        job (srtGenStandalone): The prepared instance for the file
+
+        Raises
+        ------
+            srtGenError: ffmpeg exited with an error
+        """
+        await self.run_in_executor(job.plan_audio, executor=self.extract_executor)
+
+        extract_cmd = ffmpeg_extract_command(srtGen_standalone_cli.FFMPEG_BIN_PATH, job.video_filepath, "pipe:1",
+                                             job.bitrate, job.profile, job.keep_intervals)
+        digest = hashlib.sha256()
+
+        process = await asyncio.create_subprocess_exec(*extract_cmd, stdout=asyncio.subprocess.PIPE)
+        with open(job.audio_filepath, "wb") as f:
+            while True:
+                chunk = await process.stdout.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+
+        returncode = await process.wait()
+
+        if returncode != 0:
+            print("[-] Error extracting audio from %s: ffmpeg exited with status %d"%(job.video_filepath, returncode))
+            raise srtGenError("ffmpeg exited with status %d"%(returncode))
+
+        job.use_content_hash(digest.hexdigest())
+
+
+    async def upload_audio_to_s3(self, job):
+        """
+        Upload the extracted audio to S3, see srtGenStandalone.upload_audio_to_s3()
+        """
+        await self.run_in_executor(job.upload_audio_to_s3, executor=self.upload_executor)
+
+
+    async def run_transcribe_job(self, job):
+        """
+        Start the Transcribe job, see srtGenStandalone.run_transcribe_job()
+        """
+        await self.run_in_executor(job.run_transcribe_job)
+
+
+    async def check_transcribe_job_status(self, job):
+        """
+        Get the state of the Transcribe job, see srtGenStandalone.check_transcribe_job_status()
+        """
+        return await self.run_in_executor(job.check_transcribe_job_status)
+
+
+    async def wait_for_transcribe_job_to_complete(self, job, media_duration=None):
+        """
+        Wait for the Transcribe job to finish, using the same adaptive
+        backoff as the standalone client but without holding a thread
+
+        Args
+        ----
+        job (srtGenStandalone): The instance that started the job
+        media_duration (float): Duration in seconds of the audio, used
+        to estimate when the job will finish [optional]
+
+        Raises
+        ------
+            srtGenError: The Transcribe job failed or did not finish
+            before the deadline
+        """
+        poller = jobPoller(lambda: self.check_transcribe_job_status(job),
+                           media_duration=media_duration,
+                           deadline=job.deadline)
+
+        try:
+            job.transcript_file_uri = await poller.wait_async()
+
+        except jobFailedError as err:
+            print("[-] Transcription job '%s' failed: %s"%(job.transcription_job_name, err))
+            raise srtGenError("Transcription job failed: %s"%(err))
+
+        except jobTimeoutError as err:
+            print("[-] Gave up waiting for transcription job '%s': %s"%(job.transcription_job_name, err))
+            raise srtGenError("Gave up waiting for the transcription job: %s"%(err))
+
+
+    async def download_transcript(self, job):
+        """
+        Download the transcript, see srtGenStandalone.download_transcript()
+        """
+        await self.run_in_executor(job.download_transcript)
+
+
+    async def generate_srt_file(self, job):
+        """
+        Write the .srt file, see srtGenStandalone.generate_srt_file()
+        """
+        await self.run_in_executor(job.generate_srt_file)
+
+
+    async def transcribe(self, in_filepath, srt_filepath, bitrate=None, timestamp=None):
+        """
+        Transcribe a single file
+
+        Args
+        ----------
+        in_filepath (str): Path to the video/audio file to transcribe
+        srt_filepath (str): Path where the generated .srt file should be written
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+        timestamp (str): Identifier used to make the names of the
+        uploaded audio and Transcribe job unique (default is the current time)
+
+        Returns
+        -------
+            bool: True on successful transcription, False in all other cases
+        """
+        extract_limit, upload_limit, transcribe_limit = self.get_limits()
+
+        job = self.sgs.clone()
+        job.prepare(in_filepath, srt_filepath, bitrate=bitrate, timestamp=timestamp)
+        stage = "extract"
+
+        try:
+            ##Media that was transcribed before, and hasn't changed since, doesn't even need its audio extracting
+            if await self.run_in_executor(job.use_cached_source) and await self.run_in_executor(job.reuse_cached_srt):
+                print("[+] Finished %s -> %s (cached)"%(in_filepath, job.srt_filepath))
+                return True
+
+            async with extract_limit:
+                await self.extract_audio(job)
+
+            ##The audio was hashed as it was extracted, if it has been transcribed before that's all there is to do
+            await self.run_in_executor(job.report_audio_size)
+            if await self.run_in_executor(job.reuse_cached_srt):
+                print("[+] Finished %s -> %s (cached)"%(in_filepath, job.srt_filepath))
+                return True
+
+            stage = "upload"
+            async with upload_limit:
+                await self.upload_audio_to_s3(job)
+
+            ##The local audio isn't needed once it is in S3, remove it now so thousands of waiting jobs don't fill the disk
+            media_duration = await self.run_in_executor(job.get_media_duration)
+            if job.tempfile_obj:
+                job.tempfile_obj.cleanup()
+                job.tempfile_obj = None
+
+            stage = "transcribe"
+            async with transcribe_limit:
+                await self.run_transcribe_job(job)
+                await self.wait_for_transcribe_job_to_complete(job, media_duration)
+                await self.download_transcript(job)
+                await self.generate_srt_file(job)
+
+        except Exception as err:
+            print("[-] Error transcribing %s during %s: %s"%(in_filepath, stage, err))
+            return False
+
+        print("[+] Finished %s -> %s"%(in_filepath, job.srt_filepath))
+        return True
+
+
+    async def transcribe_many(self, entries, bitrate=None):
+        """
+        Transcribe a list of files concurrently
+
+        Args
+        ----------
+        entries (list): (input path, srt path) tuples to transcribe,
+        see expand_batch_inputs()
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+
+        Returns
+        -------
+            dict: Maps each input path to True if it was transcribed
+            successfully, False otherwise
+        """
+        timestamp = str(time.time()).split(".")[0]
+
+        print("[+] Transcribing %d files (%d extractions, %d uploads, %d Transcribe jobs at a time)"%(len(entries), self.extract_workers, self.upload_workers, self.max_jobs))
+
+        outcomes = await asyncio.gather(*[self.transcribe(in_filepath, srt_filepath, bitrate, "%s-%d"%(timestamp, index))
+                                          for index, (in_filepath, srt_filepath) in enumerate(entries)])
+        results = dict(zip([in_filepath for in_filepath, _ in entries], outcomes))
+
+        print("[+] Batch complete: %d succeeded, %d failed"%(sum(results.values()), len(results) - sum(results.values())))
+
+        return results
+
+
+    async def watch(self, directory, srt_output_dir=None, bitrate=None, interval=10.0, max_retry_delay=3600.0):
+        """
+        Watch a directory and transcribe every media file that appears
+        in it. A file is picked up once its size has stopped changing
+        between two scans, so recordings still being written are left
+        alone. Files that already have a .srt file are skipped, so the
+        watcher can be restarted safely. A file that fails (e.g. because
+        of an S3 or Transcribe error) is tried again, waiting twice as
+        long after each failure. Runs until cancelled.
+
+        Args
+        ----------
+        directory (str): The directory to watch
+        srt_output_dir (str): Directory to write the .srt files to, by
+        default each .srt is written next to its input [optional]
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+        interval (float): Seconds between scans of the directory (default is 10)
+        max_retry_delay (float): The longest wait in seconds before a 
+        failed file is tried again (default is 3600)
+        """
+        directory = os.path.expandvars(os.path.expanduser(directory))
+        srt_dir = srt_output_dir or directory
+
+        print("[+] Watching %s for new files to transcribe (Ctrl-C to stop)"%(directory))
+
+        loop = asyncio.get_running_loop()
+        last_sizes = {}
+        started = set()
+        running = set()
+        failures = {}
+        retry_at = {}
+
+        async def transcribe(in_filepath, srt_filepath):
+            if await self.transcribe(in_filepath, srt_filepath, bitrate):
+                failures.pop(in_filepath, None)
+                retry_at.pop(in_filepath, None)
+                return
+
+            failures[in_filepath] = failures.get(in_filepath, 0) + 1
+            delay = min(interval * 2 ** failures[in_filepath], max_retry_delay)
+            retry_at[in_filepath] = loop.time() + delay
+            started.discard(in_filepath)
+            print("[-] Will try %s again in %d seconds"%(in_filepath, delay))
+
+        try:
+            while True:
+                sizes = {}
+                for entry in os.scandir(directory):
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                        sizes[entry.path] = entry.stat().st_size
+
+                for in_filepath, size in sorted(sizes.items()):
+                    if in_filepath in started or last_sizes.get(in_filepath) != size or loop.time() < retry_at.get(in_filepath, 0):
+                        continue
+
+                    srt_filepath = os.path.join(srt_dir, "%s.srt"%(os.path.splitext(os.path.basename(in_filepath))[0]))
+                    started.add(in_filepath)
+                    if os.path.exists(srt_filepath):
+                        continue
+
+                    print("[+] New file to transcribe: %s"%(in_filepath))
+                    task = asyncio.ensure_future(transcribe(in_filepath, srt_filepath))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+
+                last_sizes = sizes
+                await asyncio.sleep(interval)
+
+        finally:
+            for task in running:
+                task.cancel()
+
+
+## Implement a simple CLI
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_filepath", help="Directory, glob pattern or manifest file of the files to transcribe")
+    parser.add_argument("-o", "--srt-output", help="Directory to write the .srt subtitle files to, by default each is written next to its input")
+    parser.add_argument("-b", "--bitrate", type=int ,help="The bitrate ffmpeg will use to extract the audio from the source (default=the profile's, 48000 bps for mp3)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(EXTRACTION_PROFILES), help="How the audio is extracted: mp3 as is, or mono 16 kHz speech (mp3), opus or flac to shrink the upload (default=mp3)")
+    parser.add_argument("--trim-silence", action="store_true", help="Cut pauses longer than 2 seconds out of the audio before uploading it, subtitle times are mapped back to the source")
+    parser.add_argument("-p", "--aws-profile", help="AWS profile to use")
+    parser.add_argument("-s", "--s3-bucket", help="S3 bucket to upload extracted audio to for transcription")
+    parser.add_argument("-d", "--deadline", default=DEFAULT_DEADLINE, type=float, help="Maximum time in seconds to wait for each Transcribe job to finish (default=21600)")
+    parser.add_argument("--extract-workers", type=int, help="Number of audio extractions to run at once (default=number of CPUs)")
+    parser.add_argument("--upload-workers", default=4, type=int, help="Number of S3 uploads to run at once (default=4)")
+    parser.add_argument("--max-jobs", default=100, type=int, help="Number of Transcribe jobs to keep in flight at once (default=100)")
+    parser.add_argument("--io-workers", default=10, type=int, help="Number of threads shared by the short AWS API calls (default=10)")
+    parser.add_argument("--watch", action="store_true", help="Keep watching the input directory and transcribe new files as they appear")
+    parser.add_argument("--interval", default=10.0, type=float, help="Watch mode: seconds between scans of the directory (default=10)")
+    add_cue_arguments(parser)
+    add_translate_arguments(parser)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the local cache of transcripts (default=~/.srtgen/cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the local cache of transcripts")
+    args = parser.parse_args()
+
+    cue_limits = get_cue_limits(parser, args)
+    translate_languages = get_translate_languages(parser, args)
+
+    try:
+        cache = None if args.no_cache else contentCache(args.cache_dir)
+        sgs = srtGenStandalone(aws_profile=args.aws_profile, s3_bucket_name=args.s3_bucket, deadline=args.deadline, show_progress=False, cache=cache,
+                               phrase_length=args.phrase_length, profile=args.profile, trim_silence=args.trim_silence,
+                               cue_limits=cue_limits, translate_languages=translate_languages, translate_align=args.translate_align,
+                               translation_memory=get_translation_memory(args, cache))
+        pipeline = srtGenAsync(sgs, extract_workers=args.extract_workers, upload_workers=args.upload_workers, max_jobs=args.max_jobs, io_workers=args.io_workers)
+
+        if args.srt_output:
+            os.makedirs(args.srt_output, exist_ok=True)
+
+        try:
+            if args.watch:
+                asyncio.run(pipeline.watch(args.input_filepath, args.srt_output, bitrate=args.bitrate, interval=args.interval))
+            else:
+                entries = expand_batch_inputs(args.input_filepath, args.srt_output)
+                results = asyncio.run(pipeline.transcribe_many(entries, bitrate=args.bitrate))
+                if not all(results.values()):
+                    sys.exit(1)
+        finally:
+            pipeline.close()
+
+    except KeyboardInterrupt:
+        print("\n[+] Stopped")
+
+    except srtGenError as err:
+        sys.exit(-1)
+
+    sys.exit(0)
@@ -31,12 +31,45 @@ python 3  srtGen_standalone_cli.py movie_to_transcribe.mov -s my-srtgen-transcri
 There are a number of commandline options to control the script's execution:
 
 * `-o` - The file that the generatwed subtitles should be saved to
-* `-b` - Define the bitrate used to extract the audio from the video source (default is 48000 bps)
+* `-b` - Define the bitrate used to extract the audio from the video source (default depends on the profile, 48000 bps for mp3)
+* `--profile` - How the audio is extracted: `mp3` (as is, the default), `speech` (mono 16 kHz mp3), `opus` (mono 16 kHz Ogg Opus) or `flac` (mono 16 kHz lossless)
+* `--trim-silence` - Cut pauses longer than 2 seconds out of the audio before it is uploaded, the subtitle times are mapped back to the original
 * `-m` - Path to save the extracted mp3 audio to, if no path is supplied a temporary file is used and deleted upon completion
 * `-p` - The AWS profile to use. If you need to use non default credentials supply the name of the profile with this switch
 * `-s` - The name of the S3 bucket to upload the extracted audio to
+* `-d` - The maximum time in seconds to wait for the Transcribe job to finish (default is 6 hours)
+* `--stream` - Stream the audio from ffmpeg straight into a multipart S3 upload rather than writing it to a local mp3 first
+* `--part-size` - Size in MB of each part of the multipart S3 upload (default is 8)
+* `--upload-concurrency` - Number of parts of a file to upload in parallel (default is 4)
+* `--max-line-chars` - Most characters on each line of a subtitle (default is 42), subtitles have up to 2 lines
+* `--max-cue-duration` - Longest time in seconds a subtitle is shown for (default is 7)
+* `--min-gap` - Shortest gap in seconds between one subtitle and the next (default is 0.08)
+* `--split-pause` - A pause in seconds in the speech this long always starts a new subtitle (default is 1)
+* `--phrase-length` - Put this many words and punctuation marks in each subtitle instead of the above (the old fixed split of 10)
+* `--translate` - Comma separated language codes (e.g. `es,fr`) to also write translated subtitles for, as `<srt name>.<code>.srt` with the same timing
+* `--translate-align` - Translate each `sentence` and share its words out between the sentence's subtitles (the default), or each `cue` on its own
+* `--translation-memory-size` - Size in MB of the translation memory kept in the cache directory, sentences translated before aren't sent to Translate again (default is 64)
+* `--cache-dir` - Directory of the local cache of transcripts (default is ~/.srtgen/cache)
+* `--cache-ttl` - Days before a cache entry expires (default is 30)
+* `--cache-max-entries` - Number of cache entries to keep, the least recently used are evicted (default is 1000)
+* `--no-cache` - Don't use the local cache
+* `--rerender` - Render the .srt again from the cached transcript, e.g. with a different `--max-line-chars`, without any network calls
+* `--chunks` - Split the audio at silences into this many chunks and transcribe them as parallel Transcribe jobs (default is 1, no splitting)
 * `-v` - Verbose output
 
+Many files can be transcribed concurrently in batch mode, in which case the input is a directory, a
+glob pattern (quote it so the shell doesn't expand it) or a manifest file listing one input per line,
+optionally followed by a comma and the path of the .srt to write:
+
+```
+python3 srtGen_standalone_cli.py --batch "talks/*.mp4" -s my-srtgen-transcription-bucket -o subtitles/
+```
+
+* `--batch` - Treat the input as a directory, glob or manifest, `-o` is then the directory to write the .srt files to (default is next to each input)
+* `--extract-workers` - Number of ffmpeg audio extractions to run in parallel (default is the number of CPUs)
+* `--upload-workers` - Number of S3 uploads to run in parallel (default is 4)
+* `--max-jobs` - Number of Transcribe jobs to keep in flight at once (default is 20)
+
 Classes
 -------
 
@@ -44,30 +77,85 @@ This script can also be used as a module and contains the following
 classes:
 
     * srtGenStandalone - Class that wraps all the functionality of transcription
+    * srtGenBatch - Class that runs many srtGenStandalone transcriptions concurrently
     * srtGenError - Generic exception handler
 
+and functions:
+
+    * rerender_from_cache - Write the .srt for a file from its cached transcript, offline
+
 Attributes
 ----------
 FFMPEG_BIN_PATH (str): Path to the local ffpmeg binary that is used for 
 audio extraction (default is 'ffmpeg')
+MEDIA_EXTENSIONS (tuple): File extensions picked up when a directory is 
+transcribed in batch mode
+SILENCE_NOISE (str): Level below which ffmpeg's silencedetect treats
+audio as silence when looking for where to split it into chunks
+SILENCE_MIN_DURATION (float): Shortest silence in seconds to split at
+EXTRACTION_PROFILES (dict): The ways the audio can be extracted, by name
+DEFAULT_PROFILE (str): The profile used by default, an mp3 of the 
+source's channels and sample rate
+TRIM_MIN_SILENCE (float): Shortest pause in seconds that is cut out when
+trimming silence
+TRIM_PADDING (float): Seconds of each trimmed pause that are kept at 
+either side of it
 """
 
 ##Location of ffmpeg binary to use for audio extraction
 FFMPEG_BIN_PATH = "ffmpeg"
 ## -----------------------------------------------------
 
+##Files picked up from a directory in batch mode
+MEDIA_EXTENSIONS = (".mov", ".mp4", ".m4v", ".mkv", ".avi", ".webm", ".mp3", ".m4a", ".wav", ".flac", ".ogg")
+
+##What counts as a pause to split the audio at in chunked mode
+SILENCE_NOISE = "-30dB"
+SILENCE_MIN_DURATION = 0.5
+
+##How the audio can be extracted. 'format' and 'codec' are ffmpeg's output format and encoder (None for
+##its default), 'media_format' is the Transcribe MediaFormat, 'channels' and 'sample_rate' are None to
+##keep the source's, and 'bitrate' is the default bitrate, None for lossless formats which don't have one.
+##Transcribe only needs speech quality audio, so mono 16 kHz files are a fraction of the size
+EXTRACTION_PROFILES = {
+    "mp3": {"format": "mp3", "codec": None, "extension": "mp3", "media_format": "mp3",
+            "channels": None, "sample_rate": None, "bitrate": 48000},
+    "speech": {"format": "mp3", "codec": None, "extension": "mp3", "media_format": "mp3",
+               "channels": 1, "sample_rate": 16000, "bitrate": 32000},
+    "opus": {"format": "ogg", "codec": "libopus", "extension": "ogg", "media_format": "ogg",
+             "channels": 1, "sample_rate": 16000, "bitrate": 24000},
+    "flac": {"format": "flac", "codec": "flac", "extension": "flac", "media_format": "flac",
+             "channels": 1, "sample_rate": 16000, "bitrate": None},
+}
+DEFAULT_PROFILE = "mp3"
+
+##Pauses cut out of the audio with --trim-silence, some of each pause is kept so words aren't clipped
+TRIM_MIN_SILENCE = 2.0
+TRIM_PADDING = 0.25
+
 import os
+import re
 import sys
+import csv
+import copy
+import glob
+import hashlib
 import time
 import argparse
 import tempfile
 import subprocess
 import urllib.request
+import concurrent.futures
 
 import boto3
 from botocore.exceptions import ClientError
 
-from srtUtils import writeTranscriptToSRT
+from srtUtils import writeTranscriptToSRT, writeTranslationsToSRT, mergeTranscripts, remapTranscript, CueLimits, \
+    CUE_MAX_LINE_CHARS, CUE_MAX_DURATION_MS, CUE_MIN_GAP_MS, CUE_SPLIT_PAUSE_MS, TRANSLATE_ALIGN_SENTENCE, TRANSLATE_ALIGN_CUE
+from transferUtils import multipartUploader, transferProgress, hashingReader, hash_file, DEFAULT_PART_SIZE, HASH_CHUNK_SIZE
+from contentCache import contentCache, DEFAULT_CACHE_DIR, DEFAULT_TTL, DEFAULT_MAX_ENTRIES
+from translationMemory import translationMemory, DEFAULT_FILENAME as TRANSLATION_MEMORY_FILENAME, DEFAULT_MAX_BYTES as TRANSLATION_MEMORY_MAX_BYTES
+from jobPoller import jobPoller, jobFailedError, jobTimeoutError, RUNNING, COMPLETED, FAILED, DEFAULT_DEADLINE
 
 class srtGenError(Exception):
     """
@@ -76,23 +164,567 @@ class srtGenError(Exception):
     pass
 
 
+def ffmpeg_extract_command(ffmpeg_bin_path, video_filepath, audio_filepath, bitrate, profile=DEFAULT_PROFILE, keep=None):
+    """
+    Build the ffmpeg command line that extracts the audio stream from a
+    video file with one of the EXTRACTION_PROFILES
+
+    Args
+    ----
+    ffmpeg_bin_path (str): Path to the ffmpeg binary
+    video_filepath (str): Path to the video/audio file to extract from
+    audio_filepath (str): Path to write the audio to
+    bitrate (int): The bitrate to encode at, ignored by lossless profiles
+    profile (str): Name of the extraction profile (default is DEFAULT_PROFILE)
+    keep (list): (start, end) times in seconds of the parts of the audio
+    to keep, see plan_silence_trim(), None to keep all of it [optional]
+
+    Returns
+    -------
+        list: The command and its arguments
+    """
+    settings = EXTRACTION_PROFILES[profile]
+
+    extract_cmd = [ffmpeg_bin_path, "-y", "-loglevel", "error", "-stats", "-i", video_filepath]
+
+    if keep:
+        ##Drop the audio outside the kept parts, then close the gaps in the timestamps
+        select = "+".join("between(t,%.3f,%.3f)"%(start, end) for start, end in keep)
+        extract_cmd += ["-af", "aselect='%s',asetpts=N/SR/TB"%(select)]
+
+    extract_cmd += ["-f", settings["format"]]
+
+    if settings["codec"]:
+        extract_cmd += ["-c:a", settings["codec"]]
+    if settings["channels"]:
+        extract_cmd += ["-ac", str(settings["channels"])]
+    if settings["sample_rate"]:
+        extract_cmd += ["-ar", str(settings["sample_rate"])]
+    if settings["bitrate"]:
+        extract_cmd += ["-ab", str(bitrate or settings["bitrate"])]
+
+    return extract_cmd + ["-vn", audio_filepath]
+
+
+def run_ffmpeg_extract(ffmpeg_bin_path, video_filepath, audio_filepath, bitrate, profile=DEFAULT_PROFILE, keep=None):
+    """
+    Extract the audio stream from a video file, see ffmpeg_extract_command().
+    This is a module level function so that it can also be run in a
+    separate process in batch mode.
+
+    ffmpeg writes the audio to a pipe and this function writes it to 
+    audio_filepath, hashing it on the way so the audio doesn't need
+    to be read again to find its hash.
+
+    Args
+    ----
+    ffmpeg_bin_path (str): Path to the ffmpeg binary
+    video_filepath (str): Path to the video/audio file to extract from
+    audio_filepath (str): Path to write the audio to
+    bitrate (int): The bitrate to encode at, ignored by lossless profiles
+    profile (str): Name of the extraction profile (default is DEFAULT_PROFILE)
+    keep (list): The parts of the audio to keep [optional]
+
+    Returns
+    -------
+        str: The SHA-256 hex digest of the extracted audio
+
+    Raises
+    ------
+        subprocess.CalledProcessError: There was an error running the ffmpeg command
+    """
+    extract_cmd = ffmpeg_extract_command(ffmpeg_bin_path, video_filepath, "pipe:1", bitrate, profile, keep)
+    digest = hashlib.sha256()
+
+    with subprocess.Popen(extract_cmd, stdout=subprocess.PIPE) as process, open(audio_filepath, "wb") as f:
+        for chunk in iter(lambda: process.stdout.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+
+    if process.returncode != 0:
+        err = subprocess.CalledProcessError(process.returncode, extract_cmd)
+        print("[-] Error extracting audio: %s"%(err))
+        raise err
+
+    return digest.hexdigest()
+
+
+def detect_silences(ffmpeg_bin_path, audio_filepath, noise=SILENCE_NOISE, min_duration=SILENCE_MIN_DURATION):
+    """
+    Find the silences in an audio file with ffmpeg's silencedetect filter
+
+    Args
+    ----
+    ffmpeg_bin_path (str): Path to the ffmpeg binary
+    audio_filepath (str): Path of the audio to analyse
+    noise (str): Level below which the audio counts as silence (default
+    is SILENCE_NOISE)
+    min_duration (float): Shortest silence to report in seconds 
+    (default is SILENCE_MIN_DURATION)
+
+    Returns
+    -------
+        tuple: (duration, silences) where duration is the length of the
+        audio in seconds, None if ffmpeg didn't report it, and silences
+        is a list of (start, end) times in seconds
+
+    Raises
+    ------
+        subprocess.CalledProcessError: There was an error running the ffmpeg command
+    """
+    detect_cmd = [ffmpeg_bin_path, "-hide_banner", "-nostats", "-i", audio_filepath,
+                  "-af", "silencedetect=noise=%s:d=%s"%(noise, min_duration), "-f", "null", "-"]
+
+    ##silencedetect reports on stderr, along with the input's duration
+    output = subprocess.run(detect_cmd, capture_output=True, text=True, check=True).stderr
+
+    duration = parse_duration(output)
+
+    silences = []
+    start = None
+    for name, value in re.findall(r"silence_(start|end): (-?\d+(?:\.\d+)?)", output):
+        if name == "start":
+            start = max(float(value), 0.0)
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+
+    ##Silence that runs to the end of the audio has no silence_end
+    if start is not None and duration:
+        silences.append((start, duration))
+
+    return duration, silences
+
+
+def parse_duration(ffmpeg_output):
+    """
+    Returns
+    -------
+        float: The duration in seconds of the input reported in ffmpeg's
+        output, None if there isn't one
+    """
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", ffmpeg_output)
+    if not match:
+        return None
+
+    return int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+
+
+def probe_duration(ffmpeg_bin_path, media_filepath):
+    """
+    Get the duration of a media file from ffmpeg, without decoding it
+
+    Returns
+    -------
+        float: The duration in seconds, None if ffmpeg doesn't report it
+    """
+    ##With no output file ffmpeg just describes the input, and exits with an error
+    output = subprocess.run([ffmpeg_bin_path, "-hide_banner", "-i", media_filepath], capture_output=True, text=True).stderr
+
+    return parse_duration(output)
+
+
+def plan_silence_trim(silences, duration, min_silence=TRIM_MIN_SILENCE, padding=TRIM_PADDING):
+    """
+    Work out which parts of some audio to keep when cutting out its long
+    pauses, and the remap table that maps times in the trimmed audio 
+    back to the original (see srtUtils.remapTranscript)
+
+    Args
+    ----
+    silences (list): (start, end) times in seconds of the silences in
+    the audio, see detect_silences()
+    duration (float): Length of the audio in seconds
+    min_silence (float): Shortest pause to cut out (default is TRIM_MIN_SILENCE)
+    padding (float): Seconds of each pause kept at either side of it,
+    except at the very start and end (default is TRIM_PADDING)
+
+    Returns
+    -------
+        tuple: (keep, remap) where keep is a list of the (start, end) 
+        times to keep and remap is a list of (trimmed start, original
+        start) times of each kept part
+    """
+    keep = []
+    position = 0.0
+
+    for start, end in silences:
+        if end - start < min_silence:
+            continue
+
+        cut_start = start + padding if start > 0.0 else 0.0
+        cut_end = end - padding if end < duration else duration
+
+        if cut_start > position:
+            keep.append((position, cut_start))
+        position = max(position, cut_end)
+
+    if position < duration:
+        keep.append((position, duration))
+
+    remap = []
+    trimmed = 0.0
+    for start, end in keep:
+        remap.append((trimmed, start))
+        trimmed += end - start
+
+    return keep, remap
+
+
+def find_trim_plan(ffmpeg_bin_path, media_filepath):
+    """
+    Find the long pauses in a media file's audio and plan how to trim 
+    them, see plan_silence_trim()
+
+    Returns
+    -------
+        tuple: (keep, remap), both None if there is nothing to trim
+    """
+    duration, silences = detect_silences(ffmpeg_bin_path, media_filepath, min_duration=TRIM_MIN_SILENCE)
+    if not duration:
+        return None, None
+
+    keep, remap = plan_silence_trim(silences, duration)
+    if sum(end - start for start, end in keep) >= duration:
+        return None, None
+
+    return keep, remap
+
+
+def choose_split_points(silences, duration, chunks):
+    """
+    Choose where to split audio into roughly equal chunks. Each split
+    is in the middle of the silence nearest to where an even split 
+    would be, so no word is cut in two, or at the even split itself if
+    there's no silence within half a chunk of it.
+
+    Args
+    ----
+    silences (list): (start, end) times in seconds of the silences in
+    the audio, see detect_silences()
+    duration (float): Length of the audio in seconds
+    chunks (int): Number of chunks to split the audio into
+
+    Returns
+    -------
+        list: The times in seconds to split at, in ascending order
+    """
+    chunk_duration = duration / chunks
+    midpoints = [(start + end) / 2.0 for start, end in silences]
+
+    split_points = []
+    for index in range(1, chunks):
+        target = index * chunk_duration
+        nearest = min(midpoints, key=lambda midpoint: abs(midpoint - target), default=None)
+
+        if nearest is None or abs(nearest - target) > chunk_duration / 2.0:
+            nearest = target
+
+        split_points.append(nearest)
+
+    ##Two targets can share their nearest silence
+    return sorted(point for point in set(split_points) if 0.0 < point < duration)
+
+
+def split_audio(ffmpeg_bin_path, audio_filepath, split_points, out_dir, extension="mp3"):
+    """
+    Split an audio file at the given times with ffmpeg's segment muxer,
+    without re-encoding it
+
+    Args
+    ----
+    ffmpeg_bin_path (str): Path to the ffmpeg binary
+    audio_filepath (str): Path of the audio to split
+    split_points (list): The times in seconds to split at
+    out_dir (str): Directory to write the chunks to
+    extension (str): Extension of the audio, which sets the format of
+    the chunks (default is "mp3")
+
+    Returns
+    -------
+        list: (filepath, start) tuples for each chunk, where start is the
+        time in seconds the chunk starts at within the audio. Compressed
+        audio can only be cut between frames so this is the actual start
+        reported by ffmpeg, which can differ slightly from the split point
+
+    Raises
+    ------
+        subprocess.CalledProcessError: There was an error running the ffmpeg command
+    """
+    if not split_points:
+        return [(audio_filepath, 0.0)]
+
+    list_filepath = os.path.join(out_dir, "chunks.csv")
+    split_cmd = [ffmpeg_bin_path, "-y", "-loglevel", "error", "-i", audio_filepath, "-map", "0:a", "-c", "copy",
+                 "-f", "segment", "-segment_times", ",".join("%.3f"%(point) for point in split_points),
+                 "-segment_list", list_filepath, "-segment_list_type", "csv",
+                 os.path.join(out_dir, "chunk%%03d.%s"%(extension))]
+
+    subprocess.run(split_cmd, capture_output=False, check=True)
+
+    ##Each row of the segment list is: filename, start time, end time
+    with open(list_filepath, newline="") as f:
+        return [(os.path.join(out_dir, row[0]), float(row[1])) for row in csv.reader(f) if row]
+
+
+def write_srt_from_transcript_file(transcript_filepath, srt_filepath, phrase_length=None, cue_limits=None):
+    """
+    Render a .srt subtitle file from a Transcribe JSON file, the 
+    transcript is parsed as it is read rather than loaded whole. See
+    srtGenStandalone for phrase_length and cue_limits.
+    """
+    print("[+] Creating srt file and writing to: %s"%(srt_filepath))
+
+    with open(transcript_filepath, "rb") as f:
+        writeTranscriptToSRT(f, 'en', srt_filepath, atomic=True, phraseLength=phrase_length, limits=cue_limits)
+
+
+def add_cue_arguments(parser):
+    """
+    Add the options that control how the transcript is split into 
+    subtitles to an argparse parser, see get_cue_limits()
+    """
+    parser.add_argument("--max-line-chars", default=CUE_MAX_LINE_CHARS, type=int, help="Most characters on each line of a subtitle, subtitles have up to 2 lines (default=42)")
+    parser.add_argument("--max-cue-duration", default=CUE_MAX_DURATION_MS / 1000.0, type=float, help="Longest time in seconds a subtitle is shown for (default=7)")
+    parser.add_argument("--min-gap", default=CUE_MIN_GAP_MS / 1000.0, type=float, help="Shortest gap in seconds between one subtitle and the next (default=0.08)")
+    parser.add_argument("--split-pause", default=CUE_SPLIT_PAUSE_MS / 1000.0, type=float, help="A pause in the speech of this many seconds always starts a new subtitle (default=1)")
+    parser.add_argument("--phrase-length", type=int, help="Put this many words and punctuation marks in each subtitle instead, the old fixed split used 10")
+
+
+def get_cue_limits(parser, args):
+    """
+    Check the options added by add_cue_arguments()
+
+    Returns
+    -------
+        srtUtils.CueLimits: The limits to split the transcript into 
+        subtitles with
+    """
+    if args.phrase_length is not None and args.phrase_length < 1:
+        parser.error("--phrase-length must be at least 1")
+
+    if args.max_line_chars < 1 or args.max_cue_duration <= 0 or args.min_gap < 0 or args.split_pause <= 0:
+        parser.error("--max-line-chars, --max-cue-duration and --split-pause must be positive and --min-gap can't be negative")
+
+    return CueLimits(maxLineChars=args.max_line_chars, maxDurationMs=int(args.max_cue_duration * 1000),
+                     minGapMs=int(args.min_gap * 1000), splitPauseMs=int(args.split_pause * 1000))
+
+
+def add_translate_arguments(parser):
+    """
+    Add the options that ask for translated subtitles to an argparse 
+    parser, see get_translate_languages()
+    """
+    parser.add_argument("--translate", help="Comma separated language codes (e.g. es,fr) to also write translated subtitles for, as <srt name>.<code>.srt with the same timing")
+    parser.add_argument("--translate-align", default=TRANSLATE_ALIGN_SENTENCE, choices=(TRANSLATE_ALIGN_SENTENCE, TRANSLATE_ALIGN_CUE), help="Translate each sentence and share it out between its subtitles, or each subtitle on its own (default=sentence)")
+    parser.add_argument("--translation-memory-size", default=TRANSLATION_MEMORY_MAX_BYTES // (1024 * 1024), type=int, help="Size in MB of the memory of earlier translations kept in the cache directory, the least recently used are evicted (default=64)")
+
+
+def get_translate_languages(parser, args):
+    """
+    Check the options added by add_translate_arguments()
+
+    Returns
+    -------
+        list: The language codes to translate the subtitles into, empty
+        if none were asked for
+    """
+    if not args.translate:
+        return []
+
+    languages = [language.strip() for language in args.translate.split(",") if language.strip()]
+    if not languages:
+        parser.error("--translate needs at least one language code, e.g. --translate es,fr")
+
+    if args.translation_memory_size < 1:
+        parser.error("--translation-memory-size must be at least 1")
+
+    return languages
+
+
+def get_translation_memory(args, cache):
+    """
+    Open the translation memory kept alongside the cache, if there are
+    subtitles to translate and the cache is in use
+
+    Returns
+    -------
+        translationMemory: The translation memory, None if it isn't used
+    """
+    if cache is None or not args.translate:
+        return None
+
+    return translationMemory(cache.path(TRANSLATION_MEMORY_FILENAME), max_bytes=args.translation_memory_size * 1024 * 1024)
+
+
+def translated_srt_filepath(srt_filepath, language):
+    """
+    Return the path of the translated subtitles for an .srt file, e.g.
+    'movie.es.srt' for 'movie.srt' in Spanish
+    """
+    return "%s.%s.srt"%(os.path.splitext(srt_filepath)[0], language)
+
+
+def rerender_from_cache(cache, in_filepath, srt_filepath, bitrate=None, phrase_length=None,
+                        profile=DEFAULT_PROFILE, trim_silence=False, cue_limits=None):
+    """
+    Write the .srt for a media file from its cached transcript, making
+    no network calls, so subtitle layout settings can be tried out 
+    without running the Transcribe job again
+
+    The cached transcript is found from the media file's path, size 
+    and modification time. Failing that the audio is extracted (with
+    the same settings as when it was transcribed) and hashed locally.
+
+    Args
+    ----
+    cache (contentCache): The cache the transcript was saved to
+    in_filepath (str): Path to the video/audio file that was transcribed
+    srt_filepath (str): Path where the .srt file should be written
+    bitrate (int): The bitrate the audio was extracted with (default is
+    the profile's bitrate)
+    phrase_length (int): Number of transcript items in each subtitle,
+    instead of splitting the transcript with cue_limits [optional]
+    profile (str): The extraction profile the audio was extracted with
+    (default is DEFAULT_PROFILE)
+    trim_silence (bool): Whether pauses were cut out of the audio 
+    (default is False)
+    cue_limits (srtUtils.CueLimits): The limits to split the transcript
+    into subtitles with (default is CueLimits())
+
+    Returns
+    -------
+        bool: True if the .srt was written, False if there is no cached
+        transcript for the file
+    """
+    audio_hash = cache.find_source(in_filepath)
+
+    if audio_hash is None:
+        print("[+] %s is not in the cache index, hashing its audio"%(in_filepath))
+
+        keep = find_trim_plan(FFMPEG_BIN_PATH, in_filepath)[0] if trim_silence else None
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            audio_hash = run_ffmpeg_extract(FFMPEG_BIN_PATH, in_filepath, os.path.join(tmp_dir, "audio"), bitrate, profile, keep)
+
+    transcript_filepath = cache.get_file(audio_hash, "json")
+    if transcript_filepath is None:
+        print("[-] There is no cached transcript for %s"%(in_filepath))
+        return False
+
+    cache.add_source(audio_hash, in_filepath)
+    write_srt_from_transcript_file(transcript_filepath, srt_filepath, phrase_length, cue_limits)
+
+    return True
+
+
+def expand_batch_inputs(batch_input, srt_output_dir=None):
+    """
+    Work out the files to transcribe in batch mode and where to write
+    each .srt file
+
+    Args
+    ----
+    batch_input (str): A directory (all media files in it are used), a
+    manifest file (.txt/.lst/.csv, one input per line optionally 
+    followed by a comma and the .srt path) or a glob pattern
+    srt_output_dir (str): Directory to write the .srt files to, by 
+    default each .srt is written next to its input [optional]
+
+    Returns
+    -------
+        list: (input path, srt path) tuples
+
+    Raises
+    ------
+        srtGenError: No input files were found
+    """
+    batch_input = os.path.expandvars(os.path.expanduser(batch_input))
+    entries = []
+
+    if os.path.isdir(batch_input):
+        for name in sorted(os.listdir(batch_input)):
+            if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS:
+                entries.append((os.path.join(batch_input, name), None))
+
+    elif os.path.isfile(batch_input) and os.path.splitext(batch_input)[1].lower() in (".txt", ".lst", ".csv"):
+        with open(batch_input) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                in_filepath, _, srt_filepath = line.partition(",")
+                entries.append((in_filepath.strip(), srt_filepath.strip() or None))
+
+    else:
+        entries = [(filepath, None) for filepath in sorted(glob.glob(batch_input))]
+
+    if not entries:
+        print("[-] No files to transcribe found for '%s'"%(batch_input))
+        raise srtGenError("No files to transcribe found for '%s'"%(batch_input))
+
+    resolved = []
+    for in_filepath, srt_filepath in entries:
+        if not srt_filepath:
+            srt_filename = "%s.srt"%(os.path.splitext(os.path.split(in_filepath)[-1])[0])
+            if srt_output_dir:
+                srt_filepath = os.path.join(srt_output_dir, srt_filename)
+            else:
+                srt_filepath = os.path.join(os.path.dirname(in_filepath), srt_filename)
+        resolved.append((in_filepath, srt_filepath))
+
+    return resolved
+
+
 class srtGenStandalone(object):
     """
     A class to wrap all the functionality required to extract audio, 
     upload to S3, schedule a Transcribe job, download the results, 
     and reformat into a .srt subtitle file.
 
+    The uploaded audio and the Transcribe job are named after the 
+    SHA-256 of the extracted audio, so audio that has been transcribed
+    before reuses the earlier upload and job, and with a contentCache
+    the earlier transcript.
+
     Methods
     -------
     extract_audio()
-        Extracts an mp3 audio file from the source file
+        Extracts the audio from the source file with the extraction profile
+
+    plan_audio()
+        Plan which pauses to cut out of the audio when trimming silence
 
     upload_audio_to_s3()
-        Uploads the extracted mp3 audio file to the S3 bucket
+        Uploads the extracted audio file to the S3 bucket
+
+    stream_audio_to_s3()
+        Extracts the audio and uploads it to the S3 bucket as it is
+        encoded, without writing it to disk
+
+    report_audio_size()
+        Print the size of the extracted audio
+
+    use_content_hash()
+        Name the upload and Transcribe job after the hash of the audio
+
+    use_cached_source()
+        Use the hash recorded in the cache for the source file, if any
+
+    reuse_cached_srt()
+        Render the .srt from the cached transcript if the audio has been
+        transcribed before
+
+    transcribe_chunked()
+        Split the audio into chunks, transcribe them in parallel and 
+        write the .srt from their merged transcripts
 
     run_transcribe_job()
         Configures and runs an AWS Transcribe job on the uploaded mp3
 
+    check_transcribe_job_status()
+        Get the current state of the Transcribe job
+
     wait_for_transcribe_job_to_complete()
         Polls the AWS Transcribe service to see if the Transcribe job 
         has completed
@@ -103,43 +735,165 @@ class srtGenStandalone(object):
     generate_srt_file()
         Generate a .srt formatted subtitle file from the Transcribe 
         results
+
+    write_translations()
+        Write translated subtitles for each of translate_languages
     """
 
-    def __init__(self, aws_profile, s3_bucket_name):
+    def __init__(self, aws_profile, s3_bucket_name, deadline=DEFAULT_DEADLINE, part_size=DEFAULT_PART_SIZE,
+                 upload_concurrency=4, show_progress=True, cache=None, phrase_length=None, chunks=1,
+                 profile=DEFAULT_PROFILE, trim_silence=False, cue_limits=None, translate_languages=None,
+                 translate_align=TRANSLATE_ALIGN_SENTENCE, translation_memory=None):
         """
         Args
         ----------
         aws_profile (str): The name of the AWS credential profile to use
         s3_bucket (str): The name of the S3 bucket to upload the mp3's to
+        deadline (float): The maximum time in seconds to wait for a 
+        Transcribe job to finish (default is 6 hours)
+        part_size (int): Size in bytes of each part of the multipart 
+        S3 upload (default is 8MB)
+        upload_concurrency (int): Number of parts to upload in parallel
+        (default is 4)
+        show_progress (bool): Print the upload progress and throughput
+        (default is True)
+        cache (contentCache): Local cache of transcripts keyed by the
+        hash of the audio [optional]
+        phrase_length (int): Number of transcript items in each subtitle,
+        instead of splitting the transcript with cue_limits [optional]
+        chunks (int): Number of chunks to split the audio into, each 
+        transcribed by its own Transcribe job in parallel (default is 1,
+        no splitting)
+        profile (str): Name of the EXTRACTION_PROFILES entry used to 
+        extract the audio (default is DEFAULT_PROFILE)
+        trim_silence (bool): Cut long pauses out of the audio before it
+        is uploaded, the transcript's times are mapped back to the 
+        source's (default is False)
+        cue_limits (srtUtils.CueLimits): The line length, duration and 
+        gap limits the transcript is split into subtitles with (default 
+        is CueLimits())
+        translate_languages (list): Language codes to also write 
+        translated subtitles in, next to the .srt [optional]
+        translate_align (str): How the translation is lined up with the
+        subtitles, see srtUtils.getTranslatedPhrases (default is 
+        TRANSLATE_ALIGN_SENTENCE)
+        translation_memory (translationMemory): Memory of earlier 
+        translations, only sentences not in it are sent to Translate
+        [optional]
         """
 
         session = boto3.Session(profile_name=aws_profile)
+        self.session = session
         self.s3_client = session.client("s3")
         self.transcribe_client = session.client("transcribe")
 
         self.s3_bucket_name = s3_bucket_name
+        self.deadline = deadline
+        self.part_size = part_size
+        self.upload_concurrency = upload_concurrency
+        self.show_progress = show_progress
+        self.cache = cache
+        self.phrase_length = phrase_length
+        self.cue_limits = cue_limits
+        self.translate_languages = translate_languages or []
+        self.translate_align = translate_align
+        self.translation_memory = translation_memory
+        self.chunks = chunks
+        self.profile = profile
+        self.trim_silence = trim_silence
 
         self.transcript_file_uri = ""
         self.transcription_data = None
         self.tempfile_obj = None
+        self.audio_size = None
+        self.audio_hash = None
+        self.audio_duration = None
+        self.keep_intervals = None
+        self.time_remap = None
 
 
-    def __call__(self, in_filepath, srt_filepath, mp3_filepath=None, bitrate=48000):
+    def __call__(self, in_filepath, srt_filepath, mp3_filepath=None, bitrate=None, stream=False):
         """
         Args
         ----------
         in_filepath (str): Path to the video/audio file to transcribe
         srt_filepath (str): Path where the generated .srt file should be written
-        mp3_filepath (str): Path where to save extracted mp3 file. If 
+        mp3_filepath (str): Path where to save extracted audio file. If 
         not specified termporary file used and deleted upon completion [optional]
-        bitrate (int): The bitrate to use for the extracted mp3 (deafult is 48000)
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+        stream (bool): Upload the audio while it is being extracted 
+        instead of writing it to a local mp3 first, mp3_filepath and
+        chunks are ignored (default is False)
 
         Returns
         -------
             bool: True on successful transcription, False in all other cases
         """
 
-        self.timestamp =  str(time.time()).split(".")[0]
+        self.prepare(in_filepath, srt_filepath, mp3_filepath, bitrate)
+
+        print("[+] Transcribing audio from source file at: %s"%(self.video_filepath))
+
+        try:
+
+            ##Media that was transcribed before, and hasn't changed since, doesn't even need its audio extracting
+            if self.use_cached_source() and self.reuse_cached_srt():
+                print("[+] Done!")
+                return True
+
+            if stream:
+                ##Extract the audio and upload it to S3 as it is encoded
+                self.stream_audio_to_s3()
+
+            else:
+                ##Extract audio and transcode to correct bitrate and mp3 format as necersary (external ffmpeg used)
+                self.extract_audio()
+
+            ##If this audio has been transcribed before there's nothing more to do
+            if self.reuse_cached_srt():
+                print("[+] Done!")
+                return True
+
+            if self.chunks > 1 and not stream:
+                ##Split the audio, transcribe the chunks in parallel and create the .srt subtitle file
+                self.transcribe_chunked()
+
+            else:
+                if not stream:
+                    ##Uplaod extracted aduio to specified S3 bucket
+                    self.upload_audio_to_s3()
+
+                ##Transcribe the audio and create the .srt subtitle file
+                self.transcribe_and_generate_srt()
+
+            print("[+] Done!")
+            return True
+
+        except Exception as err:
+            print("[-] Error encounted, %s \nexiting...."%(err))
+            return False
+
+
+    def prepare(self, in_filepath, srt_filepath, mp3_filepath=None, bitrate=None, timestamp=None):
+        """
+        Set up the paths and settings for transcribing a file, this is
+        done by __call__ and only needs calling directly when running
+        the individual steps separately (e.g. in batch mode)
+
+        Args
+        ----------
+        in_filepath (str): Path to the video/audio file to transcribe
+        srt_filepath (str): Path where the generated .srt file should be written
+        mp3_filepath (str): Path where to save extracted audio file. If 
+        not specified termporary file used and deleted upon completion [optional]
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+        timestamp (str): Identifier used to make the names of the 
+        uploaded audio and Transcribe job unique (default is the current time)
+        """
+
+        self.timestamp = timestamp or str(time.time()).split(".")[0]
 
         ##Location from which source video is taken
         self.video_filepath = os.path.expandvars(os.path.expanduser(in_filepath))
@@ -150,49 +904,176 @@ class srtGenStandalone(object):
         else:
             ##If no mp3 path specified, create tempfile
             self.tempfile_obj = tempfile.TemporaryDirectory()
-            self.audio_filepath = os.path.join(self.tempfile_obj.name, "%s_%s.mp3" % (os.path.splitext(os.path.split(self.video_filepath)[-1])[0], self.timestamp))
+            self.audio_filepath = os.path.join(self.tempfile_obj.name, "%s_%s.%s" % (os.path.splitext(os.path.split(self.video_filepath)[-1])[0], self.timestamp, self.get_extension()))
+
+        ##Key of the audio in the S3 bucket
+        self.s3_key = os.path.split(self.audio_filepath)[-1]
 
-        ##Bitrate to use for audio extraction
-        self.bitrate = bitrate
+        ##Bitrate to use for audio extraction, lossless profiles have none
+        self.bitrate = bitrate or EXTRACTION_PROFILES[self.profile]["bitrate"]
 
         ##Location to write .srt subtitle file to 
         self.srt_filepath = os.path.expandvars(os.path.expanduser(srt_filepath))
 
 
-        print("[+] Transcribing audio from source file at: %s"%(self.video_filepath))
+    def clone(self):
+        """
+        Create a new srtGenStandalone that shares this one's AWS clients
+        and settings but has its own per-file state, so that several 
+        files can be transcribed concurrently
 
-        try:
+        Returns
+        -------
+            srtGenStandalone: The new instance
+        """
+        other = copy.copy(self)
+        other.transcript_file_uri = ""
+        other.transcription_data = None
+        other.tempfile_obj = None
+        other.audio_size = None
+        other.audio_hash = None
+        other.audio_duration = None
+        other.keep_intervals = None
+        other.time_remap = None
 
-            ##Extract audio and transcode to correct bitrate and mp3 format as necersary (external ffmpeg used)
-            self.extract_audio()
+        return other
 
-            ##Uplaod extracted aduio to specified S3 bucket
-            self.upload_audio_to_s3()
 
-            ##Setup and run AWS Transcribe job using the uploaded audio file as the source
-            self.run_transcribe_job()
+    def get_extension(self):
+        """
+        Returns
+        -------
+            str: The file extension of audio extracted with the profile
+        """
+        return EXTRACTION_PROFILES[self.profile]["extension"]
 
-            ##Wait for the job to complete
-            self.wait_for_transcribe_job_to_complete()
 
-            ##Download the transcription results
-            self.download_transcript()
+    def transcribe_and_generate_srt(self):
+        """
+        Run the steps after the audio has been uploaded: transcribe it,
+        wait for the results, download them and write the .srt file
 
-            ##Create a subtitle file in the .srt format
-            self.generate_srt_file()
+        Returns
+        -------
+            bool: True on success
+        """
 
-            print("[+] Done!")
-            return True
+        ##Setup and run AWS Transcribe job using the uploaded audio file as the source
+        self.run_transcribe_job()
 
-        except Exception as err:
-            print("[-] Error encounted, %s \nexiting...."%(err))
-            return False
+        ##Wait for the job to complete
+        self.wait_for_transcribe_job_to_complete()
+
+        ##Download the transcription results
+        self.download_transcript()
+
+        ##Create a subtitle file in the .srt format
+        self.generate_srt_file()
+
+        return True
+
+
+    def transcribe_chunked(self):
+        """
+        Transcribe the extracted audio as several Transcribe jobs run in
+        parallel, so a long recording isn't held up in a single job. The
+        audio is split at the silences nearest to 'chunks' equal parts,
+        each chunk is uploaded and transcribed on its own thread, and 
+        the chunks' transcripts are merged, with their times shifted by
+        each chunk's start, before the .srt is written.
+
+        The chunks are named after the hash of the whole audio and their
+        position, so chunks that were uploaded or transcribed before are
+        reused like whole files are.
+
+        Returns
+        -------
+            bool: True on success
+
+        Raises
+        ------
+            subprocess.CalledProcessError: There was an error splitting the audio
+
+            srtGenError: A chunk's Transcribe job failed or did not 
+            finish before the deadline
+        """
+        if not self.audio_hash:
+            self.use_content_hash()
+
+        duration, silences = detect_silences(FFMPEG_BIN_PATH, self.audio_filepath)
+        split_points = choose_split_points(silences, duration or self.get_media_duration(), self.chunks)
+
+        with tempfile.TemporaryDirectory() as chunk_dir:
+            chunks = split_audio(FFMPEG_BIN_PATH, self.audio_filepath, split_points, chunk_dir, self.get_extension())
+
+            print("[+] Transcribing the audio as %d chunks in parallel (%d silences found)"%(len(chunks), len(silences)))
+
+            chunk_jobs = [self.clone_for_chunk(index, len(chunks), chunk_filepath) for index, (chunk_filepath, _) in enumerate(chunks)]
+
+            with concurrent.futures.ThreadPoolExecutor(len(chunk_jobs)) as pool:
+                transcripts = list(pool.map(srtGenStandalone.transcribe_chunk, chunk_jobs))
+
+        print("[+] Merging the transcripts of %d chunks"%(len(chunks)))
+        self.transcription_data = mergeTranscripts(transcripts, [start for _, start in chunks])
+        self.remap_transcript()
+        self.cache_transcript()
+
+        self.generate_srt_file()
+
+        return True
+
+
+    def clone_for_chunk(self, index, count, chunk_filepath):
+        """
+        Create the srtGenStandalone that transcribes one chunk of the 
+        audio, see transcribe_chunked()
+
+        Args
+        ----
+        index (int): Position of the chunk, from 0
+        count (int): Number of chunks the audio was split into
+        chunk_filepath (str): Path of the chunk's audio
+
+        Returns
+        -------
+            srtGenStandalone: The new instance
+        """
+        chunk = self.clone()
+
+        ##Only the merged transcript is cached (and remapped), and progress bars from parallel uploads would overwrite each other
+        chunk.cache = None
+        chunk.show_progress = False
+        chunk.trim_silence = False
+
+        chunk.audio_filepath = chunk_filepath
+        chunk.audio_hash = self.audio_hash
+        chunk.s3_key = "%s-%dof%d.%s"%(self.audio_hash, index + 1, count, self.get_extension())
+        chunk.transcription_job_name = "AutoSubGen_%s_%dof%d"%(self.audio_hash, index + 1, count)
+
+        return chunk
+
+
+    def transcribe_chunk(self):
+        """
+        Upload and transcribe one chunk of the audio, see transcribe_chunked()
+
+        Returns
+        -------
+            str: The chunk's Transcribe JSON
+        """
+        self.upload_audio_to_s3()
+        self.run_transcribe_job()
+        self.wait_for_transcribe_job_to_complete()
+        self.download_transcript()
+
+        return self.transcription_data
 
 
     def extract_audio(self):
         """
-        Extract an mp3 stream from a video file at the specified bitrate
-         (default 48 kbps).
+        Extract the audio stream from a video file with the extraction
+        profile (by default an mp3 at 48 kbps). When trimming silence
+        the long pauses are found first and cut out, see plan_audio().
 
         Note: all this function does is shell out to ffmpeg so that 
         needs to be installed and accessible on the system path or
@@ -211,24 +1092,204 @@ class srtGenStandalone(object):
         global FFMPEG_BIN_PATH
 
         print("[+] Using ffmpeg binary located at: %s"%(FFMPEG_BIN_PATH))
-        print("[+] Extracting %d kbps audio stream from %s"%(self.bitrate/1000.0, self.video_filepath))
+        self.plan_audio()
+
+        print("[+] Extracting %s audio stream from %s"%(self.describe_audio(), self.video_filepath))
 
         print("[+] Writing extracted audio to: %s" % (self.audio_filepath))
 
-        extract_cmd = [FFMPEG_BIN_PATH, "-y", "-loglevel", "error", "-stats", "-i", self.video_filepath, "-f", "mp3", "-ab", str(self.bitrate), "-vn", self.audio_filepath]
+        self.use_content_hash(run_ffmpeg_extract(FFMPEG_BIN_PATH, self.video_filepath, self.audio_filepath, self.bitrate, self.profile, self.keep_intervals))
+        self.report_audio_size()
+
+        return True
+
+
+    def plan_audio(self):
+        """
+        When trimming silence, find the long pauses in the source and 
+        plan which parts of its audio to keep, see plan_silence_trim().
+        Does nothing if silence isn't being trimmed or the plan has 
+        already been made.
+
+        Raises
+        ------
+            subprocess.CalledProcessError: There was an error running the ffmpeg command
+        """
+        if not self.trim_silence or self.time_remap is not None:
+            return
+
+        print("[+] Finding pauses to trim in %s"%(self.video_filepath))
+        self.use_trim_plan(*find_trim_plan(FFMPEG_BIN_PATH, self.video_filepath))
+
+
+    def use_trim_plan(self, keep, remap):
+        """
+        Set the parts of the audio to keep and how to map the 
+        transcript's times back to the source, see plan_silence_trim()
+        """
+        ##An empty remap marks that the plan has been made and there was nothing to trim
+        self.keep_intervals = keep
+        self.time_remap = remap or []
+
+        if keep:
+            self.audio_duration = sum(end - start for start, end in keep)
+            print("[+] Trimming %d pauses, %.1f seconds of audio remain"%(len(keep) - 1, self.audio_duration))
+
+
+    def describe_audio(self):
+        """
+        Returns
+        -------
+            str: A short description of the audio being extracted, e.g.
+            "48 kbps mp3"
+        """
+        settings = EXTRACTION_PROFILES[self.profile]
+
+        description = [settings["extension"]]
+        if self.bitrate:
+            description.insert(0, "%d kbps"%(self.bitrate/1000.0))
+        if settings["sample_rate"]:
+            description.insert(0, "%d kHz"%(settings["sample_rate"]/1000.0))
+        if settings["channels"] == 1:
+            description.insert(0, "mono")
+
+        return " ".join(description)
+
+
+    def report_audio_size(self):
+        """
+        Print the size of the extracted audio, and how much it takes 
+        per minute of audio, which is what the upload costs
+        """
+        try:
+            size = self.audio_size or os.path.getsize(self.audio_filepath)
+        except OSError:
+            return
+
+        duration = self.get_media_duration()
+        if not duration:
+            print("[+] Extracted audio is %.2f MB (%s profile)"%(size / 1e6, self.profile))
+            return
+
+        print("[+] Extracted audio is %.2f MB, %.0f KB per minute (%s profile)"%(size / 1e6, size / 1e3 / (duration / 60.0), self.profile))
+
+
+    def use_content_hash(self, audio_hash=None):
+        """
+        Name the S3 object and Transcribe job after the SHA-256 of the
+        audio, so the same audio always maps to the same upload and job
+
+        Args
+        ----
+        audio_hash (str): The SHA-256 hex digest of the audio, if not 
+        given the extracted audio is read to calculate it [optional]
+        """
+        self.audio_hash = audio_hash or hash_file(self.audio_filepath)
+
+        self.s3_key = "%s.%s"%(self.audio_hash, self.get_extension())
+        self.transcription_job_name = "AutoSubGen_%s"%(self.audio_hash)
+
+
+    def use_cached_source(self):
+        """
+        Look the source file up in the cache, if its audio has been 
+        hashed before (and the file hasn't changed since) use that hash
+        rather than extracting the audio to find it
+
+        Returns
+        -------
+            bool: True if the cache had the source file
+        """
+        audio_hash = self.cache and self.cache.find_source(self.video_filepath)
+        if not audio_hash:
+            return False
+
+        self.use_content_hash(audio_hash)
+
+        return True
+
+
+    def get_cached_transcript_filepath(self):
+        """
+        Returns
+        -------
+            str: Path of the cached Transcribe JSON for the same audio,
+            None if there isn't one
+        """
+        if not self.cache or not self.audio_hash:
+            return None
+
+        return self.cache.get_file(self.audio_hash, "json")
+
+
+    def reuse_cached_srt(self):
+        """
+        If the audio has been transcribed before render the .srt from 
+        the cached transcript, skipping the upload and Transcribe job
+        entirely
+
+        Returns
+        -------
+            bool: True if the cached transcript was used
+        """
+        transcript_filepath = self.get_cached_transcript_filepath()
+        if not transcript_filepath:
+            return False
+
+        print("[+] This audio has been transcribed before, using the cached transcript")
+        self.cache.add_source(self.audio_hash, self.video_filepath)
+        write_srt_from_transcript_file(transcript_filepath, self.srt_filepath, self.phrase_length, self.cue_limits)
+
+        if self.translate_languages:
+            with open(transcript_filepath, "rb") as f:
+                self.write_translations(f.read())
 
+        return True
+
+
+    def audio_in_s3(self):
+        """
+        Check whether the audio has already been uploaded. The key is 
+        the hash of the audio, so an object with that key holds the 
+        same audio.
+
+        Returns
+        -------
+            bool: True if the S3 bucket already has the audio
+        """
         try:
-            subprocess.run(extract_cmd, capture_output=False, check=True)
-        except subprocess.CalledProcessError as err:
-            print("[-] Error extracting audio: %s"%(err))
+            self.s3_client.head_object(Bucket=self.s3_bucket_name, Key=self.s3_key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
             raise
 
         return True
 
 
+    def get_uploader(self, total=None):
+        """
+        Create the multipart uploader used to send the audio to S3
+
+        Args
+        ----
+        total (int): Size in bytes of the audio, if known [optional]
+
+        Returns
+        -------
+            multipartUploader: The uploader
+        """
+        progress = transferProgress(total) if self.show_progress else None
+
+        return multipartUploader(self.s3_client, part_size=self.part_size, max_concurrency=self.upload_concurrency, progress=progress)
+
+
     def upload_audio_to_s3(self):
         """
-        Upload the extracted mp3 file to the specified S3 bucket
+        Upload the extracted audio file to the specified S3 bucket. The 
+        file is sent as a parallel multipart upload, and when the audio is
+        being kept (an audio path was given) an interrupted upload is 
+        resumed the next time the same file is transcribed.
 
         Returns
         -------
@@ -240,9 +1301,20 @@ class srtGenStandalone(object):
             uploading the file to the specified S3 bucket
         """
 
+        if not self.audio_hash:
+            self.use_content_hash()
+
+        if self.audio_in_s3():
+            print("[+] The S3 bucket already has this audio, skipping the upload")
+            return True
+
         print("[+] Uploading extracted audio to S3 bucket: %s (this may take some time) ....."%(self.s3_bucket_name))
+        ##Temporary mp3s don't outlive the process so there's nothing to resume
+        resume_filepath = None if self.tempfile_obj else "%s.upload.json"%(self.audio_filepath)
+        uploader = self.get_uploader(os.path.getsize(self.audio_filepath))
+
         try:
-            response = self.s3_client.upload_file(self.audio_filepath, self.s3_bucket_name, os.path.split(self.audio_filepath)[-1])
+            self.s3_key = uploader.upload_file(self.audio_filepath, self.s3_bucket_name, self.s3_key, resume_filepath=resume_filepath)
 
         except ClientError as err:
             print("[-] Error uploading extracted audio to S3 bucket '%s': %s"%(self.s3_bucket_name, err))
@@ -252,15 +1324,108 @@ class srtGenStandalone(object):
             print("[-] Unexpected error: %s"%(err))
             raise
 
+        finally:
+            if uploader.progress:
+                uploader.progress.finish()
+
         print("[+] Upload complete!")
 
         return True
 
 
+    def stream_audio_to_s3(self):
+        """
+        Extract the audio with ffmpeg and upload it to S3 while it
+        is being encoded. ffmpeg writes the audio to a pipe which is sent 
+        as an S3 multipart upload, each part being uploaded as soon as
+        it has been encoded, so nothing is written to disk and the 
+        encoding and upload overlap.
+
+        The audio is hashed as it is uploaded. Its hash is only known 
+        at the end, so it is uploaded under a temporary key and copied 
+        to the key named after the hash, or the upload is discarded if
+        the bucket or the cache already has the audio.
+
+        Returns
+        -------
+            bool: True on success
+
+        Raises
+        ------
+            subprocess.CalledProcessError: There was an error running the ffmpeg command
+
+            botocore.exceptions.ClientError : There was an error 
+            uploading the audio to the specified S3 bucket
+        """
+        global FFMPEG_BIN_PATH
+
+        self.plan_audio()
+
+        extract_cmd = ffmpeg_extract_command(FFMPEG_BIN_PATH, self.video_filepath, "pipe:1", self.bitrate, self.profile, self.keep_intervals)
+
+        print("[+] Streaming %s audio stream from %s to S3 bucket: %s ....."%(self.describe_audio(), self.video_filepath, self.s3_bucket_name))
+
+        upload_key = "incoming/%s"%(self.s3_key)
+        uploaded = []
+
+        with subprocess.Popen(extract_cmd, stdout=subprocess.PIPE) as process:
+            reader = hashingReader(process.stdout)
+
+            def check_ffmpeg():
+                ##Only complete the upload if ffmpeg encoded the whole file
+                process.stdout.close()
+                if process.wait() != 0:
+                    raise subprocess.CalledProcessError(process.returncode, extract_cmd)
+
+                self.use_content_hash(reader.hexdigest())
+
+                if self.get_cached_transcript_filepath() or self.audio_in_s3():
+                    print("\n[+] This audio has been uploaded before, discarding the upload")
+                    return False
+
+                uploaded.append(upload_key)
+                return True
+
+            uploader = self.get_uploader()
+
+            try:
+                self.audio_size = uploader.upload_stream(reader, self.s3_bucket_name, upload_key, on_eof=check_ffmpeg)
+
+            except subprocess.CalledProcessError as err:
+                print("[-] Error extracting audio: %s"%(err))
+                raise
+
+            except ClientError as err:
+                print("[-] Error uploading extracted audio to S3 bucket '%s': %s"%(self.s3_bucket_name, err))
+                process.kill()
+                raise
+
+            except Exception as err:
+                print("[-] Unexpected error: %s"%(err))
+                process.kill()
+                raise
+
+            finally:
+                if uploader.progress:
+                    uploader.progress.finish()
+
+        if uploaded:
+            ##Server side copy to the key named after the hash, a single copy works for mp3s of up to 5GB
+            self.s3_client.copy_object(Bucket=self.s3_bucket_name, Key=self.s3_key, CopySource={"Bucket": self.s3_bucket_name, "Key": upload_key})
+            self.s3_client.delete_object(Bucket=self.s3_bucket_name, Key=upload_key)
+
+        print("[+] Upload complete! (%d bytes)"%(self.audio_size))
+        self.report_audio_size()
+
+        return True
+
+
     def run_transcribe_job(self):
         """
         Configure and start an AWS Transcribe job using the uploaded
-        mp3 as the transcription source
+        audio as the transcription source. If there is already a job for
+        the same audio that is running or has completed it is used
+        instead, a failed job is deleted and started again.
 
         Returns
         -------
@@ -271,16 +1436,37 @@ class srtGenStandalone(object):
             botocore.exceptions.ClientError : There was an error
             setting up the AWS Transcribe job
         """
+        if not self.audio_hash:
+            self.use_content_hash()
+
+        try:
+            state, _ = self.check_transcribe_job_status()
+        except ClientError:
+            ##No job with this name
+            state = None
+
+        if state in (RUNNING, COMPLETED):
+            print("[+] Reusing the existing Transcribe job for this audio: %s"%(self.transcription_job_name))
+            return True
+
+        if state == FAILED:
+            print("[+] The previous Transcribe job for this audio failed, starting it again")
+            self.transcribe_client.delete_transcription_job(TranscriptionJobName=self.transcription_job_name)
 
         print("[+] Configurign and starting AWS Transcribe job")
-        self.transcription_job_name = "AutoSubGen-%s-%s"%(os.path.split(self.video_filepath)[-1], self.timestamp)
 
         try:
             response = self.transcribe_client.start_transcription_job(TranscriptionJobName=self.transcription_job_name,
                                                                       LanguageCode = "en-US",
-                                                                      Media={"MediaFileUri": "s3://%s/%s"%(self.s3_bucket_name, os.path.split(self.audio_filepath)[-1])},
+                                                                      MediaFormat=EXTRACTION_PROFILES[self.profile]["media_format"],
+                                                                      Media={"MediaFileUri": "s3://%s/%s"%(self.s3_bucket_name, self.s3_key)},
                                                                       ContentRedaction={'RedactionType': 'PII','RedactionOutput': 'redacted_and_unredacted'})
         except ClientError as err:
+            ##Another run started a job for the same audio in the meantime
+            if err.response["Error"]["Code"] == "ConflictException":
+                print("[+] Reusing the existing Transcribe job for this audio: %s"%(self.transcription_job_name))
+                return True
+
             print("[-] Error setting up transcription job. Check the lambda has the correct Transcribe permissions. %s"%(err))
             raise
 
@@ -293,11 +1479,42 @@ class srtGenStandalone(object):
         return True
 
 
+    def check_transcribe_job_status(self):
+        """
+        Get the current state of the AWS Transcribe job
+
+        Returns
+        -------
+            tuple: (state, result) where state is one of the jobPoller
+            states RUNNING, COMPLETED or FAILED, and result is the URI
+            of the transcript when COMPLETED or the failure reason 
+            when FAILED
+
+        Raises
+        ------
+            botocore.exceptions.ClientError : There was an error getting
+            the status of the AWS Transcribe job
+        """
+        response = self.transcribe_client.get_transcription_job(TranscriptionJobName=self.transcription_job_name )
+        job = response["TranscriptionJob"]
+
+        if job["TranscriptionJobStatus"] == "COMPLETED":
+            return COMPLETED, job["Transcript"]["TranscriptFileUri"]
+
+        if job["TranscriptionJobStatus"] == "FAILED":
+            return FAILED, job.get("FailureReason", "unknown reason")
+
+        return RUNNING, None
+
+
     def wait_for_transcribe_job_to_complete(self):
         """
-        Periodically poll the AWS Transcribe service to see if
-        the AWS Transcribe Job has completed yet. If there are
-        3 consequetive errors getting job status we abort
+        Poll the AWS Transcribe service until the AWS Transcribe Job
+        has completed. Checks are spaced out based on the expected
+        length of the job and back off with jitter once it is overdue
+        (see jobPoller). If there are several consequetive errors 
+        getting job status, the job fails or the deadline passes we 
+        abort
 
         Returns
         -------
@@ -307,43 +1524,57 @@ class srtGenStandalone(object):
         ------
             botocore.exceptions.ClientError : There was an error getting
             the status of the AWS Transcribe job
+
+            srtGenError: The Transcribe job failed or did not finish
+            before the deadline
         """
 
         print("[+] Waiting for Transcribe job '%s' to complete " % (self.transcription_job_name),  end="")
-        
-        error_count = 0
-        while True:
 
-            try:
+        poller = jobPoller(self.check_transcribe_job_status,
+                           media_duration=self.get_media_duration(),
+                           deadline=self.deadline,
+                           progress=lambda state: print(".", end="", flush=True))
 
-                response = self.transcribe_client.get_transcription_job(TranscriptionJobName=self.transcription_job_name )
-                
-                print(".", end="")
-                if 'TranscriptFileUri' in response["TranscriptionJob"]["Transcript"]:
-                    print("\n[+] Transcription complete!")
-                    break
-                error_count = 0
-                time.sleep(10.0)
-            
-            except Exception as err:
-                print("[-] Error getting results from Transcribe service: %s "%(err))
-                
-                ##Only raise an error if 3 or more http/network errors are received
-                if error_count >=3:
-                    raise
+        try:
+            self.transcript_file_uri = poller.wait()
 
-                error_count+=1
-                continue
+        except jobFailedError as err:
+            print("\n[-] Transcription job failed: %s"%(err))
+            raise srtGenError("Transcription job failed: %s"%(err))
 
-        try:
-            self.transcript_file_uri = response["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
-        except Exception as err:
-            print("[-] Error parsing the response from AWS Transcribe. Cannot continue: %s"%(err))
-            raise(srtGenError)
+        except jobTimeoutError as err:
+            print("\n[-] Gave up waiting for the transcription job: %s"%(err))
+            raise srtGenError("Gave up waiting for the transcription job: %s"%(err))
+
+        print("\n[+] Transcription complete!")
 
         return True
 
 
+    def get_media_duration(self):
+        """
+        Get the duration of the extracted audio. It is known when silence
+        was trimmed, otherwise it is estimated from the audio's size and
+        bitrate, or for lossless audio read from the file by ffmpeg
+
+        Returns
+        -------
+            float: The duration in seconds, None if it can't be estimated
+        """
+        if self.audio_duration:
+            return self.audio_duration
+
+        try:
+            if not self.bitrate:
+                self.audio_duration = probe_duration(FFMPEG_BIN_PATH, self.audio_filepath)
+                return self.audio_duration
+
+            return (self.audio_size or os.path.getsize(self.audio_filepath)) * 8.0 / self.bitrate
+        except (OSError, ZeroDivisionError):
+            return None
+
+
     def download_transcript(self):
         """
         Once the AWS transcribe job has completed download the results
@@ -368,10 +1599,39 @@ class srtGenStandalone(object):
             raise
 
         self.transcription_data = transcript_data
+
+        self.remap_transcript()
+        self.cache_transcript()
         
         return True
 
 
+    def remap_transcript(self):
+        """
+        If silence was trimmed from the audio, map the times in the 
+        transcript back to the times in the source file
+        """
+        if self.time_remap:
+            self.transcription_data = remapTranscript(self.transcription_data, self.time_remap)
+
+
+    def cache_transcript(self):
+        """
+        Keep a copy of the transcript so the subtitles can be rendered 
+        again, and the same audio never needs transcribing again. 
+        Failing to is not fatal.
+        """
+        if not self.cache or not self.audio_hash:
+            return
+
+        try:
+            self.cache.put(self.audio_hash, s3_key=self.s3_key, transcription_job_name=self.transcription_job_name)
+            self.cache.put_data(self.audio_hash, "json", self.transcription_data)
+            self.cache.add_source(self.audio_hash, self.video_filepath)
+        except OSError as err:
+            print("[-] Error caching the transcript: %s"%(err))
+
+
     def generate_srt_file(self):
         """
         Now take the transcript file and reformat it into an .srt file for use in video players
@@ -382,11 +1642,181 @@ class srtGenStandalone(object):
 
         # Create the SRT File for the original transcript and write it out - call out to aws open sourced code that does this
         try:
-            writeTranscriptToSRT(self.transcription_data, 'en', self.srt_filepath)
+            writeTranscriptToSRT(self.transcription_data, 'en', self.srt_filepath, atomic=True, phraseLength=self.phrase_length,
+                                 limits=self.cue_limits)
         except Exception as err:
             print("[-] Error writing the genering the .srt subtitle file: %s"%(err))
             raise
 
+        self.write_translations(self.transcription_data)
+
+
+    def write_translations(self, transcript):
+        """
+        Translate the subtitles into each of translate_languages and 
+        write them next to the .srt, e.g. 'movie.es.srt'. The translated
+        subtitles keep the timing of the original ones, and all of the 
+        languages are translated concurrently in a few batched requests
+
+        Args
+        ----
+        transcript (str or bytes): The Transcribe JSON
+        """
+        if not self.translate_languages:
+            return
+
+        srt_filepaths = {}
+        for language in self.translate_languages:
+            srt_filepaths[language] = translated_srt_filepath(self.srt_filepath, language)
+            print("[+] Translating the subtitles to %s and writing to: %s"%(language, srt_filepaths[language]))
+
+        try:
+            writeTranslationsToSRT(transcript, 'en', srt_filepaths, self.session.region_name, phraseLength=self.phrase_length,
+                                   limits=self.cue_limits, align=self.translate_align, session=self.session,
+                                   memory=self.translation_memory)
+        except ClientError as err:
+            print("[-] Error translating the subtitles: %s"%(err))
+            raise srtGenError(err)
+
+
+class srtGenBatch(object):
+    """
+    Transcribe many files concurrently. Each stage of the pipeline has
+    its own concurrency limit: ffmpeg extraction runs in a pool of 
+    processes, S3 uploads in a pool of threads, and up to 'max_jobs'
+    Transcribe jobs are kept in flight at once. A file moves on to the
+    next stage as soon as its previous stage finishes.
+
+    Methods
+    -------
+    __call__()
+        Transcribe a list of files
+    """
+
+    def __init__(self, sgs, extract_workers=None, upload_workers=4, max_jobs=20):
+        """
+        Args
+        ----------
+        sgs (srtGenStandalone): Configured instance whose AWS clients 
+        and settings are shared by every file in the batch
+        extract_workers (int): Number of parallel ffmpeg extractions 
+        (default is the number of CPUs)
+        upload_workers (int): Number of parallel S3 uploads (default is 4)
+        max_jobs (int): Number of Transcribe jobs in flight at once 
+        (default is 20)
+        """
+        self.sgs = sgs
+        self.extract_workers = extract_workers or os.cpu_count()
+        self.upload_workers = upload_workers
+        self.max_jobs = max_jobs
+
+
+    def __call__(self, entries, bitrate=None, stream=False):
+        """
+        Args
+        ----------
+        entries (list): (input path, srt path) tuples to transcribe, 
+        see expand_batch_inputs()
+        bitrate (int): The bitrate to use for the extracted audio (deafult
+        is the profile's, 48000 for mp3)
+        stream (bool): Upload the audio while it is being extracted,
+        extraction then runs in the upload workers (default is False)
+
+        Returns
+        -------
+            dict: Maps each input path to True if it was transcribed 
+            successfully, False otherwise
+        """
+        timestamp = str(time.time()).split(".")[0]
+        results = {}
+
+        print("[+] Transcribing %d files (%d extractions, %d uploads, %d Transcribe jobs at a time)"%(len(entries), self.extract_workers, self.upload_workers, self.max_jobs))
+
+        with concurrent.futures.ProcessPoolExecutor(self.extract_workers) as extract_pool, \
+             concurrent.futures.ThreadPoolExecutor(self.upload_workers) as upload_pool, \
+             concurrent.futures.ThreadPoolExecutor(self.max_jobs) as transcribe_pool:
+
+            ##Maps each running future to the stage it is running and the file it is for
+            pending = {}
+
+            for index, (in_filepath, srt_filepath) in enumerate(entries):
+                job = self.sgs.clone()
+                job.prepare(in_filepath, srt_filepath, bitrate=bitrate, timestamp="%s-%d"%(timestamp, index))
+
+                try:
+                    if job.use_cached_source() and job.reuse_cached_srt():
+                        print("[+] Finished %s -> %s (cached)"%(in_filepath, job.srt_filepath))
+                        results[in_filepath] = True
+                        continue
+                except Exception as err:
+                    print("[-] Error rendering the cached transcript of %s: %s"%(in_filepath, err))
+
+                if stream:
+                    pending[upload_pool.submit(job.stream_audio_to_s3)] = ("upload", job, in_filepath)
+                elif job.trim_silence:
+                    ##Finding the pauses decodes the whole file, so it runs with the extractions
+                    pending[extract_pool.submit(find_trim_plan, FFMPEG_BIN_PATH, job.video_filepath)] = ("plan", job, in_filepath)
+                else:
+                    pending[self.submit_extract(extract_pool, job)] = ("extract", job, in_filepath)
+
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    stage, job, in_filepath = pending.pop(future)
+
+                    try:
+                        result = future.result()
+
+                        if stage == "plan":
+                            job.use_trim_plan(*result)
+
+                        if stage == "extract":
+                            job.use_content_hash(result)
+                            job.report_audio_size()
+
+                        ##Audio that has been transcribed before needs no upload or Transcribe job
+                        reused = stage in ("extract", "upload") and job.reuse_cached_srt()
+
+                    except Exception as err:
+                        print("[-] Error transcribing %s during %s: %s"%(in_filepath, stage, err))
+                        results[in_filepath] = False
+                        continue
+
+                    ##Hand the file on to the next stage
+                    if reused:
+                        print("[+] Finished %s -> %s (cached)"%(in_filepath, job.srt_filepath))
+                        results[in_filepath] = True
+
+                    elif stage == "plan":
+                        pending[self.submit_extract(extract_pool, job)] = ("extract", job, in_filepath)
+
+                    elif stage == "extract":
+                        pending[upload_pool.submit(job.upload_audio_to_s3)] = ("upload", job, in_filepath)
+
+                    elif stage == "upload":
+                        pending[transcribe_pool.submit(job.transcribe_and_generate_srt)] = ("transcribe", job, in_filepath)
+
+                    else:
+                        print("[+] Finished %s -> %s"%(in_filepath, job.srt_filepath))
+                        results[in_filepath] = True
+
+        print("[+] Batch complete: %d succeeded, %d failed"%(sum(results.values()), len(results) - sum(results.values())))
+
+        return results
+
+
+    def submit_extract(self, extract_pool, job):
+        """
+        Run a file's audio extraction in the pool of extraction processes
+
+        Returns
+        -------
+            concurrent.futures.Future: The future of its audio hash
+        """
+        return extract_pool.submit(run_ffmpeg_extract, FFMPEG_BIN_PATH, job.video_filepath, job.audio_filepath,
+                                   job.bitrate, job.profile, job.keep_intervals)
+
 
 ## Implement a simple CLI
 if __name__ == "__main__":
@@ -394,17 +1824,83 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input_filepath", help="Location of the source file which should be transcribed")
     parser.add_argument("-o", "--srt-output", help="Location to save the .srt subtitle file that is generated. If none is specified it will just be printed to stdout")
-    parser.add_argument("-b", "--bitrate", default=48000, type=int ,help="The bitrate ffmpeg will use to extract the audio from the source (default=48000 bps)")
+    parser.add_argument("-b", "--bitrate", type=int ,help="The bitrate ffmpeg will use to extract the audio from the source (default=the profile's, 48000 bps for mp3)")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=sorted(EXTRACTION_PROFILES), help="How the audio is extracted: mp3 as is, or mono 16 kHz speech (mp3), opus or flac to shrink the upload (default=mp3)")
+    parser.add_argument("--trim-silence", action="store_true", help="Cut pauses longer than 2 seconds out of the audio before uploading it, subtitle times are mapped back to the source")
     parser.add_argument("-m", "--mp3-output", help="Location of where the MP3 audio file should be extracted to, if none is given a temporary file is used and deleted at the end of the execution.")
     parser.add_argument("-p", "--aws-profile", help="AWS profile to use")
     parser.add_argument("-s", "--s3-bucket", help="S3 bucket to upload extracted audio to for transcription")
+    parser.add_argument("-d", "--deadline", default=DEFAULT_DEADLINE, type=float, help="Maximum time in seconds to wait for the Transcribe job to finish (default=21600)")
+    parser.add_argument("--stream", action="store_true", help="Stream the extracted audio straight into a multipart S3 upload instead of writing an mp3 first")
+    parser.add_argument("--part-size", default=DEFAULT_PART_SIZE // (1024 * 1024), type=int, help="Size in MB of each part of the multipart S3 upload, at least 5 (default=8)")
+    parser.add_argument("--upload-concurrency", default=4, type=int, help="Number of parts of a file to upload to S3 in parallel (default=4)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the local cache of transcripts (default=~/.srtgen/cache)")
+    parser.add_argument("--cache-ttl", default=DEFAULT_TTL / 86400, type=float, help="Days before a cache entry expires (default=30)")
+    parser.add_argument("--cache-max-entries", default=DEFAULT_MAX_ENTRIES, type=int, help="Number of cache entries to keep, the least recently used are evicted (default=1000)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the local cache of transcripts")
+    parser.add_argument("--rerender", action="store_true", help="Render the .srt from the cached transcript without any network calls, e.g. to try a different --max-line-chars")
+    parser.add_argument("--chunks", default=1, type=int, help="Split the audio at silences into this many chunks and transcribe them as parallel Transcribe jobs (default=1)")
+    parser.add_argument("--batch", action="store_true", help="Treat the input as a directory, glob pattern or manifest file of files to transcribe, -o is then the directory to write the .srt files to")
+    parser.add_argument("--extract-workers", type=int, help="Batch mode: number of audio extractions to run in parallel (default=number of CPUs)")
+    parser.add_argument("--upload-workers", default=4, type=int, help="Batch mode: number of S3 uploads to run in parallel (default=4)")
+    parser.add_argument("--max-jobs", default=20, type=int, help="Batch mode: number of Transcribe jobs to keep in flight at once (default=20)")
+    add_cue_arguments(parser)
+    add_translate_arguments(parser)
     #TODO
     parser.add_argument("-v", "--verbose", action="store_true", help="increase output verbosity")
     args = parser.parse_args()
 
+    if args.part_size < 5:
+        parser.error("--part-size must be at least 5 MB")
+
+    cue_limits = get_cue_limits(parser, args)
+    translate_languages = get_translate_languages(parser, args)
+
+    if args.rerender and args.no_cache:
+        parser.error("--rerender needs the cache, it can't be used with --no-cache")
+
+    if args.rerender and translate_languages:
+        parser.error("--rerender makes no network calls, it can't be used with --translate")
+
+    if args.chunks < 1:
+        parser.error("--chunks must be at least 1")
+
+    if args.chunks > 1 and (args.stream or args.batch):
+        parser.error("--chunks splits a single extracted mp3, it can't be used with --stream or --batch")
+
     try:
-        sgs = srtGenStandalone(aws_profile=args.aws_profile, s3_bucket_name=args.s3_bucket)
-        sgs(args.input_filepath, args.srt_output, mp3_filepath=args.mp3_output, bitrate=args.bitrate)
+        cache = None if args.no_cache else contentCache(args.cache_dir, ttl=args.cache_ttl * 86400, max_entries=args.cache_max_entries)
+
+        if args.rerender:
+            ##Offline, so no AWS session is created
+            if args.batch:
+                entries = expand_batch_inputs(args.input_filepath, args.srt_output)
+                if args.srt_output:
+                    os.makedirs(args.srt_output, exist_ok=True)
+            else:
+                entries = [(args.input_filepath, args.srt_output or "%s.srt"%(os.path.splitext(args.input_filepath)[0]))]
+
+            results = [rerender_from_cache(cache, in_filepath, srt_filepath, bitrate=args.bitrate, phrase_length=args.phrase_length,
+                                           profile=args.profile, trim_silence=args.trim_silence, cue_limits=cue_limits)
+                       for in_filepath, srt_filepath in entries]
+            sys.exit(0 if all(results) else 1)
+
+        sgs = srtGenStandalone(aws_profile=args.aws_profile, s3_bucket_name=args.s3_bucket, deadline=args.deadline,
+                               part_size=args.part_size * 1024 * 1024, upload_concurrency=args.upload_concurrency,
+                               show_progress=not args.batch, cache=cache, phrase_length=args.phrase_length,
+                               chunks=args.chunks, profile=args.profile, trim_silence=args.trim_silence, cue_limits=cue_limits,
+                               translate_languages=translate_languages, translate_align=args.translate_align,
+                               translation_memory=get_translation_memory(args, cache))
+
+        if args.batch:
+            entries = expand_batch_inputs(args.input_filepath, args.srt_output)
+            if args.srt_output:
+                os.makedirs(args.srt_output, exist_ok=True)
+            batch = srtGenBatch(sgs, extract_workers=args.extract_workers, upload_workers=args.upload_workers, max_jobs=args.max_jobs)
+            results = batch(entries, bitrate=args.bitrate, stream=args.stream)
+            sys.exit(0 if all(results.values()) else 1)
+        else:
+            sgs(args.input_filepath, args.srt_output, mp3_filepath=args.mp3_output, bitrate=args.bitrate, stream=args.stream)
 
     except srtGenError as err:
         sys.exit(-1)
@@ -26,12 +26,55 @@
 #
 # ==================================================================================
 
+import os
+import io
 import json
 import boto3
+import botocore.config
 import re
+import array
+import bisect
 import codecs
+import threading
+import collections.abc
+import concurrent.futures
 #from audioUtils import *
 
+# NumPy is optional, it speeds up segmenting a loaded transcript again and again (see TranscriptTimings)
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# The default number of characters of rendered cues that are collected before each write to disk
+SRT_WRITE_BUFFER_SIZE = 256 * 1024
+
+# The number of transcript items (words and punctuation) in each subtitle cue when a fixed split is asked for
+# instead of the cue segmentation (see CueLimits)
+PHRASE_LENGTH = 10
+
+# The default limits of the cue segmentation (see CueLimits), in characters and milliseconds
+CUE_MAX_LINE_CHARS = 42
+CUE_MAX_LINES = 2
+CUE_MAX_DURATION_MS = 7000
+CUE_MIN_DURATION_MS = 1200
+CUE_MIN_GAP_MS = 80
+CUE_SPLIT_PAUSE_MS = 1000
+CUE_MAX_CHARS_PER_SECOND = 17
+
+# Amazon Translate's limit on the size of the text in each TranslateText request, in UTF-8 bytes
+TRANSLATE_MAX_BYTES = 10000
+
+# The default number of TranslateText requests in flight at once
+TRANSLATE_MAX_WORKERS = 8
+
+# How translated text is lined up with the cues of the transcript: each sentence is translated whole and its
+# words are shared out between the sentence's cues, or each cue is translated on its own
+TRANSLATE_ALIGN_SENTENCE = "sentence"
+TRANSLATE_ALIGN_CUE = "cue"
+
+# Punctuation that ends a sentence, a cue is ended after it
+SENTENCE_END = frozenset( ( ".", "?", "!", "\u3002", "\uff1f", "\uff01" ) )
 
 
 # ==================================================================================
@@ -44,6 +87,184 @@ def newPhrase():
 	return { 'start_time': '', 'end_time': '', 'words' : [] }
 
 
+# ==================================================================================
+# Class: WordBuffer
+# Purpose: Shared storage for the words of a transcript.  Each distinct word is stored once in the
+#          vocabulary and the transcript itself is an array of word ids, so phrases only need to hold
+#          offsets into it rather than their own list of strings.  Every vocabulary entry is classified
+#          once when it is first seen, and the text to output after a previous word (with a leading space
+#          for words, without one for punctuation) is kept alongside it
+# Parameters:
+#                 None
+# ==================================================================================
+class WordBuffer( object ):
+
+	__slots__ = ( 'vocabulary', 'spaced', 'wordIds', 'ids' )
+
+	def __init__( self ):
+		self.vocabulary = []
+		self.spaced = []
+		self.wordIds = {}
+		self.ids = array.array( 'I' )
+
+	def __len__( self ):
+		return len( self.ids )
+
+	# Add a word to the end of the buffer.  isWord says whether it is a word (True) or punctuation (False),
+	# if it is not known (e.g. no Transcribe item type is available) the word itself is inspected
+	def append( self, word, isWord=None ):
+		wordId = self.wordIds.get( word )
+		if wordId is None:
+			if isWord is None:
+				isWord = isWordToken( word )
+			wordId = len( self.vocabulary )
+			self.wordIds[word] = wordId
+			self.vocabulary.append( word )
+			self.spaced.append( " " + word if isWord else word )
+		self.ids.append( wordId )
+
+	# Return the text of the words between the two offsets, including punctuation
+	def text( self, first, last ):
+		if first >= last:
+			return ""
+		spaced = self.spaced
+		ids = self.ids
+		return self.vocabulary[ids[first]] + "".join( [ spaced[wordId] for wordId in ids[first + 1:last] ] )
+
+	# Return the words between the two offsets as a list of strings
+	def words( self, first, last ):
+		vocabulary = self.vocabulary
+		return [ vocabulary[wordId] for wordId in self.ids[first:last] ]
+
+
+# ==================================================================================
+# Class: Phrase
+# Purpose: Compact replacement for the newPhrase dict.  The start and end are held as integer
+#          milliseconds (None if not known yet) and the words as a range of a shared WordBuffer.  It also
+#          behaves as a read-only dict with the same 'start_time', 'end_time' and 'words' keys as
+#          newPhrase so it can be passed anywhere a phrase dict is expected
+# Parameters:
+#                 buffer - the WordBuffer holding the words of the phrase
+#                 first - the offset in the buffer of the first word of the phrase
+# ==================================================================================
+class Phrase( collections.abc.Mapping ):
+
+	__slots__ = ( 'buffer', 'first', 'last', 'startMs', 'endMs' )
+
+	_KEYS = ( 'start_time', 'end_time', 'words' )
+
+	def __init__( self, buffer, first ):
+		self.buffer = buffer
+		self.first = first
+		self.last = first
+		self.startMs = None
+		self.endMs = None
+
+	# Add a word to the end of the phrase, the phrase must be the last one in the buffer
+	def append( self, word, isWord=None ):
+		self.buffer.append( word, isWord )
+		self.last = len( self.buffer )
+
+	def words( self ):
+		return self.buffer.words( self.first, self.last )
+
+	def text( self ):
+		return self.buffer.text( self.first, self.last )
+
+	def __getitem__( self, key ):
+		if key == 'start_time':
+			return _getTimeCodeFromMs( self.startMs )
+		if key == 'end_time':
+			return _getTimeCodeFromMs( self.endMs )
+		if key == 'words':
+			return self.words()
+		raise KeyError( key )
+
+	def __iter__( self ):
+		return iter( self._KEYS )
+
+	def __len__( self ):
+		return len( self._KEYS )
+
+	def __repr__( self ):
+		return "Phrase(%r)" % ( dict( self ) )
+
+
+# ==================================================================================
+# Class: Cue
+# Purpose: A Phrase that is shown as one or more lines.  The offsets in the WordBuffer at which each line
+#          after the first starts are kept in breaks, and the text has a line break at each of them
+# Parameters:
+#                 buffer - the WordBuffer holding the words of the cue
+#                 first - the offset in the buffer of the first word of the cue
+# ==================================================================================
+class Cue( Phrase ):
+
+	__slots__ = ( 'breaks', )
+
+	def __init__( self, buffer, first ):
+		Phrase.__init__( self, buffer, first )
+		self.breaks = []
+
+	def text( self ):
+		if not self.breaks:
+			return Phrase.text( self )
+		bounds = [ self.first ] + self.breaks + [ self.last ]
+		return "\n".join( [ self.buffer.text( bounds[i], bounds[i + 1] ) for i in range( len( bounds ) - 1 ) ] )
+
+	def __repr__( self ):
+		return "Cue(%r)" % ( dict( self ) )
+
+
+# ==================================================================================
+# Class: CueLimits
+# Purpose: The limits the cue segmentation (iterCuesFromItems) works to.  All times are in milliseconds
+# Parameters:
+#                 maxLineChars - the most characters on each line of a cue
+#                 maxLines - the most lines in a cue
+#                 maxDurationMs - the longest a cue is shown for
+#                 minDurationMs - the shortest a cue is shown for, if the next cue starts late enough
+#                 minGapMs - the smallest gap left between the end of a cue and the start of the next
+#                 splitPauseMs - a pause between words at least this long always starts a new cue
+#                 maxCharsPerSecond - the fastest reading speed, a cue is shown for long enough to be read
+#                                     at this speed, if the next cue starts late enough
+#                 splitOnPunctuation - end a cue at the end of each sentence
+# ==================================================================================
+class CueLimits( object ):
+
+	__slots__ = ( 'maxLineChars', 'maxLines', 'maxDurationMs', 'minDurationMs', 'minGapMs', 'splitPauseMs',
+				  'maxCharsPerSecond', 'splitOnPunctuation' )
+
+	def __init__( self, maxLineChars=CUE_MAX_LINE_CHARS, maxLines=CUE_MAX_LINES, maxDurationMs=CUE_MAX_DURATION_MS,
+				  minDurationMs=CUE_MIN_DURATION_MS, minGapMs=CUE_MIN_GAP_MS, splitPauseMs=CUE_SPLIT_PAUSE_MS,
+				  maxCharsPerSecond=CUE_MAX_CHARS_PER_SECOND, splitOnPunctuation=True ):
+		self.maxLineChars = maxLineChars
+		self.maxLines = maxLines
+		self.maxDurationMs = maxDurationMs
+		self.minDurationMs = minDurationMs
+		self.minGapMs = minGapMs
+		self.splitPauseMs = splitPauseMs
+		self.maxCharsPerSecond = maxCharsPerSecond
+		self.splitOnPunctuation = splitOnPunctuation
+
+
+# ==================================================================================
+# Function: getMsFromSeconds
+# Purpose: Convert a Transcribe time in seconds (e.g. "12.34") to integer milliseconds
+# Parameters:
+#                 seconds - the time in seconds as a string or number
+# ==================================================================================
+def getMsFromSeconds( seconds ):
+	return int( round( float( seconds ) * 1000 ) )
+
+
+# Format integer milliseconds for the dict view of a Phrase, an unknown time is an empty string as in newPhrase
+def _getTimeCodeFromMs( ms ):
+	if ms is None:
+		return ''
+	return formatTimeCode( ms )
+
+
 	
 # ==================================================================================
 # Function: getTimeCode
@@ -53,11 +274,55 @@ def newPhrase():
 # ==================================================================================	
 	# Format and return a string that contains the converted number of seconds into SRT format
 def getTimeCode( seconds ):
-	t_hund = int(seconds % 1 * 1000)
-	t_seconds = int( seconds )
-	t_secs = ((float( t_seconds) / 60) % 1) * 60
-	t_mins = int( t_seconds / 60 )
-	return str( "%02d:%02d:%02d,%03d" % (00, t_mins, int(t_secs), t_hund ))
+	return formatTimeCode( getMsFromSeconds( seconds ) )
+
+
+# Zero padded field values, precomputed so formatting a timecode is only table lookups and concatenation
+_TWO_DIGITS = [ "%02d" % i for i in range( 100 ) ]
+_THREE_DIGITS = [ "%03d" % i for i in range( 1000 ) ]
+
+
+# ==================================================================================
+# Function: formatTimeCode
+# Purpose: Format a number of integer milliseconds as an SRT timecode (HH:MM:SS,mmm)
+# Parameters:
+#                 ms - the time in milliseconds, negative times are clamped to zero
+# ==================================================================================
+def formatTimeCode( ms ):
+	if ms < 0:
+		ms = 0
+
+	seconds, millis = divmod( ms, 1000 )
+	minutes, seconds = divmod( seconds, 60 )
+	hours, minutes = divmod( minutes, 60 )
+
+	# SRT only specifies two hour digits, anything beyond 99 hours is written out in full
+	hh = _TWO_DIGITS[hours] if hours < 100 else str( hours )
+	return hh + ":" + _TWO_DIGITS[minutes] + ":" + _TWO_DIGITS[seconds] + "," + _THREE_DIGITS[millis]
+
+
+# ==================================================================================
+# Function: formatTimeCodes
+# Purpose: Format a whole sequence of cue boundaries in integer milliseconds in a single pass, returning
+#          the list of SRT timecodes in the same order
+# Parameters:
+#                 msList - an iterable of times in milliseconds
+# ==================================================================================
+def formatTimeCodes( msList ):
+	twoDigits = _TWO_DIGITS
+	threeDigits = _THREE_DIGITS
+	timeCodes = []
+	append = timeCodes.append
+
+	for ms in msList:
+		if ms < 0:
+			ms = 0
+		seconds, millis = divmod( ms, 1000 )
+		minutes, seconds = divmod( seconds, 60 )
+		hours, minutes = divmod( minutes, 60 )
+		append( ( twoDigits[hours] if hours < 100 else str( hours ) ) + ":" + twoDigits[minutes] + ":" + twoDigits[seconds] + "," + threeDigits[millis] )
+
+	return timeCodes
 	
 
 # ==================================================================================
@@ -67,16 +332,20 @@ def getTimeCode( seconds ):
 #                 transcript - the JSON output from Amazon Transcribe
 #                 sourceLangCode - the language code for the original content (e.g. English = "EN")
 #                 srtFileName - the name of the SRT file (e.g. "mySRT.SRT")
+#                 bufferSize - the number of characters of cues to collect before each write
+#                 atomic - write through a temporary file that replaces srtFileName once complete
+#                 phraseLength - split the transcript into cues of this many items instead of segmenting it
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
 # ==================================================================================	
-def writeTranscriptToSRT( transcript, sourceLangCode, srtFileName ):
+def writeTranscriptToSRT( transcript, sourceLangCode, srtFileName, bufferSize=SRT_WRITE_BUFFER_SIZE, atomic=False, phraseLength=None, limits=None ):
 	# Write the SRT file for the original language
 	print( "==> Creating SRT from transcript")
-	phrases = getPhrasesFromTranscript( transcript )
-	writeSRT( phrases, srtFileName )
+	phrases = iterPhrasesFromTranscript( transcript, phraseLength=phraseLength, limits=limits )
+	writeSRT( phrases, srtFileName, bufferSize, atomic )
 	
 
 # ==================================================================================
-# Function: writeTranscriptToSRT
+# Function: writeTranslationToSRT
 # Purpose: Based on the JSON transcript provided by Amazon Transcribe, get the phrases from the translation 
 #          and write it out to an SRT file
 # Parameters: 
@@ -84,82 +353,261 @@ def writeTranscriptToSRT( transcript, sourceLangCode, srtFileName ):
 #                 sourceLangCode - the language code for the original content (e.g. English = "EN")
 #                 targetLangCode - the language code for the translated content (e.g. Spanich = "ES")
 #                 srtFileName - the name of the SRT file (e.g. "mySRT.SRT")
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 phraseLength - split the transcript into cues of this many items instead of segmenting it
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
+#                 align - TRANSLATE_ALIGN_SENTENCE or TRANSLATE_ALIGN_CUE, see getTranslatedPhrases
+#                 session - the boto3 Session to create the Translate client with (default is boto3's)
+#                 memory - the translation memory to reuse earlier translations from, see translateLines [optional]
 # ==================================================================================
-def writeTranslationToSRT( transcript, sourceLangCode, targetLangCode, srtFileName, region ):
-	# First get the translation
-	print( "\n\n==> Translating from " + sourceLangCode + " to " + targetLangCode )
-	translation = translateTranscript( transcript, sourceLangCode, targetLangCode, region )
-	#print( "\n\n==> Translation: " + str(translation))
-		
-	# Now create phrases from the translation
-	textToTranslate = unicode(translation["TranslatedText"])
-	phrases = getPhrasesFromTranslation( textToTranslate, targetLangCode )
-	writeSRT( phrases, srtFileName )
-	
+def writeTranslationToSRT( transcript, sourceLangCode, targetLangCode, srtFileName, region, maxWorkers=TRANSLATE_MAX_WORKERS,
+						   phraseLength=None, limits=None, align=TRANSLATE_ALIGN_SENTENCE, session=None, memory=None ):
+	writeTranslationsToSRT( transcript, sourceLangCode, { targetLangCode: srtFileName }, region, maxWorkers, phraseLength, limits, align,
+							session, memory )
+
+
+# ==================================================================================
+# Function: writeTranslationsToSRT
+# Purpose: Translate the transcript into several languages in one go and write an SRT file for each.  The
+#          transcript is segmented into cues as for writeTranscriptToSRT and the translated cues keep the
+#          times of the original ones, so no timing has to be estimated.  The requests for every language run
+#          concurrently (see getTranslatedPhrases)
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe
+#                 sourceLangCode - the language code for the original content (e.g. English = "EN")
+#                 srtFileNames - the name of the SRT file to write for each target language code, e.g.
+#                                { "es": "talk.es.srt", "fr": "talk.fr.srt" }
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 phraseLength - split the transcript into cues of this many items instead of segmenting it
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
+#                 align - TRANSLATE_ALIGN_SENTENCE or TRANSLATE_ALIGN_CUE, see getTranslatedPhrases
+#                 session - the boto3 Session to create the Translate client with (default is boto3's)
+#                 memory - the translation memory to reuse earlier translations from, see translateLines [optional]
+# ==================================================================================
+def writeTranslationsToSRT( transcript, sourceLangCode, srtFileNames, region, maxWorkers=TRANSLATE_MAX_WORKERS,
+							phraseLength=None, limits=None, align=TRANSLATE_ALIGN_SENTENCE, session=None, memory=None ):
+	phrases = getPhrasesFromTranscript( transcript, phraseLength, limits )
+
+	# Now translate the phrases, keeping their timing
+	print( "\n\n==> Translating from " + sourceLangCode + " to " + ", ".join( srtFileNames ) )
+	translations = getTranslatedPhrases( phrases, sourceLangCode, list( srtFileNames ), region, align, maxWorkers, limits, session, memory )
+
+	for targetLangCode, srtFileName in srtFileNames.items():
+		writeSRT( translations[targetLangCode], srtFileName, atomic=True )
+
+
+# ==================================================================================
+# Function: getTranslatedPhrases
+# Purpose: Translate the phrases (or cues) of a transcript into several languages, keeping the original
+#          start and end times.  With TRANSLATE_ALIGN_SENTENCE the cues of each sentence are translated together,
+#          so the translation has the whole sentence as context, and the translated words are shared out between
+#          the sentence's cues in proportion to the length of their original text.  With TRANSLATE_ALIGN_CUE each
+#          cue is translated on its own, which keeps every cue's meaning in its own cue but translates with less
+#          context.  Either way the text is sent as one line per sentence or cue, batched into as few
+#          TranslateText requests as fit in the size limit (see translateLines)
+# Parameters:
+#                 phrases - the phrases or cues of the transcript, e.g. from getPhrasesFromTranscript
+#                 sourceLangCode - the language code for the original content (e.g. English = "EN")
+#                 targetLangCodes - the language codes to translate into (e.g. [ "es", "fr" ])
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 align - TRANSLATE_ALIGN_SENTENCE or TRANSLATE_ALIGN_CUE
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 limits - the CueLimits to wrap the translated cues' lines to (default is CueLimits())
+#                 session - the boto3 Session to create the Translate client with (default is boto3's)
+#                 memory - the translation memory to reuse earlier translations from, see translateLines [optional]
+# ==================================================================================
+def getTranslatedPhrases( phrases, sourceLangCode, targetLangCodes, region, align=TRANSLATE_ALIGN_SENTENCE,
+						  maxWorkers=TRANSLATE_MAX_WORKERS, limits=None, session=None, memory=None ):
+
+	if align not in ( TRANSLATE_ALIGN_SENTENCE, TRANSLATE_ALIGN_CUE ):
+		raise ValueError( "Unknown translation alignment: %r" % ( align ) )
+
+	if limits is None:
+		limits = CueLimits()
+
+	# Group the phrases into the units that are translated as one line
+	units = []
+	unit = []
+	size = 0
+
+	for phrase in phrases:
+		text = " ".join( getPhraseText( phrase ).split() )
+		textSize = len( text.encode( "utf-8" ) ) + 1
+
+		# a run-on sentence is cut at a cue so that every line fits in a single request
+		if unit and size + textSize > TRANSLATE_MAX_BYTES:
+			units.append( unit )
+			unit = []
+			size = 0
+
+		unit.append( phrase )
+		size += textSize
+
+		words = phrase["words"]
+		if align == TRANSLATE_ALIGN_CUE or ( words and words[-1] in SENTENCE_END ):
+			units.append( unit )
+			unit = []
+			size = 0
+
+	if unit:
+		units.append( unit )
+
+	lines = [ " ".join( [ getPhraseText( phrase ) for phrase in unit ] ) for unit in units ]
+	translations = translateLines( lines, sourceLangCode, targetLangCodes, region, maxWorkers, session=session, memory=memory )
+
+	# Share out each unit's translation between its phrases, all the translated cues of a language share a WordBuffer
+	translatedPhrases = {}
+	for targetLangCode in targetLangCodes:
+		words = WordBuffer()
+		translatedPhrases[targetLangCode] = [ cue for unit, translation in zip( units, translations[targetLangCode] )
+											  for cue in alignTranslation( unit, translation, words, limits ) ]
+
+	return translatedPhrases
+
+
+# ==================================================================================
+# Function: alignTranslation
+# Purpose: Share out the translation of a run of phrases between them, in proportion to the length of each
+#          phrase's original text, so the translated phrases keep the original start and end times.  Each
+#          translated word goes to the phrase its middle falls in.  A phrase left with no words is dropped and
+#          its time given to the phrase before it (or the one after it, if it is the first).  Cues are wrapped
+#          into lines as in iterCuesFromItems, with lines made longer if the translation is too long to fit
+#          in the limits.  A translation with no spaces (e.g. Japanese) is shared out by character
+# Parameters:
+#                 phrases - the original phrases (or cues), in order
+#                 translation - the translated text of all of the phrases
+#                 words - the WordBuffer to hold the words of the translated phrases
+#                 limits - the CueLimits to wrap the translated cues' lines to
+# ==================================================================================
+def alignTranslation( phrases, translation, words, limits ):
+
+	tokens = translation.split()
+	spaced = len( tokens ) > 1 or len( phrases ) == 1
+	if not spaced:
+		tokens = list( "".join( tokens ) )
+	separator = 1 if spaced else 0
+
+	# each phrase's share includes the space after it, as each translated word's does
+	sourceChars = [ len( " ".join( getPhraseText( phrase ).split() ) ) + 1 for phrase in phrases ]
+	sourceTotal = sum( sourceChars )
+	translatedTotal = sum( [ len( token ) + separator for token in tokens ] )
+
+	cues = []
+	startMs = None
+	position = 0
+	cumulative = 0
+	t = 0
+
+	for index, phrase in enumerate( phrases ):
+		cumulative += sourceChars[index]
+		boundary = translatedTotal * cumulative / sourceTotal
+		last = index == len( phrases ) - 1
+
+		# the translated words whose middle is within this phrase's share
+		first = t
+		while t < len( tokens ) and ( last or position + ( len( tokens[t] ) + separator ) / 2.0 <= boundary ):
+			position += len( tokens[t] ) + separator
+			t += 1
+
+		if startMs is None:
+			startMs = phrase.startMs
+
+		if first == t:
+			if cues:
+				cues[-1].endMs = phrase.endMs
+				startMs = None
+			continue
+
+		if isinstance( phrase, Cue ):
+			cue = Cue( words, len( words ) )
+			chars = sum( [ len( token ) + separator for token in tokens[first:t] ] ) - separator
+			width = max( limits.maxLineChars, -( -chars // limits.maxLines ) )
+			lineChars = -separator
+			for token in tokens[first:t]:
+				if lineChars > 0 and lineChars + separator + len( token ) > width:
+					cue.breaks.append( len( words ) )
+					lineChars = -separator
+				lineChars += separator + len( token )
+				cue.append( token, spaced )
+		else:
+			cue = Phrase( words, len( words ) )
+			for token in tokens[first:t]:
+				cue.append( token, spaced )
+
+		cue.startMs = startMs
+		cue.endMs = phrase.endMs
+		cues.append( cue )
+		startMs = None
+
+	return cues
+
 
 # ==================================================================================
 # Function: getPhrasesFromTranslation
-# Purpose: Based on the JSON translation provided by Amazon Translate, get the phrases from the translation 
-#          and write it out to an SRT file.  Note that since we are using a block of translated text rather than
-#          a JSON structure with the timing for the start and end of each word as in the output of Transcribe,
-#          we will need to calculate the start and end-time for each phrase
-# Parameters: 
-#                 translation - the JSON output from Amazon Translate
+# Purpose: Split a block of translated text into cues when there is no transcript to take the timing from
+#          (otherwise use getTranslatedPhrases, which keeps the transcript's timing).  Words are wrapped into
+#          cues of up to the line and line length limits, ending a cue at the end of each sentence, and the cues
+#          are laid out one after another from the start, each shown for long enough to be read
+# Parameters:
+#                 translation - the translated text, e.g. the TranslatedText of translateTranscript
 #                 targetLangCode - the language code for the translated content (e.g. Spanich = "ES")
-# ==================================================================================	
-def getPhrasesFromTranslation( translation, targetLangCode ):
+#                 limits - the CueLimits to wrap and time the cues with (default is CueLimits())
+# ==================================================================================
+def getPhrasesFromTranslation( translation, targetLangCode, limits=None ):
 
-	# Now create phrases from the translation
-	words = translation.split()
-	
-	#print( words ) #debug statement
-	
-	#set up some variables for the first pass
-	phrase =  newPhrase()
-	phrases = []
-	nPhrase = True
-	x = 0
-	c = 0
-	seconds = 0
+	if limits is None:
+		limits = CueLimits()
 
 	print("==> Creating phrases from translation...")
 
-	for word in words:
+	words = WordBuffer()
+	phrases = []
+	cue = None
+	lineChars = 0
+	lines = 0
+	startMs = 0
+
+	for word in translation.split():
+		wrap = cue is not None and lineChars + 1 + len( word ) > limits.maxLineChars
+
+		if cue is not None and wrap and lines >= limits.maxLines:
+			startMs = _timeTranslatedCue( cue, startMs, limits )
+			phrases.append( cue )
+			cue = None
+
+		if cue is None:
+			cue = Cue( words, len( words ) )
+			lineChars = len( word )
+			lines = 1
+		elif wrap:
+			cue.breaks.append( len( words ) )
+			lineChars = len( word )
+			lines += 1
+		else:
+			lineChars += 1 + len( word )
+
+		cue.append( word, True )
+
+		if limits.splitOnPunctuation and word[-1] in SENTENCE_END:
+			startMs = _timeTranslatedCue( cue, startMs, limits )
+			phrases.append( cue )
+			cue = None
+
+	if cue is not None:
+		_timeTranslatedCue( cue, startMs, limits )
+		phrases.append( cue )
 
-		# if it is a new phrase, then get the start_time of the first item
-		if nPhrase == True:
-			phrase["start_time"] = getTimeCode( seconds )
-			nPhrase = False
-			c += 1
-				
-		# Append the word to the phrase...
-		phrase["words"].append(word)
-		x += 1
-		
-		
-		# now add the phrase to the phrases, generate a new phrase, etc.
-		if x == 10:
-		
-			# For Translations, we now need to calculate the end time for the phrase
-			psecs = getSecondsFromTranslation( getPhraseText( phrase), targetLangCode, "phraseAudio" + str(c) + ".mp3" ) 
-			seconds += psecs
-			phrase["end_time"] = getTimeCode( seconds )
-		
-			#print c, phrase
-			phrases.append(phrase)
-			phrase = newPhrase()
-			nPhrase = True
-			#seconds += .001
-			x = 0
-			
-		# This if statement is to address a defect in the SubtitleClip.   If the Subtitles end up being
-		# a different duration than the content, MoviePy will sometimes fail with unexpected errors while
-		# processing the subclip.   This is limiting it to something less than the total duration for our example
-		# however, you may need to modify or eliminate this line depending on your content.
-		if c == 30:
-			break
-			
 	return phrases
+
+
+# Show an untimed cue from startMs for as long as it takes to read, returning when the next cue may start
+def _timeTranslatedCue( cue, startMs, limits ):
+	readingMs = int( len( cue.text() ) * 1000 // limits.maxCharsPerSecond )
+	cue.startMs = startMs
+	cue.endMs = startMs + min( max( limits.minDurationMs, readingMs ), limits.maxDurationMs )
+	return cue.endMs + limits.minGapMs
 	
 
 # ==================================================================================
@@ -168,8 +616,10 @@ def getPhrasesFromTranslation( translation, targetLangCode ):
 #          and write it out to an SRT file
 # Parameters: 
 #                 transcript - the JSON output from Amazon Transcribe
+#                 phraseLength - split the transcript into phrases of this many items instead of segmenting it
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
 # ==================================================================================
-def getPhrasesFromTranscript( transcript ):
+def getPhrasesFromTranscript( transcript, phraseLength=None, limits=None ):
 
 	# This function is intended to be called with the JSON structure output from the Transcribe service.  However,
 	# if you only have the translation of the transcript, then you should call getPhrasesFromTranslation instead
@@ -178,22 +628,63 @@ def getPhrasesFromTranscript( transcript ):
 	ts = json.loads( transcript )
 	items = ts['results']['items']
 	#print( items )
-	
+
+	print("==> Creating phrases from transcript...")
+
+	if phraseLength:
+		return list( iterPhrasesFromItems( items, phraseLength ) )
+
+	return list( iterCuesFromItems( items, limits ) )
+
+
+# ==================================================================================
+# Function: iterPhrasesFromTranscript
+# Purpose: Streaming version of getPhrasesFromTranscript.  The items are read incrementally from the
+#          transcript so the whole JSON document is never loaded at once, and the phrases are yielded
+#          as soon as they are complete.  The phrases are identical to those of getPhrasesFromTranscript
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe as a file-like object, an iterator
+#                              of bytes/str chunks, or a plain bytes/str
+#                 chunkSize - the number of bytes/characters to read from the transcript at a time
+#                 phraseLength - split the transcript into phrases of this many items instead of segmenting it
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
+# ==================================================================================
+def iterPhrasesFromTranscript( transcript, chunkSize=65536, phraseLength=None, limits=None ):
+
+	print("==> Creating phrases from transcript...")
+
+	items = iterTranscriptItems( transcript, chunkSize )
+
+	if phraseLength:
+		return iterPhrasesFromItems( items, phraseLength )
+
+	return iterCuesFromItems( items, limits )
+
+
+# ==================================================================================
+# Function: iterPhrasesFromItems
+# Purpose: Group the items of an Amazon Transcribe transcript into phrases of phraseLength items (10 by
+#          default), yielding each phrase as soon as it is complete.  All the phrases share a single WordBuffer.
+#          This is the fixed split used before the cue segmentation (see iterCuesFromItems)
+# Parameters:
+#                 items - an iterable of the items in the 'results' section of the transcript
+#                 phraseLength - the number of items in each phrase
+# ==================================================================================
+def iterPhrasesFromItems( items, phraseLength=PHRASE_LENGTH ):
+
 	#set up some variables for the first pass
-	phrase =  newPhrase()
-	phrases = []
+	words = WordBuffer()
+	phrase = Phrase( words, 0 )
 	nPhrase = True
 	x = 0
 	c = 0
 
-	print("==> Creating phrases from transcript...")
-
 	for item in items:
 
 		# if it is a new phrase, then get the start_time of the first item
 		if nPhrase == True:
 			if item["type"] == "pronunciation":
-				phrase["start_time"] = getTimeCode( float(item["start_time"]) )
+				phrase.startMs = getMsFromSeconds( item["start_time"] )
 				nPhrase = False
 			c+= 1
 		else:	
@@ -202,52 +693,855 @@ def getPhrasesFromTranscript( transcript ):
 			# Punctuation doesn't contain timing information, so we'll want
 			# to set the end_time to whatever the last word in the phrase is.
 			if item["type"] == "pronunciation":
-				phrase["end_time"] = getTimeCode( float(item["end_time"]) )
+				phrase.endMs = getMsFromSeconds( item["end_time"] )
 				
 		# in either case, append the word to the phrase...
-		phrase["words"].append(item['alternatives'][0]["content"])
+		phrase.append(item['alternatives'][0]["content"], item["type"] == "pronunciation")
 		x += 1
 		
 		# now add the phrase to the phrases, generate a new phrase, etc.
-		if x == 10:
+		if x == phraseLength:
 			#print c, phrase
-			phrases.append(phrase)
-			phrase = newPhrase()
+			yield phrase
+			phrase = Phrase( words, len( words ) )
 			nPhrase = True
 			x = 0
-			
-	return phrases
+
+
+# ==================================================================================
+# Function: iterCuesFromItems
+# Purpose: Segment the items of an Amazon Transcribe transcript into line-wrapped subtitle cues in a single
+#          pass.  Words are added to the current cue, wrapping onto a new line when a line would get longer
+#          than the limit, and a new cue is started when the cue would need too many lines or be shown for
+#          too long, after a pause in the speech or at the end of a sentence (unless the cue would be shown
+#          for less than the minimum duration).  Each cue is held back until
+#          the start of the next is known, then it is shown for long enough to be read (but never into the
+#          next cue) and yielded.  All the cues share a single WordBuffer
+# Parameters:
+#                 items - an iterable of the items in the 'results' section of the transcript
+#                 limits - the CueLimits to segment the transcript with (default is CueLimits())
+# ==================================================================================
+def iterCuesFromItems( items, limits=None ):
+
+	if limits is None:
+		limits = CueLimits()
+
+	words = WordBuffer()
+	cue = None
+	# the last complete cue, its end time is only settled once the next cue's start is known
+	pending = None
+	lineChars = 0
+	lines = 0
+
+	for item in items:
+
+		content = item['alternatives'][0]["content"]
+
+		if item["type"] != "pronunciation":
+			# punctuation has no timing, it is attached to the word before it (leading punctuation is dropped) and
+			# may run a line past maxLineChars
+			if cue is not None:
+				cue.append( content, False )
+				lineChars += len( content )
+				# a sentence that would only flash up is kept in the same cue as the next one
+				if limits.splitOnPunctuation and content in SENTENCE_END and cue.endMs - cue.startMs >= limits.minDurationMs:
+					pending, cue = cue, None
+			elif pending is not None:
+				pending.append( content, False )
+			continue
+
+		startMs = getMsFromSeconds( item["start_time"] )
+		endMs = getMsFromSeconds( item["end_time"] )
+		wrap = cue is not None and lineChars + 1 + len( content ) > limits.maxLineChars
+
+		# end the current cue before this word if the word doesn't fit in it
+		if cue is not None and ( ( wrap and lines >= limits.maxLines ) or
+								 startMs - cue.endMs >= limits.splitPauseMs or
+								 endMs - cue.startMs > limits.maxDurationMs ):
+			pending, cue = cue, None
+
+		if cue is None:
+			if pending is not None:
+				yield finishCue( pending, startMs, limits )
+				pending = None
+			cue = Cue( words, len( words ) )
+			cue.startMs = startMs
+			lineChars = len( content )
+			lines = 1
+		elif wrap:
+			cue.breaks.append( len( words ) )
+			lineChars = len( content )
+			lines += 1
+		else:
+			lineChars += 1 + len( content )
+
+		cue.append( content, True )
+		cue.endMs = endMs
+
+	if cue is not None:
+		if pending is not None:
+			yield finishCue( pending, cue.startMs, limits )
+		pending = cue
+
+	if pending is not None:
+		yield finishCue( pending, None, limits )
+
+
+# ==================================================================================
+# Function: finishCue
+# Purpose: Settle the end time of a cue once the start of the next one is known.  A cue is extended to be
+#          shown for at least the minimum duration, and long enough to read at the maximum reading speed
+#          (never beyond the maximum duration), but it always ends the minimum gap before the next cue
+# Parameters:
+#                 cue - the cue to finish
+#                 nextStartMs - the start of the next cue in milliseconds, None for the last cue
+#                 limits - the CueLimits the cue was segmented with
+# ==================================================================================
+def finishCue( cue, nextStartMs, limits ):
+
+	readingMs = int( len( cue.text() ) * 1000 // limits.maxCharsPerSecond )
+	endMs = max( cue.endMs, cue.startMs + min( max( limits.minDurationMs, readingMs ), limits.maxDurationMs ) )
+
+	if nextStartMs is not None:
+		endMs = min( endMs, nextStartMs - limits.minGapMs )
+
+	# a cue is never shortened to nothing, even when the next cue follows it closely
+	cue.endMs = max( endMs, min( cue.endMs, cue.startMs + 1 ) )
+
+	return cue
+
+
+# ==================================================================================
+# Class: TranscriptTimings
+# Purpose: The words and timing of a transcript loaded once, so it can be segmented into cues with different
+#          CueLimits without parsing the JSON again (e.g. to sweep the limits over many transcripts).  Each
+#          word, with the punctuation that follows it, is a unit, and the units' times and lengths are kept in
+#          arrays.  With NumPy the cue boundaries, gaps, end times and timecodes are computed as array
+#          operations over all the units at once, without it the units are fed through iterCuesFromItems.
+#          Either way the cues are identical to those of iterCuesFromItems
+# Parameters:
+#                 items - an iterable of the items in the 'results' section of the transcript
+#                 backend - "numpy" or "python", the default is "numpy" when NumPy is installed
+# ==================================================================================
+class TranscriptTimings( object ):
+
+	__slots__ = ( 'backend', 'buffer', 'firsts', 'startsMs', 'endsMs', 'wordChars', 'unitChars', 'textChars', 'spaced',
+				  'sentenceEnds', '_arrays' )
+
+	def __init__( self, items, backend=None ):
+		if backend is None:
+			backend = "numpy" if numpy is not None else "python"
+		if backend not in ( "numpy", "python" ):
+			raise ValueError( "Unknown backend %r" % ( backend ) )
+		if backend == "numpy" and numpy is None:
+			raise ValueError( "The numpy backend needs NumPy installed" )
+
+		self.backend = backend
+		self.buffer = WordBuffer()
+		# the offset in the buffer of each unit's word
+		self.firsts = array.array( 'I' )
+		self.startsMs = array.array( 'q' )
+		self.endsMs = array.array( 'q' )
+		# the characters of each unit as counted for line wrapping, the word alone and with its punctuation
+		self.wordChars = array.array( 'I' )
+		self.unitChars = array.array( 'I' )
+		# the characters of each unit in the cue text, and whether its word is spaced from the unit before
+		self.textChars = array.array( 'I' )
+		self.spaced = array.array( 'B' )
+		self.sentenceEnds = array.array( 'B' )
+		self._arrays = None
+
+		buffer = self.buffer
+		for item in items:
+			content = item['alternatives'][0]["content"]
+
+			if item["type"] != "pronunciation":
+				# punctuation belongs to the unit before it, leading punctuation is dropped as in iterCuesFromItems
+				if self.firsts:
+					buffer.append( content, False )
+					self.unitChars[-1] += len( content )
+					self.textChars[-1] += len( buffer.spaced[buffer.ids[-1]] )
+					if content in SENTENCE_END:
+						self.sentenceEnds[-1] = 1
+				continue
+
+			self.firsts.append( len( buffer ) )
+			buffer.append( content, True )
+			wordId = buffer.ids[-1]
+			self.startsMs.append( getMsFromSeconds( item["start_time"] ) )
+			self.endsMs.append( getMsFromSeconds( item["end_time"] ) )
+			self.wordChars.append( len( content ) )
+			self.unitChars.append( len( content ) )
+			self.textChars.append( len( buffer.vocabulary[wordId] ) )
+			self.spaced.append( len( buffer.spaced[wordId] ) - len( buffer.vocabulary[wordId] ) )
+			self.sentenceEnds.append( 0 )
+
+	def __len__( self ):
+		return len( self.firsts )
+
+	# Return the cues for the limits, identical to iterCuesFromItems over the same items
+	def cues( self, limits=None ):
+		if limits is None:
+			limits = CueLimits()
+
+		# the vectorized boundaries rely on the end times never going backwards, as they do in Transcribe output
+		if self.backend == "python" or not self._getArrays()["ordered"]:
+			return list( iterCuesFromItems( self._iterItems(), limits ) )
+
+		return self._numpyCues( limits )
+
+	# Render the cues for the limits as an SRT document, the same as renderSRT( self.cues( limits ) ) but with
+	# all the timecodes formatted at once
+	def renderSRT( self, limits=None ):
+		cues = self.cues( limits )
+
+		timeCodes = formatTimeCodeArray( [ cue.startMs for cue in cues ] + [ cue.endMs for cue in cues ] )
+		count = len( cues )
+
+		return "".join( [ str( x + 1 ) + "\n" + timeCodes[x] + " --> " + timeCodes[count + x] + "\n" + cue.text() + "\n\n"
+						  for x, cue in enumerate( cues ) ] )
+
+	# Feed the units back out as Transcribe items, for the pure Python backend
+	def _iterItems( self ):
+		buffer = self.buffer
+		vocabulary = buffer.vocabulary
+		ids = buffer.ids
+		count = len( self.firsts )
+
+		for x in range( count ):
+			first = self.firsts[x]
+			last = self.firsts[x + 1] if x + 1 < count else len( buffer )
+			yield { "type": "pronunciation", "start_time": self.startsMs[x] / 1000.0, "end_time": self.endsMs[x] / 1000.0,
+					"alternatives": [ { "content": vocabulary[ids[first]] } ] }
+			for offset in range( first + 1, last ):
+				yield { "type": "punctuation", "alternatives": [ { "content": vocabulary[ids[offset]] } ] }
+
+	# The units as NumPy arrays, converted once and reused for every set of limits
+	def _getArrays( self ):
+		if self._arrays is None:
+			np = numpy
+			endsMs = np.array( self.endsMs, dtype=np.int64 )
+			unitChars = np.array( self.unitChars, dtype=np.int64 )
+			self._arrays = {
+				"startsMs": np.array( self.startsMs, dtype=np.int64 ),
+				"endsMs": endsMs,
+				"ordered": bool( np.all( endsMs[1:] >= endsMs[:-1] ) ),
+				# the characters of the units before each one, counting a space after each unit
+				"lineOffsets": np.concatenate( ( [ 0 ], np.cumsum( unitChars + 1 ) ) ),
+				"wordChars": np.array( self.wordChars, dtype=np.int64 ),
+				"textOffsets": np.concatenate( ( [ 0 ], np.cumsum( np.array( self.textChars, dtype=np.int64 ) ) ) ),
+				"spacedOffsets": np.concatenate( ( [ 0 ], np.cumsum( np.array( self.spaced, dtype=np.int64 ) ) ) ),
+				"spaced": np.array( self.spaced, dtype=np.int64 ),
+				"sentenceEnds": np.flatnonzero( np.array( self.sentenceEnds, dtype=np.bool_ ) ),
+				# the offset in the buffer of each unit's word, and of the end of the buffer
+				"offsets": np.append( np.array( self.firsts, dtype=np.int64 ), len( self.buffer ) ),
+			}
+		return self._arrays
+
+	# Segment the units with array operations.  Where a cue starting at a unit ends depends on nothing but
+	# that unit, so the end of a cue starting at every unit is found at once and the cues are then read off
+	# by following the ends from the first unit
+	def _numpyCues( self, limits ):
+		np = numpy
+		a = self._getArrays()
+		count = len( self.firsts )
+		if count == 0:
+			return []
+
+		units = np.arange( count )
+		startsMs = a["startsMs"]
+		endsMs = a["endsMs"]
+		lineOffsets = a["lineOffsets"]
+
+		# the first unit that won't fit on a line starting at each unit, a unit fits while the characters
+		# before it on the line, a space and its word are within the limit (the first unit always fits)
+		overflow = np.maximum( np.searchsorted( lineOffsets[:-1] + a["wordChars"], lineOffsets[:-1] + limits.maxLineChars, "right" ), units + 1 )
+		overflow = np.append( overflow, count )
+
+		# the start of each line of a cue starting at each unit, the last being the first unit that won't fit
+		lineStarts = [ units ]
+		for x in range( limits.maxLines ):
+			lineStarts.append( overflow[lineStarts[-1]] )
+		nextUnit = lineStarts[-1]
+
+		# the first unit that would keep the cue on screen too long
+		nextUnit = np.minimum( nextUnit, np.maximum( np.searchsorted( endsMs, startsMs + limits.maxDurationMs, "right" ), units + 1 ) )
+
+		# the first unit after a long enough pause
+		pauses = np.flatnonzero( startsMs[1:] - endsMs[:-1] >= limits.splitPauseMs ) + 1
+		nextUnit = np.minimum( nextUnit, np.append( pauses, count )[np.searchsorted( pauses, units, "right" )] )
+
+		# the unit after the first sentence end once the cue has been on screen for the minimum duration
+		if limits.splitOnPunctuation:
+			sentenceEnds = a["sentenceEnds"]
+			shownFrom = np.maximum( np.searchsorted( endsMs, startsMs + limits.minDurationMs, "left" ), units )
+			nextUnit = np.minimum( nextUnit, np.append( sentenceEnds + 1, count )[np.searchsorted( sentenceEnds, shownFrom, "left" )] )
+
+		# follow the cues from the first unit
+		nextUnit = nextUnit.tolist()
+		firstUnits = []
+		x = 0
+		while x < count:
+			firstUnits.append( x )
+			x = nextUnit[x]
+
+		first = np.array( firstUnits, dtype=np.int64 )
+		last = np.append( first[1:], count )
+
+		# the line breaks inside each cue, a break before a word that isn't spaced adds a character to the text
+		breaks = [ lineStarts[x][first] for x in range( 1, limits.maxLines ) ]
+		unspacedBreaks = np.zeros( len( first ), dtype=np.int64 )
+		for lineStart in breaks:
+			inCue = lineStart < last
+			unspacedBreaks += inCue & ( a["spaced"][np.minimum( lineStart, count - 1 )] == 0 )
+
+		# settle the end times as finishCue does
+		textChars = ( a["textOffsets"][last] - a["textOffsets"][first] ) + ( a["spacedOffsets"][last] - a["spacedOffsets"][first + 1] ) + unspacedBreaks
+		readingMs = ( textChars * 1000 // limits.maxCharsPerSecond ).astype( np.int64 )
+		cueStartsMs = startsMs[first]
+		lastEndsMs = endsMs[last - 1]
+		cueEndsMs = np.maximum( lastEndsMs, cueStartsMs + np.minimum( np.maximum( limits.minDurationMs, readingMs ), limits.maxDurationMs ) )
+		cueEndsMs[:-1] = np.minimum( cueEndsMs[:-1], cueStartsMs[1:] - limits.minGapMs )
+		cueEndsMs = np.maximum( cueEndsMs, np.minimum( lastEndsMs, cueStartsMs + 1 ) )
+
+		# build the cues over the shared buffer, with the offsets in the buffer of their words and line breaks
+		offsets = a["offsets"]
+		breakOffsets = [ np.where( lineStart < last, offsets[lineStart], -1 ).tolist() for lineStart in breaks ]
+		cues = []
+		append = cues.append
+		buffer = self.buffer
+		for cueFirst, cueLast, startMs, endMs, *cueBreaks in zip( offsets[first].tolist(), offsets[last].tolist(), cueStartsMs.tolist(), cueEndsMs.tolist(), *breakOffsets ):
+			cue = Cue( buffer, cueFirst )
+			cue.last = cueLast
+			cue.startMs = startMs
+			cue.endMs = endMs
+			if cueBreaks and cueBreaks[0] >= 0:
+				cue.breaks = [ offset for offset in cueBreaks if offset >= 0 ]
+			append( cue )
+
+		return cues
+
+
+# ==================================================================================
+# Function: loadTranscriptTimings
+# Purpose: Load the words and timing of an Amazon Transcribe transcript for segmenting (see TranscriptTimings),
+#          the transcript is parsed incrementally as by iterPhrasesFromTranscript
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe as a file-like object, an iterator
+#                              of bytes/str chunks, or a plain bytes/str
+#                 backend - "numpy" or "python", the default is "numpy" when NumPy is installed
+#                 chunkSize - the number of bytes/characters to read from the transcript at a time
+# ==================================================================================
+def loadTranscriptTimings( transcript, backend=None, chunkSize=65536 ):
+	return TranscriptTimings( iterTranscriptItems( transcript, chunkSize ), backend )
+
+
+# ==================================================================================
+# Function: formatTimeCodeArray
+# Purpose: Format a sequence of times in integer milliseconds as SRT timecodes, as formatTimeCodes does.  With
+#          NumPy the digits of all the timecodes are computed at once into a single character array
+# Parameters:
+#                 msList - a sequence (or NumPy array) of times in milliseconds
+# ==================================================================================
+def formatTimeCodeArray( msList ):
+	if numpy is None:
+		return formatTimeCodes( msList )
+
+	np = numpy
+	ms = np.maximum( np.asarray( msList, dtype=np.int64 ).reshape( -1 ), 0 )
+
+	# the value of each character of HH:MM:SS,mmm, colons and comma included
+	fields = ( ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000 )
+	digits = np.empty( ( len( ms ), 12 ), dtype=np.uint8 )
+	digits[:, 2] = digits[:, 5] = ord( ":" )
+	digits[:, 8] = ord( "," )
+	for column, field, power in ( ( 0, 0, 10 ), ( 1, 0, 1 ), ( 3, 1, 10 ), ( 4, 1, 1 ), ( 6, 2, 10 ), ( 7, 2, 1 ),
+								  ( 9, 3, 100 ), ( 10, 3, 10 ), ( 11, 3, 1 ) ):
+		digits[:, column] = fields[field] // power % 10 + ord( "0" )
+
+	timeCodes = digits.view( "S12" ).reshape( -1 ).astype( "U12" ).tolist()
+
+	# SRT only specifies two hour digits, anything beyond 99 hours is written out in full
+	for x in np.flatnonzero( fields[0] >= 100 ).tolist():
+		timeCodes[x] = formatTimeCode( int( ms[x] ) )
+
+	return timeCodes
+
+
+# ==================================================================================
+# Function: mergeTranscripts
+# Purpose: Merge the JSON output of several Amazon Transcribe jobs, each run over a consecutive segment of
+#          the same recording, into the JSON of a single transcript.  The times of each segment's items are
+#          shifted by the segment's offset into the recording, so the result can be used anywhere the
+#          output of a single job can (e.g. getPhrasesFromTranscript)
+# Parameters:
+#                 transcripts - the JSON output from Amazon Transcribe for each segment, in order
+#                 offsets - the start time in seconds of each segment within the recording
+# ==================================================================================
+def mergeTranscripts( transcripts, offsets ):
+
+	texts = []
+	items = []
+
+	for transcript, offset in zip( transcripts, offsets ):
+		ts = json.loads( transcript )
+		offsetMs = getMsFromSeconds( offset )
+
+		for text in ts['results'].get( 'transcripts', [] ):
+			if text['transcript']:
+				texts.append( text['transcript'] )
+
+		# Work in whole milliseconds so the shifted times don't pick up floating point noise
+		for item in ts['results']['items']:
+			for key in ( "start_time", "end_time" ):
+				if key in item:
+					ms = getMsFromSeconds( item[key] ) + offsetMs
+					item[key] = "%d.%03d" % divmod( ms, 1000 )
+			items.append( item )
+
+	return json.dumps( { "results": { "transcripts": [ { "transcript": " ".join( texts ) } ], "items": items }, "status": "COMPLETED" } )
+
+
+# ==================================================================================
+# Function: remapTranscript
+# Purpose: Map the times in the JSON output from Amazon Transcribe back to the original recording when the
+#          audio that was transcribed had parts cut out of it (e.g. long silences).  The remap table lists
+#          where each kept stretch of audio starts in the transcribed audio and in the original recording
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe
+#                 remap - (transcribed start, original start) pairs in seconds, in order, the first starting at 0
+# ==================================================================================
+def remapTranscript( transcript, remap ):
+
+	ts = json.loads( transcript )
+
+	starts = [ getMsFromSeconds( start ) for start, _ in remap ]
+	offsets = [ getMsFromSeconds( original ) - start for start, ( _, original ) in zip( starts, remap ) ]
+
+	for item in ts['results']['items']:
+		for key in ( "start_time", "end_time" ):
+			if key in item:
+				ms = getMsFromSeconds( item[key] )
+				# The stretch the time falls in is the last one starting at or before it
+				stretch = max( bisect.bisect_right( starts, ms ) - 1, 0 )
+				item[key] = "%d.%03d" % divmod( ms + offsets[stretch], 1000 )
+
+	return json.dumps( ts )
+
+
+# ==================================================================================
+# Function: iterTranscriptItems
+# Purpose: Incrementally parse the JSON output from Amazon Transcribe and yield the entries of
+#          results.items one at a time.  Only the unread part of the current chunk and the item being
+#          decoded are held in memory, so peak memory does not grow with the length of the recording
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe as a file-like object, an iterator
+#                              of bytes/str chunks, or a plain bytes/str
+#                 chunkSize - the number of bytes/characters to read from the transcript at a time
+# ==================================================================================
+def iterTranscriptItems( transcript, chunkSize=65536 ):
+
+	stream = _JSONStream( transcript, chunkSize )
+
+	for key in stream.iterObject():
+		if key != "results":
+			stream.skipValue()
+			continue
+
+		for resultsKey in stream.iterObject():
+			if resultsKey != "items":
+				stream.skipValue()
+				continue
+
+			for _ in stream.iterArray():
+				yield stream.decode()
+
+			# Everything we need has been read, there is no need to parse the rest of the document
+			return
+
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile( r'[ \t\n\r]*' )
+
+
+# ==================================================================================
+# Class: _JSONStream
+# Purpose: A minimal pull parser over a JSON document that arrives in chunks.  Containers are walked
+#          one member at a time and only scalars and explicitly decoded values are materialised, the
+#          consumed part of the buffer is discarded every time more data is read
+# Parameters:
+#                 source - a file-like object, an iterator of bytes/str chunks, or a plain bytes/str
+#                 chunkSize - the number of bytes/characters to read from a file-like source at a time
+# ==================================================================================
+class _JSONStream( object ):
+
+	def __init__( self, source, chunkSize ):
+		if isinstance( source, ( str, bytes ) ):
+			self.chunks = iter( [ source ] )
+		elif hasattr( source, "read" ):
+			self.chunks = iter( lambda: source.read( chunkSize ), source.read( 0 ) )
+		else:
+			self.chunks = iter( source )
+
+		self.decoder = codecs.getincrementaldecoder( "utf-8-sig" )()
+		self.buf = ""
+		self.pos = 0
+		self.eof = False
+
+	# Read the next chunk into the buffer, returning False once the source is exhausted
+	def fill( self ):
+		while not self.eof:
+			chunk = next( self.chunks, None )
+			if chunk is None:
+				chunk = self.decoder.decode( b"", True )
+				self.eof = True
+			elif isinstance( chunk, bytes ):
+				chunk = self.decoder.decode( chunk )
+
+			if chunk:
+				self.buf = self.buf[self.pos:] + chunk
+				self.pos = 0
+				return True
+
+		return False
+
+	# Return the next non-whitespace character without consuming it ('' at the end of the document)
+	def peek( self ):
+		while True:
+			self.pos = _JSON_WHITESPACE.match( self.buf, self.pos ).end()
+			if self.pos < len( self.buf ):
+				return self.buf[self.pos]
+			if not self.fill():
+				return ""
+
+	def expect( self, char ):
+		if self.peek() != char:
+			raise ValueError( "Expected '%s' in transcript JSON" % ( char ) )
+		self.pos += 1
+
+	# Decode the complete JSON value at the current position, reading more chunks until it is whole
+	def decode( self ):
+		while True:
+			self.peek()
+			try:
+				value, end = _JSON_DECODER.raw_decode( self.buf, self.pos )
+			except ValueError:
+				if self.fill():
+					continue
+				raise
+
+			# A number at the very end of the buffer may continue in the next chunk
+			if end == len( self.buf ) and self.fill():
+				continue
+
+			self.pos = end
+			return value
+
+	# Skip over the value at the current position without building any containers in memory
+	def skipValue( self ):
+		char = self.peek()
+		if char == "{":
+			for _ in self.iterObject():
+				self.skipValue()
+		elif char == "[":
+			for _ in self.iterArray():
+				self.skipValue()
+		else:
+			self.decode()
+
+	# Yield the keys of an object, the caller must consume each value before asking for the next key
+	def iterObject( self ):
+		self.expect( "{" )
+		if self.peek() == "}":
+			self.pos += 1
+			return
+
+		while True:
+			key = self.decode()
+			self.expect( ":" )
+			yield key
+
+			if self.peek() == ",":
+				self.pos += 1
+				continue
+			self.expect( "}" )
+			return
+
+	# Yield once per array element, the caller must consume each element before asking for the next
+	def iterArray( self ):
+		self.expect( "[" )
+		if self.peek() == "]":
+			self.pos += 1
+			return
+
+		while True:
+			yield
+
+			if self.peek() == ",":
+				self.pos += 1
+				continue
+			self.expect( "]" )
+			return
 	
 
 
 
 # ==================================================================================
 # Function: translateTranscript
-# Purpose: Based on the JSON transcript provided by Amazon Transcribe, get the JSON response of translated text
+# Purpose: Based on the JSON transcript provided by Amazon Transcribe, get the JSON response of translated text.
+#          The response has the same keys as a single TranslateText response, but the text is translated in
+#          sentence aligned chunks so a transcript of any length can be translated (see translateTexts)
 # Parameters: 
 #                 transcript - the JSON output from Amazon Transcribe
 #                 sourceLangCode - the language code for the original content (e.g. English = "EN")
 #                 targetLangCode - the language code for the translated content (e.g. Spanich = "ES")
 #                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 memory - the translation memory to reuse earlier translations from, see translateLines [optional]
 # ==================================================================================
-def translateTranscript( transcript, sourceLangCode, targetLangCode, region ):
+def translateTranscript( transcript, sourceLangCode, targetLangCode, region, maxWorkers=TRANSLATE_MAX_WORKERS, memory=None ):
 	# Get the translation in the target language.  We want to do this first so that the translation is in the full context
 	# of what is said vs. 1 phrase at a time.  This really matters in some lanaguages
+	translations = translateTranscriptToLanguages( transcript, sourceLangCode, [ targetLangCode ], region, maxWorkers, memory=memory )
 
-	# stringify the transcript
-	ts = json.loads( transcript )
+	return { "TranslatedText": translations[targetLangCode], "SourceLanguageCode": sourceLangCode, "TargetLanguageCode": targetLangCode }
+
+
+# ==================================================================================
+# Function: translateTranscriptToLanguages
+# Purpose: Translate the text of a transcript into several languages at once.  The text is split into
+#          sentence aligned chunks under Translate's size limit and every chunk is translated into every
+#          language concurrently, through one pooled client, then the chunks are put back together in order.  With a
+#          translation memory each sentence is instead looked up on its own and only the sentences it doesn't hold
+#          are translated (see translateLines)
+# Parameters:
+#                 transcript - the JSON output from Amazon Transcribe
+#                 sourceLangCode - the language code for the original content (e.g. English = "EN")
+#                 targetLangCodes - the language codes to translate into (e.g. [ "es", "fr" ])
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 session - the boto3 Session to create the Translate client with (default is boto3's)
+#                 memory - the translation memory to reuse earlier translations from, see translateLines [optional]
+# ==================================================================================
+def translateTranscriptToLanguages( transcript, sourceLangCode, targetLangCodes, region, maxWorkers=TRANSLATE_MAX_WORKERS, session=None, memory=None ):
 
-	# pull out the transcript text and put it in the txt variable
+	# pull out the transcript text
+	ts = json.loads( transcript )
 	txt = ts["results"]["transcripts"][0]["transcript"]
-		
-	#set up the Amazon Translate client
-	translate = boto3.client(service_name='translate', region_name=region, use_ssl=True)
-	
-	# call Translate  with the text, source language code, and target language code.  The result is a JSON structure containing the 
-	# translated text
-	translation = translate.translate_text(Text=txt,SourceLanguageCode=sourceLangCode, TargetLanguageCode=targetLangCode)
-	
-	return translation
+
+	if memory is None:
+		return translateTexts( splitTextForTranslation( txt ), sourceLangCode, targetLangCodes, region, maxWorkers, session )
+
+	sentences = list( _iterTranslationPieces( txt, TRANSLATE_MAX_BYTES ) )
+	translations = translateLines( sentences, sourceLangCode, targetLangCodes, region, maxWorkers, session=session, memory=memory )
+
+	return { targetLangCode: " ".join( [ line for line in translatedLines if line ] ) for targetLangCode, translatedLines in translations.items() }
+
+
+# ==================================================================================
+# Function: translateTexts
+# Purpose: Translate a sequence of chunks of text, each within Translate's size limit, into several
+#          languages concurrently and join each language's chunks back together in order
+# Parameters:
+#                 chunks - the chunks of text to translate, see splitTextForTranslation
+#                 sourceLangCode - the language code for the original content (e.g. English = "EN")
+#                 targetLangCodes - the language codes to translate into (e.g. [ "es", "fr" ])
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+# ==================================================================================
+def translateTexts( chunks, sourceLangCode, targetLangCodes, region, maxWorkers=TRANSLATE_MAX_WORKERS, session=None ):
+
+	translate = getTranslateClient( region, maxWorkers, session )
+
+	def translateChunk( text, targetLangCode ):
+		response = translate.translate_text( Text=text, SourceLanguageCode=sourceLangCode, TargetLanguageCode=targetLangCode )
+		return response["TranslatedText"]
+
+	with concurrent.futures.ThreadPoolExecutor( maxWorkers ) as pool:
+		futures = { targetLangCode: [ pool.submit( translateChunk, chunk, targetLangCode ) for chunk in chunks ]
+					for targetLangCode in targetLangCodes }
+
+		# the chunks were split at whitespace, so they are joined with a space
+		return { targetLangCode: " ".join( [ future.result() for future in languageFutures ] )
+				 for targetLangCode, languageFutures in futures.items() }
+
+
+# ==================================================================================
+# Function: translateLines
+# Purpose: Translate a list of lines of text (e.g. one per sentence) into several languages, returning the
+#          translated lines in the same order for each language.  Lines held in the translation memory are
+#          taken from it and each distinct line that isn't is translated once.  Those are sent a batch at a
+#          time, as many as fit in each TranslateText request joined by line breaks, and the batches for every
+#          language run concurrently.  If a batch comes back with a different number of lines its lines are
+#          translated one at a time instead.  A line too long for a request is translated in pieces (see
+#          splitTextForTranslation) and empty lines are left empty.  The new translations are added to the memory
+# Parameters:
+#                 lines - the lines of text to translate, line breaks within a line are treated as spaces
+#                 sourceLangCode - the language code for the original content (e.g. English = "EN")
+#                 targetLangCodes - the language codes to translate into (e.g. [ "es", "fr" ])
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of TranslateText requests to run at once
+#                 maxBytes - the largest request in UTF-8 bytes
+#                 session - the boto3 Session to create the Translate client with (default is boto3's)
+#                 memory - the translation memory to look lines up in and add translations to, any object with
+#                          get_many and put_many methods such as translationMemory.translationMemory [optional]
+# ==================================================================================
+def translateLines( lines, sourceLangCode, targetLangCodes, region, maxWorkers=TRANSLATE_MAX_WORKERS, maxBytes=TRANSLATE_MAX_BYTES,
+					session=None, memory=None ):
+
+	lines = [ " ".join( line.split() ) for line in lines ]
+	distinctLines = list( dict.fromkeys( [ line for line in lines if line ] ) )
+
+	translate = getTranslateClient( region, maxWorkers, session )
+
+	def translateBatch( batch, targetLangCode ):
+		if len( batch ) == 1:
+			pieces = [ translate.translate_text( Text=piece, SourceLanguageCode=sourceLangCode, TargetLanguageCode=targetLangCode )["TranslatedText"]
+					   for piece in splitTextForTranslation( batch[0], maxBytes ) ]
+			return [ " ".join( " ".join( pieces ).split() ) ]
+
+		response = translate.translate_text( Text="\n".join( batch ), SourceLanguageCode=sourceLangCode, TargetLanguageCode=targetLangCode )
+		translated = [ line.strip() for line in response["TranslatedText"].splitlines() if line.strip() ]
+
+		# the line breaks weren't kept, so the lines can't be matched up
+		if len( translated ) != len( batch ):
+			return [ translateBatch( [ line ], targetLangCode )[0] for line in batch ]
+
+		return translated
+
+	with concurrent.futures.ThreadPoolExecutor( maxWorkers ) as pool:
+		futures = {}
+		remembered = {}
+
+		for targetLangCode in targetLangCodes:
+			remembered[targetLangCode] = memory.get_many( distinctLines, sourceLangCode, targetLangCode ) if memory is not None else {}
+			missing = [ line for line in distinctLines if line not in remembered[targetLangCode] ]
+
+			if memory is not None:
+				print( "==> Translation memory held %d of %d lines in %s" % ( len( distinctLines ) - len( missing ), len( distinctLines ), targetLangCode ) )
+
+			futures[targetLangCode] = [ ( batch, pool.submit( translateBatch, batch, targetLangCode ) )
+										for batch in _batchTranslationLines( missing, maxBytes ) ]
+
+		translations = {}
+		for targetLangCode, languageFutures in futures.items():
+			translated = {}
+			for batch, future in languageFutures:
+				translated.update( zip( batch, future.result() ) )
+
+			if memory is not None and translated:
+				memory.put_many( translated, sourceLangCode, targetLangCode )
+
+			translated.update( remembered[targetLangCode] )
+			translations[targetLangCode] = [ translated.get( line, "" ) for line in lines ]
+
+		return translations
+
+
+# Batch the lines, in order, into as few requests of at most maxBytes as possible
+def _batchTranslationLines( lines, maxBytes ):
+	batches = []
+	batch = []
+	size = 0
+
+	for line in lines:
+		lineSize = len( line.encode( "utf-8" ) )
+
+		if batch and size + 1 + lineSize > maxBytes:
+			batches.append( batch )
+			batch = []
+			size = 0
+
+		size += lineSize + ( 1 if batch else 0 )
+		batch.append( line )
+
+	if batch:
+		batches.append( batch )
+
+	return batches
+
+
+# The Translate clients, one per region and session, shared by every translation in the process.  boto3 clients are thread safe
+_translateClients = {}
+_translateClientsLock = threading.Lock()
+
+
+# ==================================================================================
+# Function: getTranslateClient
+# Purpose: Return the shared Amazon Translate client for a region, creating it the first time.  Its connection
+#          pool is sized for maxWorkers concurrent requests and throttled requests are retried
+# Parameters:
+#                 region - the AWS region in which to run the Translation (e.g. "us-east-1")
+#                 maxWorkers - the number of requests that will be made at once
+#                 session - the boto3 Session to create the client with, e.g. for a named profile (default is boto3's)
+# ==================================================================================
+def getTranslateClient( region, maxWorkers=TRANSLATE_MAX_WORKERS, session=None ):
+	with _translateClientsLock:
+		translate, poolSize = _translateClients.get( ( region, session ), ( None, 0 ) )
+		if poolSize < maxWorkers:
+			poolSize = max( maxWorkers, 10 )
+			config = botocore.config.Config( max_pool_connections=poolSize, retries={ 'max_attempts': 10 } )
+			translate = ( session or boto3 ).client( service_name='translate', region_name=region, use_ssl=True, config=config )
+			_translateClients[( region, session )] = ( translate, poolSize )
+
+		return translate
+
+
+# ==================================================================================
+# Function: splitTextForTranslation
+# Purpose: Split text into chunks of whole sentences, each no more than maxBytes when UTF-8 encoded, so each
+#          chunk can be translated in a single request with as much context as possible.  A sentence too long
+#          for a chunk on its own is split between words, and a word too long (which only happens with text
+#          that has no spaces) between characters
+# Parameters:
+#                 text - the text to split
+#                 maxBytes - the largest chunk in UTF-8 bytes
+# ==================================================================================
+def splitTextForTranslation( text, maxBytes=TRANSLATE_MAX_BYTES ):
+
+	chunks = []
+	parts = []
+	size = 0
+
+	for piece in _iterTranslationPieces( text, maxBytes ):
+		pieceSize = len( piece.encode( "utf-8" ) )
+
+		# each piece after the first in a chunk is preceded by a space
+		if parts and size + 1 + pieceSize > maxBytes:
+			chunks.append( " ".join( parts ) )
+			parts = []
+			size = 0
+
+		size += pieceSize + ( 1 if parts else 0 )
+		parts.append( piece )
+
+	if parts:
+		chunks.append( " ".join( parts ) )
+
+	return chunks
+
+
+# The whitespace after a sentence, which ends with one of SENTENCE_END and maybe a closing quote or bracket
+_SENTENCE_SPLIT = re.compile( r'(?:(?<=[.?!\u3002\uff1f\uff01])|(?<=[.?!\u3002\uff1f\uff01]["\')\]\u201d\u2019]))\s+' )
+
+
+# Yield the sentences of the text, split into pieces of at most maxBytes where a sentence is longer than that
+def _iterTranslationPieces( text, maxBytes ):
+	for sentence in _SENTENCE_SPLIT.split( text.strip() ):
+		if not sentence:
+			continue
+		if len( sentence.encode( "utf-8" ) ) <= maxBytes:
+			yield sentence
+			continue
+
+		for word in sentence.split():
+			while len( word.encode( "utf-8" ) ) > maxBytes:
+				# cut on a character boundary, the longest prefix that fits
+				cut = len( word.encode( "utf-8" )[:maxBytes].decode( "utf-8", "ignore" ) )
+				yield word[:cut]
+				word = word[cut:]
+			if word:
+				yield word
 	
 	
 
@@ -255,38 +1549,100 @@ def translateTranscript( transcript, sourceLangCode, targetLangCode, region ):
 # Function: writeSRT
 # Purpose: Iterate through the phrases and write them to the SRT file
 # Parameters: 
-#                 phrases - the array of JSON tuples containing the phrases to show up as subtitles
+#                 phrases - the array of JSON tuples containing the phrases to show up as subtitles.  Any
+#                           iterable works, a generator is consumed lazily
 #                 filename - the name of the SRT output file (e.g. "mySRT.srt")
+#                 bufferSize - the number of characters of cues to collect, encode and write in one go
+#                 atomic - write to a temporary file next to filename and rename it over filename once it
+#                          is complete, so a partially written SRT is never left behind
 # ==================================================================================
-def writeSRT( phrases, filename ):
+def writeSRT( phrases, filename, bufferSize=SRT_WRITE_BUFFER_SIZE, atomic=False ):
 	print("==> Writing phrases to disk...")
 
+	if atomic:
+		path = "%s.%d.tmp" % ( filename, os.getpid() )
+	else:
+		path = filename
+
 	# open the files
-	e = codecs.open(filename,"w+", "utf-8")
+	try:
+		with io.open( path, "wb", buffering=max( bufferSize, io.DEFAULT_BUFFER_SIZE ) ) as e:
+			# the cues are rendered into chunks of about bufferSize and each chunk is encoded and written at once
+			for chunk in iterSRTChunks( phrases, bufferSize ):
+				e.write( chunk.encode( "utf-8" ) )
+
+		if atomic:
+			os.replace( path, filename )
+
+	except BaseException:
+		if atomic and os.path.exists( path ):
+			os.remove( path )
+		raise
+
+
+# ==================================================================================
+# Function: renderSRT
+# Purpose: Render the phrases as a complete SRT document in memory, using the same cue renderer as
+#          writeSRT.  The document is built with a single join (or a BytesIO for bytes) rather than by
+#          repeated string concatenation
+# Parameters:
+#                 phrases - an iterable of the phrases to show up as subtitles
+#                 asBytes - return the document as UTF-8 encoded bytes instead of a str
+# ==================================================================================
+def renderSRT( phrases, asBytes=False ):
+
+	if not asBytes:
+		return "".join( iterSRTCues( phrases ) )
+
+	out = io.BytesIO()
+	for chunk in iterSRTChunks( phrases ):
+		out.write( chunk.encode( "utf-8" ) )
+
+	return out.getvalue()
+
+
+# ==================================================================================
+# Function: iterSRTChunks
+# Purpose: Render the phrases as SRT cues and yield them joined into strings of at least chunkSize
+#          characters (except for the last one), reusing the same list to collect each chunk
+# Parameters:
+#                 phrases - an iterable of the phrases to show up as subtitles
+#                 chunkSize - the minimum number of characters in each chunk
+# ==================================================================================
+def iterSRTChunks( phrases, chunkSize=SRT_WRITE_BUFFER_SIZE ):
+
+	parts = []
+	size = 0
+
+	for cue in iterSRTCues( phrases ):
+		parts.append( cue )
+		size += len( cue )
+
+		if size >= chunkSize:
+			yield "".join( parts )
+			del parts[:]
+			size = 0
+
+	if parts:
+		yield "".join( parts )
+
+
+# ==================================================================================
+# Function: iterSRTCues
+# Purpose: Lazily render each phrase as a complete SRT cue (number, timing line, text and blank line)
+# Parameters:
+#                 phrases - an iterable of the phrases to show up as subtitles
+# ==================================================================================
+def iterSRTCues( phrases ):
+
 	x = 1
-	
+
 	for phrase in phrases:
 
-		# determine how many words are in the phrase
-		length = len(phrase["words"])
-		
-		# write out the phrase number
-		e.write( str(x) + "\n" )
+		# write out the phrase number, the start and end time and the full phrase.  Use spacing if it is
+		# a word, or punctuation without spacing
+		yield str(x) + "\n" + phrase["start_time"] + " --> " + phrase["end_time"] + "\n" + getPhraseText( phrase ) + "\n\n"
 		x += 1
-		
-		# write out the start and end time
-		e.write( phrase["start_time"] + " --> " + phrase["end_time"] + "\n" )
-					
-		# write out the full phase.  Use spacing if it is a word, or punctuation without spacing
-		out = getPhraseText( phrase )
-
-		# write out the srt file
-		e.write(out + "\n\n" )
-		
-
-		#print out
-		
-	e.close()
 	
 
 # ==================================================================================
@@ -298,25 +1654,24 @@ def writeSRT( phrases, filename ):
 
 def getPhraseText( phrase ):
 
-	length = len(phrase["words"])
-		
-	out = ""
-	for i in range( 0, length ):
-		if re.match( '[a-zA-Z0-9]', phrase["words"][i]):
-			if i > 0:
-				out += " " + phrase["words"][i]
-			else:
-				out += phrase["words"][i]
-		else:
-			out += phrase["words"][i]
-			
-	return out
-	
+	# Phrases built from a transcript already know which of their words are punctuation
+	if isinstance( phrase, Phrase ):
+		return phrase.text()
 
-			
+	words = phrase["words"]
+	if not words:
+		return ""
 
-	
+	return words[0] + "".join( [ " " + word if isWordToken( word ) else word for word in words[1:] ] )
 
 
-	
-	
\ No newline at end of file
+# ==================================================================================
+# Function: isWordToken
+# Purpose: Return True if the token is a word, which is preceded by a space, rather than punctuation,
+#          which is attached to the previous word.  Any Unicode letter or digit counts, so words such
+#          as "été" are spaced correctly
+# Parameters:
+#                 word - the token to classify
+# ==================================================================================
+def isWordToken( word ):
+	return word[:1].isalnum()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+##The standalone modules are imported as top level modules, as the scripts themselves do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,125 @@
+import os
+
+from contentCache import contentCache
+
+
+HASH_A = "a" * 64
+HASH_B = "b" * 64
+HASH_C = "c" * 64
+
+
+class fakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_files_round_trip(tmp_path):
+    cache = contentCache(str(tmp_path), clock=fakeClock())
+
+    assert cache.get(HASH_A) is None
+    assert cache.get_file(HASH_A, "json") is None
+
+    cache.put(HASH_A, s3_key="%s.mp3"%(HASH_A))
+    cache.put_data(HASH_A, "json", '{"results": {}}')
+    srt_filepath = tmp_path / "talk.srt"
+    srt_filepath.write_text("1\n00:00:00,000 --> 00:00:01,000\nHello\n")
+    cache.put_file(HASH_A, "srt", str(srt_filepath))
+
+    assert cache.get(HASH_A)["s3_key"] == "%s.mp3"%(HASH_A)
+    with open(cache.get_file(HASH_A, "json")) as f:
+        assert f.read() == '{"results": {}}'
+    with open(cache.get_file(HASH_A, "srt")) as f:
+        assert f.read() == srt_filepath.read_text()
+
+    ##A new instance reads the same index
+    assert contentCache(str(tmp_path), clock=fakeClock()).get_file(HASH_A, "json") == cache.get_file(HASH_A, "json")
+
+
+def test_source_file_reuses_hash_until_changed(tmp_path):
+    cache = contentCache(str(tmp_path / "cache"), clock=fakeClock())
+    video_filepath = tmp_path / "talk.mp4"
+    video_filepath.write_bytes(b"video")
+
+    ##Only sources of hashes that have an entry are recorded
+    cache.add_source(HASH_A, str(video_filepath))
+    assert cache.find_source(str(video_filepath)) is None
+
+    cache.put_data(HASH_A, "json", "{}")
+    cache.add_source(HASH_A, str(video_filepath))
+    assert cache.find_source(str(video_filepath)) == HASH_A
+    assert cache.find_source(str(tmp_path / "other.mp4")) is None
+
+    video_filepath.write_bytes(b"edited video")
+    assert cache.find_source(str(video_filepath)) is None
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    clock = fakeClock()
+    cache = contentCache(str(tmp_path), ttl=60.0, clock=clock)
+    cache.put_data(HASH_A, "json", "{}")
+    json_filepath = cache.get_file(HASH_A, "json")
+
+    clock.now += 60.0
+    assert cache.get_file(HASH_A, "json") == json_filepath
+
+    ##Reading an entry doesn't extend its life, only writing it does
+    clock.now += 1.0
+    assert cache.get(HASH_A) is None
+    assert not os.path.exists(json_filepath)
+
+
+def test_evict_removes_expired_entries_and_files(tmp_path):
+    clock = fakeClock()
+    cache = contentCache(str(tmp_path), ttl=60.0, clock=clock)
+    cache.put_data(HASH_A, "json", "{}")
+    clock.now += 30.0
+    cache.put_data(HASH_B, "json", "{}")
+    a_filepath, b_filepath = cache.path("%s.json"%(HASH_A)), cache.path("%s.json"%(HASH_B))
+
+    clock.now += 45.0
+    cache.evict()
+
+    assert not os.path.exists(a_filepath)
+    assert os.path.exists(b_filepath)
+    assert cache.get(HASH_A) is None
+    assert cache.get(HASH_B) is not None
+
+
+def test_least_recently_used_evicted_beyond_max_entries(tmp_path):
+    clock = fakeClock()
+    cache = contentCache(str(tmp_path), ttl=None, max_entries=2, clock=clock)
+    cache.put_data(HASH_A, "json", "{}")
+    clock.now += 1.0
+    cache.put_data(HASH_B, "json", "{}")
+
+    ##Using A makes B the least recently used
+    clock.now += 1.0
+    assert cache.get(HASH_A) is not None
+
+    clock.now += 1.0
+    cache.put_data(HASH_C, "json", "{}")
+
+    assert cache.get(HASH_B) is None
+    assert not os.path.exists(cache.path("%s.json"%(HASH_B)))
+    assert cache.get_file(HASH_A, "json") is not None
+    assert cache.get_file(HASH_C, "json") is not None
+
+
+def test_only_cached_files_deleted_with_entry(tmp_path):
+    clock = fakeClock()
+    cache = contentCache(str(tmp_path), ttl=60.0, clock=clock)
+    ##A field that merely looks like a cached file name
+    other_filepath = tmp_path / ("%s.mp3"%(HASH_A))
+    other_filepath.write_bytes(b"audio")
+    cache.put(HASH_A, s3_key="%s.mp3"%(HASH_A))
+    cache.put_data(HASH_A, "json", "{}")
+    json_filepath = cache.get_file(HASH_A, "json")
+
+    clock.now += 61.0
+    cache.evict()
+
+    assert not os.path.exists(json_filepath)
+    assert other_filepath.exists()
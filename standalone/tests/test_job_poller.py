@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from jobPoller import jobPoller, jobTimeoutError, RUNNING, COMPLETED, QUEUE_OVERHEAD, REALTIME_FACTOR
+
+
+class fakeClock(object):
+    """
+    A clock that only moves when slept on, for use as both the clock
+    and sleep of a jobPoller
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_checks_sparse_until_the_expected_finish():
+    poller = jobPoller(lambda: (RUNNING, None), media_duration=600, jitter=0.0)
+    expected = QUEUE_OVERHEAD + 600 * REALTIME_FACTOR
+
+    assert poller.next_delay(0.0) == 60.0
+    assert poller.next_delay(expected - 20.0) == 20.0
+    ##Never less than min_delay, even right before the expected finish
+    assert poller.next_delay(expected - 0.5) == poller.min_delay
+
+
+def test_backoff_once_overdue_is_capped():
+    poller = jobPoller(lambda: (RUNNING, None), media_duration=600, jitter=0.0)
+    delays = [poller.next_delay(1000.0) for _ in range(10)]
+
+    assert delays[:5] == pytest.approx([2.0, 3.0, 4.5, 6.75, 10.125])
+    assert max(delays) == poller.overdue_max_delay == 15.0
+    assert delays[-1] == 15.0
+
+
+def test_overdue_cap_never_above_max_delay():
+    poller = jobPoller(lambda: (RUNNING, None), min_delay=1.0, max_delay=10.0, jitter=0.0)
+    assert max(poller.next_delay(0.0) for _ in range(20)) == 10.0
+
+
+def test_jitter_is_bounded_and_seeded():
+    random.seed(1234)
+    poller = jobPoller(lambda: (RUNNING, None), jitter=0.2)
+    first = [poller.next_delay(0.0) for _ in range(20)]
+
+    random.seed(1234)
+    poller = jobPoller(lambda: (RUNNING, None), jitter=0.2)
+    assert [poller.next_delay(0.0) for _ in range(20)] == first
+
+    ##The unjittered intervals, each lengthened or shortened by at most 20%
+    unjittered = [min(2.0 * 1.5 ** n, 15.0) for n in range(20)]
+    for delay, base in zip(first, unjittered):
+        assert max(base * 0.8, 2.0) <= delay <= base * 1.2
+    assert len(set(first)) > 1
+
+
+def test_wait_with_fake_clock():
+    clock = fakeClock()
+    finish = QUEUE_OVERHEAD + 120 * REALTIME_FACTOR + 100.0
+    poller = jobPoller(lambda: (COMPLETED, "done") if clock.now >= finish else (RUNNING, None),
+                       media_duration=120, jitter=0.0, sleep=clock.sleep, clock=clock)
+
+    assert poller.wait() == "done"
+
+    ##Sleeps until the expected finish, then backs off to the overdue cap, and notices the finish within one interval
+    assert clock.sleeps[0] == QUEUE_OVERHEAD + 120 * REALTIME_FACTOR
+    assert max(clock.sleeps[1:]) <= 15.0
+    assert clock.now - finish <= 15.0
+
+
+def test_wait_gives_up_at_the_deadline():
+    clock = fakeClock()
+    poller = jobPoller(lambda: (RUNNING, None), deadline=100.0, jitter=0.0, sleep=clock.sleep, clock=clock)
+
+    with pytest.raises(jobTimeoutError):
+        poller.wait()
+    assert clock.now == 100.0
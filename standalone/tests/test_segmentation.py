@@ -0,0 +1,82 @@
+from srtUtils import CueLimits, getPhrasesFromTranscript, iterPhrasesFromTranscript, iterCuesFromItems, renderSRT, PHRASE_LENGTH
+from transcripts import word, punctuation, spoken, transcript_json
+
+
+def test_cue_split_at_max_duration():
+    ##Slow speech with room for every word on one line, so only the duration ends a cue
+    items, _ = spoken(" ".join(["word"] * 40), word_duration=0.5, gap=0.1)
+    limits = CueLimits(maxLineChars=1000, maxLines=1)
+    cues = list(iterCuesFromItems(items, limits))
+
+    ##Each word starts 0.6s after the one before, so 11 fit in 7 seconds (0.6 * 10 + 0.5 = 6.5)
+    assert [len(cue.words()) for cue in cues] == [11, 11, 11, 7]
+    assert all(cue.endMs - cue.startMs <= limits.maxDurationMs for cue in cues)
+
+
+def test_lines_wrap_and_cue_split_at_max_chars():
+    items, _ = spoken(" ".join(["segmentation"] * 20), word_duration=0.1, gap=0.01)
+    limits = CueLimits(maxLineChars=30, maxLines=2)
+    cues = list(iterCuesFromItems(items, limits))
+
+    ##Two 12 character words and a space fit on a 30 character line, two lines to a cue
+    assert [cue.text() for cue in cues] == ["segmentation segmentation\nsegmentation segmentation"] * 5
+    for cue in cues:
+        lines = cue.text().split("\n")
+        assert len(lines) <= limits.maxLines
+        assert all(len(line) <= limits.maxLineChars for line in lines)
+
+
+def test_cue_shown_long_enough_to_read():
+    ##A lot of text spoken quickly, then a long pause before the next word
+    items, end = spoken("reading speed limits keep subtitles on screen", word_duration=0.1, gap=0.01)
+    items.append(word("later", end + 9.0, end + 9.5))
+    limits = CueLimits(maxLineChars=60)
+    first = list(iterCuesFromItems(items, limits))[0]
+
+    text = "reading speed limits keep subtitles on screen"
+    assert first.text() == text
+    assert first.endMs - first.startMs == len(text) * 1000 // limits.maxCharsPerSecond
+
+
+def test_reading_time_never_runs_into_the_next_cue():
+    items, end = spoken("reading speed limits keep subtitles on screen", word_duration=0.1, gap=0.01)
+    items.append(punctuation("."))
+    ##The next sentence starts 1.5 seconds later, less than the reading time
+    items.append(word("Next", end + 1.5, end + 2.0))
+    limits = CueLimits(maxLineChars=60, minDurationMs=100)
+    first, second = iterCuesFromItems(items, limits)
+
+    assert first.endMs == second.startMs - limits.minGapMs
+    assert second.startMs == int(round((end + 1.5) * 1000))
+
+
+def test_long_pause_starts_a_new_cue():
+    first, end = spoken("before the pause")
+    second, _ = spoken("after the pause", start=end + 1.5)
+    cues = list(iterCuesFromItems(first + second))
+    assert [cue.text() for cue in cues] == ["before the pause", "after the pause"]
+
+    ##A pause shorter than splitPauseMs doesn't
+    second, _ = spoken("after the pause", start=end + 0.5)
+    assert [cue.text() for cue in iterCuesFromItems(first + second)] == ["before the pause after the pause"]
+
+
+def test_sentence_end_starts_a_new_cue_unless_it_would_flash_up():
+    items, _ = spoken("This sentence is long enough to be shown. Next one.", word_duration=0.4)
+    assert [cue.text() for cue in iterCuesFromItems(items)] == ["This sentence is long enough to be shown.", "Next one."]
+
+    items, _ = spoken("Hi. Then more words follow here.", word_duration=0.3)
+    assert [cue.text() for cue in iterCuesFromItems(items)] == ["Hi. Then more words follow here."]
+
+
+def test_phrase_length_keeps_the_old_fixed_split():
+    items, _ = spoken("one two three, four five six seven. eight nine ten eleven twelve thirteen fourteen fifteen sixteen seventeen eighteen nineteen")
+    transcript = transcript_json(items)
+    phrases = getPhrasesFromTranscript(transcript, phraseLength=PHRASE_LENGTH)
+
+    ##Every phrase is 10 items, punctuation included, and its times are those of its first and last words
+    assert [len(phrase["words"]) for phrase in phrases] == [10, 10]
+    assert phrases[0]["words"] == ["one", "two", "three", ",", "four", "five", "six", "seven", ".", "eight"]
+    assert phrases[0]["start_time"] == "00:00:00,000"
+    assert phrases[0]["end_time"] == "00:00:02,750"
+    assert renderSRT(iterPhrasesFromTranscript(transcript, phraseLength=PHRASE_LENGTH)) == renderSRT(phrases)
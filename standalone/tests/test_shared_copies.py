@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+##The service deploys its own copies of these modules, see "Shared modules" in the README
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir)
+SHARED = [("standalone/srtUtils.py", "service/srtGenService/chalicelib/srtUtils.py"),
+          ("standalone/jobPoller.py", "service/jobPoller.py"),
+          ("standalone/transferUtils.py", "service/transferUtils.py")]
+
+
+@pytest.mark.parametrize("original, copy", SHARED)
+def test_service_copy_matches_standalone(original, copy):
+    with open(os.path.join(ROOT, original), "rb") as f:
+        expected = f.read()
+    with open(os.path.join(ROOT, copy), "rb") as f:
+        assert f.read() == expected, "%s differs from %s, copy it again with: cp %s %s"%(copy, original, original, copy)
@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from srtUtils import iterTranscriptItems, iterPhrasesFromTranscript, getPhrasesFromTranscript, renderSRT
+from transcripts import word, punctuation, spoken
+
+
+def tricky_document(ensure_ascii):
+    """
+    A transcript whose strings hold escaped quotes, backslashes, \\u
+    escapes and brackets, with numbers of every form and sections before
+    and after the items that the parser has to skip
+    """
+    items, end = spoken("She said")
+    items.append(word('"hello"', end + 0.1, end + 0.5))
+    items.append(punctuation(","))
+    items.append(word("été", end + 0.6, end + 0.9))
+    items.append(word("naïve\\path", end + 1.0, end + 1.4))
+    items.append(word("{brackets]", end + 1.5, end + 1.9))
+    items.append(word("emoji\U0001f600", end + 2.0, end + 2.4))
+    items.append(punctuation("."))
+    items[0]["alternatives"][0]["confidence"] = 0.987
+    items[1]["alternatives"].append({"confidence": -1.5e-3, "content": "alt \"x\" [y] {z}"})
+    items[2]["speaker"] = None
+    items[2]["flags"] = [True, False, 12, -0.0, 3E2, {"nested": [[], {}]}]
+
+    document = {
+        "jobName": "job \"with\" quotes } ]",
+        "accountId": 123456789012,
+        "results": {
+            "transcripts": [{"transcript": "She said \"hello\", été naïve\\path {brackets] emoji\U0001f600."}],
+            "speaker_labels": {"speakers": 1, "segments": [{"start_time": "0.0", "items": [{"x": "]}"}]}]},
+            "items": items,
+            "channel_labels": {"number_of_channels": 1},
+        },
+        "status": "COMPLETED",
+    }
+    return json.dumps(document, ensure_ascii=ensure_ascii, indent=1), items
+
+
+def chunked(data, size):
+    return iter([data[i:i + size] for i in range(0, len(data), size)])
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 65536])
+def test_stream_matches_json_load(ensure_ascii, chunk_size):
+    document, items = tricky_document(ensure_ascii)
+    expected = json.load(io.StringIO(document))["results"]["items"]
+    assert expected == items
+
+    ##Text and binary file objects, and iterators of chunks split anywhere, including inside UTF-8 sequences
+    assert list(iterTranscriptItems(io.StringIO(document), chunk_size)) == expected
+    assert list(iterTranscriptItems(io.BytesIO(document.encode("utf-8")), chunk_size)) == expected
+    assert list(iterTranscriptItems(chunked(document.encode("utf-8"), chunk_size), chunk_size)) == expected
+    assert list(iterTranscriptItems(chunked(document, chunk_size), chunk_size)) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_stream_renders_the_same_srt(chunk_size):
+    document, _ = tricky_document(False)
+    long_items, _ = spoken(" ".join("word%d," % i for i in range(300)))
+    long_document = json.dumps({"results": {"transcripts": [{"transcript": ""}], "items": long_items}})
+
+    for doc in (document, long_document):
+        expected = renderSRT(getPhrasesFromTranscript(doc))
+        assert renderSRT(iterPhrasesFromTranscript(io.BytesIO(doc.encode("utf-8")), chunk_size)) == expected
+        assert renderSRT(iterPhrasesFromTranscript(doc.encode("utf-8"), chunk_size)) == expected
+        assert renderSRT(iterPhrasesFromTranscript(io.BytesIO(doc.encode("utf-8")), chunk_size, phraseLength=10)) == \
+            renderSRT(getPhrasesFromTranscript(doc, phraseLength=10))
+
+
+def test_empty_items():
+    document = json.dumps({"results": {"transcripts": [{"transcript": ""}], "items": []}})
+    assert list(iterTranscriptItems(document)) == []
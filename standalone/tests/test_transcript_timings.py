@@ -0,0 +1,55 @@
+import pytest
+
+from srtUtils import CueLimits, TranscriptTimings, iterCuesFromItems, renderSRT
+from transcripts import edge_case_items, random_items
+
+np = pytest.importorskip("numpy")
+
+
+LIMITS = [CueLimits(),
+          CueLimits(maxLineChars=20, maxLines=1),
+          CueLimits(maxLineChars=32, maxLines=3, splitPauseMs=500),
+          CueLimits(maxDurationMs=2000, minDurationMs=500, minGapMs=0),
+          CueLimits(maxCharsPerSecond=5, splitOnPunctuation=False)]
+
+
+def cue_tuples(cues):
+    return [(cue.startMs, cue.endMs, cue.text()) for cue in cues]
+
+
+@pytest.mark.parametrize("limits", LIMITS)
+def test_numpy_backend_matches_python_on_edge_cases(limits):
+    items = edge_case_items()
+    expected = list(iterCuesFromItems(items, limits))
+
+    numpy_timings = TranscriptTimings(items, "numpy")
+    python_timings = TranscriptTimings(items, "python")
+
+    assert cue_tuples(numpy_timings.cues(limits)) == cue_tuples(expected)
+    assert cue_tuples(python_timings.cues(limits)) == cue_tuples(expected)
+    assert numpy_timings.renderSRT(limits) == renderSRT(expected)
+
+
+def test_edge_cases_are_exercised():
+    cues = list(iterCuesFromItems(edge_case_items()))
+
+    ##An over-long word sits on a line of its own and the trailing fragment is a cue of its own
+    assert any(len(line) > CueLimits().maxLineChars for cue in cues for line in cue.text().split("\n"))
+    assert cues[-1].text() == "Bye."
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_backend_matches_python_on_random_transcripts(seed):
+    items = random_items(400, seed)
+    numpy_timings = TranscriptTimings(items, "numpy")
+
+    for limits in LIMITS:
+        assert numpy_timings.renderSRT(limits) == renderSRT(iterCuesFromItems(items, limits))
+
+
+def test_unordered_end_times_fall_back_to_python():
+    items = random_items(50, 0)
+    items[10]["end_time"] = "0.001"
+    timings = TranscriptTimings(items, "numpy")
+
+    assert timings.renderSRT() == renderSRT(iterCuesFromItems(items))
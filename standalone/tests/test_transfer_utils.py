@@ -0,0 +1,142 @@
+import os
+import json
+import hashlib
+
+from transferUtils import MIN_PART_SIZE, multipartUploader
+
+
+class stubS3(object):
+    """
+    Stands in for the S3 client, keeping the parts of each multipart
+    upload in memory. Uploads that raise_on_part reaches are interrupted.
+    """
+
+    def __init__(self):
+        self.uploads = {}
+        self.objects = {}
+        self.aborted = []
+        self.sent_parts = []
+        self.created = 0
+        self.raise_on_part = None
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.created += 1
+        upload_id = "upload-%d"%(self.created)
+        self.uploads[upload_id] = {"key": Key, "parts": {}}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.raise_on_part:
+            raise IOError("connection reset")
+        assert self.uploads[UploadId]["key"] == Key
+        self.uploads[UploadId]["parts"][PartNumber] = Body
+        self.sent_parts.append((UploadId, PartNumber))
+        return {"ETag": '"%s"'%(hashlib.md5(Body).hexdigest())}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker):
+        parts = self.uploads[UploadId]["parts"]
+        return {"Parts": [{"PartNumber": number, "ETag": '"%s"'%(hashlib.md5(body).hexdigest())} for number, body in parts.items()]}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        assert self.uploads[UploadId]["key"] == Key
+        del self.uploads[UploadId]
+        self.aborted.append(UploadId)
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)["parts"]
+        self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+
+def interrupted_upload(s3, audio_filepath, resume_filepath, key):
+    s3.raise_on_part = 2
+    try:
+        multipartUploader(s3, part_size=MIN_PART_SIZE, max_concurrency=1).upload_file(
+            str(audio_filepath), "bucket", key, resume_filepath=str(resume_filepath))
+    except IOError:
+        pass
+    s3.raise_on_part = None
+    assert os.path.exists(str(resume_filepath))
+
+
+def test_resume_only_same_key(tmp_path):
+    s3 = stubS3()
+    audio_filepath = tmp_path / "out.mp3"
+    resume_filepath = tmp_path / "out.mp3.upload.json"
+    audio_filepath.write_bytes(b"a" * (MIN_PART_SIZE + 1))
+
+    interrupted_upload(s3, audio_filepath, resume_filepath, "old.mp3")
+    with open(str(resume_filepath)) as f:
+        stale_upload_id = json.load(f)["upload_id"]
+
+    key = multipartUploader(s3, part_size=MIN_PART_SIZE, max_concurrency=1).upload_file(
+        str(audio_filepath), "bucket", "new.mp3", resume_filepath=str(resume_filepath))
+
+    assert key == "new.mp3"
+    assert s3.objects == {"new.mp3": audio_filepath.read_bytes()}
+    assert not os.path.exists(str(resume_filepath))
+    ##The upload that was thrown away doesn't leave its parts in the bucket
+    assert s3.aborted == [stale_upload_id]
+    assert s3.uploads == {}
+
+
+def test_stale_state_of_resized_file_aborted(tmp_path):
+    s3 = stubS3()
+    audio_filepath = tmp_path / "out.mp3"
+    resume_filepath = tmp_path / "out.mp3.upload.json"
+    audio_filepath.write_bytes(b"a" * (MIN_PART_SIZE + 1))
+
+    interrupted_upload(s3, audio_filepath, resume_filepath, "audio.mp3")
+    with open(str(resume_filepath)) as f:
+        stale_upload_id = json.load(f)["upload_id"]
+
+    ##The same path reused for different audio
+    audio_filepath.write_bytes(b"b" * (MIN_PART_SIZE + 2))
+
+    multipartUploader(s3, part_size=MIN_PART_SIZE, max_concurrency=1).upload_file(
+        str(audio_filepath), "bucket", "audio.mp3", resume_filepath=str(resume_filepath))
+
+    assert s3.objects == {"audio.mp3": audio_filepath.read_bytes()}
+    ##The stale upload was aborted rather than completed with the old parts
+    assert s3.aborted == [stale_upload_id]
+    assert s3.uploads == {}
+
+
+def test_interrupted_upload_resumed(tmp_path):
+    s3 = stubS3()
+    audio_filepath = tmp_path / "out.mp3"
+    resume_filepath = tmp_path / "out.mp3.upload.json"
+    audio_filepath.write_bytes(b"a" * MIN_PART_SIZE + b"b")
+
+    interrupted_upload(s3, audio_filepath, resume_filepath, "audio.mp3")
+    sent = len(s3.sent_parts)
+
+    multipartUploader(s3, part_size=MIN_PART_SIZE, max_concurrency=1).upload_file(
+        str(audio_filepath), "bucket", "audio.mp3", resume_filepath=str(resume_filepath))
+
+    assert s3.objects == {"audio.mp3": audio_filepath.read_bytes()}
+    assert s3.uploads == {}
+    ##Only the part S3 didn't have was sent again
+    assert s3.sent_parts[sent:] == [("upload-1", 2)]
+
+
+def test_rewritten_identical_file_resumed(tmp_path):
+    s3 = stubS3()
+    audio_filepath = tmp_path / "out.mp3"
+    resume_filepath = tmp_path / "out.mp3.upload.json"
+    data = b"a" * MIN_PART_SIZE + b"b"
+    audio_filepath.write_bytes(data)
+
+    interrupted_upload(s3, audio_filepath, resume_filepath, "audio.mp3")
+    sent = len(s3.sent_parts)
+
+    ##The audio extracted again, the same bytes with a new mtime
+    audio_filepath.write_bytes(data)
+    stat = os.stat(str(audio_filepath))
+    os.utime(str(audio_filepath), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    multipartUploader(s3, part_size=MIN_PART_SIZE, max_concurrency=1).upload_file(
+        str(audio_filepath), "bucket", "audio.mp3", resume_filepath=str(resume_filepath))
+
+    assert s3.objects == {"audio.mp3": data}
+    assert s3.aborted == []
+    assert s3.sent_parts[sent:] == [("upload-1", 2)]
@@ -0,0 +1,78 @@
+import pytest
+
+import srtUtils
+from srtUtils import CueLimits, iterCuesFromItems, getTranslatedPhrases, translateLines
+from transcripts import spoken
+
+
+class stubTranslate(object):
+    """
+    Stands in for the Translate client, translating each line with
+    'translate_line' and recording every request
+    """
+
+    def __init__(self, translate_line, keep_line_breaks=True):
+        self.translate_line = translate_line
+        self.keep_line_breaks = keep_line_breaks
+        self.requests = []
+
+    def translate_text(self, Text, SourceLanguageCode, TargetLanguageCode):
+        self.requests.append(Text)
+        lines = [self.translate_line(line, TargetLanguageCode) for line in Text.split("\n")]
+        return {"TranslatedText": ("\n" if self.keep_line_breaks else " ").join(lines)}
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    def use(client):
+        monkeypatch.setattr(srtUtils, "getTranslateClient", lambda region, maxWorkers=None, session=None: client)
+        return client
+    return use
+
+
+def sentence_cues():
+    ##One sentence spread over three cues by pauses, then a sentence of its own
+    items, end = spoken("subtitles for a talk")
+    for text in ["are translated a whole sentence", "at a time.", "Short one."]:
+        more, end = spoken(text, start=end + 1.5)
+        items += more
+    return list(iterCuesFromItems(items, CueLimits()))
+
+
+def test_cue_count_and_times_unchanged(use_client):
+    cues = sentence_cues()
+    client = use_client(stubTranslate(lambda line, lang: line.upper()))
+
+    translated = getTranslatedPhrases(cues, "en", ["es", "fr"], "us-east-1")
+
+    for lang in ["es", "fr"]:
+        assert [(cue.startMs, cue.endMs) for cue in translated[lang]] == [(cue.startMs, cue.endMs) for cue in cues]
+        ##Translated text the same length as the original is shared out exactly as the original was
+        assert [cue.text() for cue in translated[lang]] == [cue.text().upper() for cue in cues]
+
+    ##Both sentences go in a single request per language
+    assert len(client.requests) == 2
+
+
+def test_sentence_translation_shared_in_proportion(use_client):
+    cues = sentence_cues()[:3]
+    use_client(stubTranslate(lambda line, lang: " ".join(["palabra"] * 24)))
+
+    translated = getTranslatedPhrases(cues, "en", ["es"], "us-east-1")["es"]
+
+    assert len(translated) == len(cues)
+    source_chars = [len(" ".join(cue.text().split())) + 1 for cue in cues]
+    for cue, chars in zip(translated, source_chars):
+        assert abs(len(cue.words()) - 24.0 * chars / sum(source_chars)) <= 1
+    assert sum(len(cue.words()) for cue in translated) == 24
+
+
+def test_lines_translated_one_at_a_time_when_line_breaks_are_lost(use_client):
+    lines = ["First line.", "Second line.", "Third line."]
+    client = use_client(stubTranslate(lambda line, lang: "%s:%s"%(lang, line), keep_line_breaks=False))
+
+    translations = translateLines(lines, "en", ["es"], "us-east-1")
+
+    assert translations == {"es": ["es:First line.", "es:Second line.", "es:Third line."]}
+    ##The batch, then each line on its own
+    assert client.requests == ["\n".join(lines)] + lines
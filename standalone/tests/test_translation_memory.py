@@ -0,0 +1,70 @@
+from translationMemory import translationMemory, normalize_text
+
+
+class fakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_translations_round_trip(tmp_path):
+    db_filepath = str(tmp_path / "translations.db")
+    memory = translationMemory(db_filepath)
+
+    assert memory.get_many(["Hello.", "Goodbye."], "en", "es") == {}
+
+    memory.put_many({"Hello.": "Hola.", "Goodbye.": "Adiós."}, "en", "es")
+
+    assert memory.get_many(["Hello.", "Goodbye.", "Unknown."], "en", "es") == {"Hello.": "Hola.", "Goodbye.": "Adiós."}
+    ##The database outlives the instance
+    assert translationMemory(db_filepath).get_many(["Goodbye."], "en", "es") == {"Goodbye.": "Adiós."}
+    assert memory.size() == sum(len(text.encode("utf-8")) for text in ["Hello.", "Hola.", "Goodbye.", "Adiós."])
+
+
+def test_texts_keyed_on_normalized_form(tmp_path):
+    memory = translationMemory(str(tmp_path / "translations.db"))
+    memory.put_many({"  Thank   you\nall. ": "Gracias a todos."}, "EN", "ES")
+
+    ##Whitespace and the case of the language codes don't matter, the text's own case does
+    assert normalize_text("  Thank   you\nall. ") == "Thank you all."
+    assert memory.get_many(["Thank you all.", "Thank you\tall."], "en", "es") == {"Thank you all.": "Gracias a todos.",
+                                                                                 "Thank you\tall.": "Gracias a todos."}
+    assert memory.get_many(["thank you all."], "en", "es") == {}
+
+
+def test_language_pairs_kept_apart(tmp_path):
+    memory = translationMemory(str(tmp_path / "translations.db"))
+    memory.put_many({"Welcome.": "Bienvenidos."}, "en", "es")
+    memory.put_many({"Welcome.": "Bienvenue."}, "en", "fr")
+
+    assert memory.get_many(["Welcome."], "en", "es") == {"Welcome.": "Bienvenidos."}
+    assert memory.get_many(["Welcome."], "en", "fr") == {"Welcome.": "Bienvenue."}
+    assert memory.get_many(["Welcome."], "de", "es") == {}
+
+
+def test_least_recently_used_evicted_over_max_bytes(tmp_path):
+    clock = fakeClock()
+    ##Each entry below is 4 bytes of source and 4 of translation
+    memory = translationMemory(str(tmp_path / "translations.db"), max_bytes=24, clock=clock)
+    memory.put_many({"aaaa": "AAAA"}, "en", "es")
+    clock.now += 1
+    memory.put_many({"bbbb": "BBBB"}, "en", "es")
+    clock.now += 1
+    memory.put_many({"cccc": "CCCC"}, "en", "es")
+
+    ##Using the oldest entry makes "bbbb" the least recently used
+    clock.now += 1
+    assert memory.get_many(["aaaa"], "en", "es") == {"aaaa": "AAAA"}
+
+    clock.now += 1
+    memory.put_many({"dddd": "DDDD"}, "en", "es")
+
+    assert memory.size() <= 24
+    assert memory.get_many(["aaaa", "bbbb", "cccc", "dddd"], "en", "es") == {"aaaa": "AAAA", "cccc": "CCCC", "dddd": "DDDD"}
+
+    ##Lowering the limit and evicting keeps only the most recently used
+    memory.max_bytes = 8
+    memory.evict()
+    assert memory.get_many(["aaaa", "cccc", "dddd"], "en", "es") == {"dddd": "DDDD"}
@@ -0,0 +1,86 @@
+"""Builders for small Amazon Transcribe transcripts used by the tests"""
+
+import json
+import random
+
+
+def word(content, start, end):
+    """
+    A pronunciation item, times in seconds
+    """
+    return {"type": "pronunciation", "start_time": "%.3f"%(start), "end_time": "%.3f"%(end),
+            "alternatives": [{"confidence": "1.0", "content": content}]}
+
+
+def punctuation(content):
+    """
+    A punctuation item, which has no timing
+    """
+    return {"type": "punctuation", "alternatives": [{"confidence": "0.0", "content": content}]}
+
+
+def spoken(text, start=0.0, word_duration=0.3, gap=0.05):
+    """
+    Items for a run of text spoken at a steady pace, punctuation is 
+    attached to the word before it, e.g. spoken("Hello there. Bye.")
+
+    Returns
+    -------
+        list: The items
+        float: The time the last word ends
+    """
+    items = []
+    position = start
+    for token in text.split():
+        stripped = token.rstrip(".,?!")
+        if stripped:
+            items.append(word(stripped, position, position + word_duration))
+            position += word_duration + gap
+        for mark in token[len(stripped):]:
+            items.append(punctuation(mark))
+    return items, position - gap
+
+
+def transcript_json(items, text=""):
+    """
+    The Transcribe JSON document for the items
+    """
+    return json.dumps({"jobName": "test", "results": {"transcripts": [{"transcript": text}], "items": items}, "status": "COMPLETED"})
+
+
+def edge_case_items():
+    """
+    A transcript with punctuation, long pauses, words longer than a 
+    line and a short trailing cue
+    """
+    items, end = spoken("Welcome everyone to the conference. Today we talk about subtitles, timing and segmentation!")
+    more, end = spoken("After a long pause, we continue with a question? Yes.", start=end + 2.5)
+    items += more
+    items.append(word("Pneumonoultramicroscopicsilicovolcanoconiosis-and-then-some", end + 0.1, end + 1.5))
+    items.append(word("Supercalifragilisticexpialidocious-supercalifragilistic", end + 1.6, end + 2.9))
+    items.append(punctuation(","))
+    more, end = spoken("and a run of many short words spoken very quickly without any pause at all for a long time", start=end + 3.0, word_duration=0.12, gap=0.01)
+    items += more
+    ##A trailing fragment after a long silence, shorter than the minimum duration
+    items.append(word("Bye", end + 4.0, end + 4.2))
+    items.append(punctuation("."))
+    return items
+
+
+def random_items(count, seed):
+    """
+    A random transcript of 'count' words with pauses of every length,
+    punctuation and occasional over-long words
+    """
+    rng = random.Random(seed)
+    vocabulary = ["a", "the", "subtitle", "été", "naïve", "123", "conference", "x" * 50, "segmentation"]
+    items = []
+    position = 0
+    for _ in range(count):
+        position += rng.choice((0, 10, 50, 150, 800, 1500, 4000))
+        length = rng.randrange(50, 900)
+        items.append(word(rng.choice(vocabulary), position / 1000.0, (position + length) / 1000.0))
+        position += length
+        if rng.random() < 0.15:
+            items.append(punctuation(rng.choice(".,?!")))
+    return items
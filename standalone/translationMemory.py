@@ -0,0 +1,250 @@
+#######################################################################
+##
+## Name: translationMemory.py
+## License: Apache 2.0
+## Status: Sample code
+##
+#######################################################################
+
+"""Persistent memory of earlier translations
+
+Conference talks repeat a lot: sponsor reads, introductions, the same
+speaker across several days. The translation memory keeps every
+sentence (or subtitle) that has been translated, keyed by its
+normalized text and the language pair, so translating it again is a
+local lookup and only the sentences never seen before are sent to
+Amazon Translate.
+
+This is a local stand-in backend kept in a single SQLite file. The
+srtUtils translation functions only use get_many() and put_many(), so
+any object with those two methods (e.g. one backed by a shared table)
+can be passed as their 'memory' instead.
+
+Usage
+-----
+
+```
+memory = translationMemory("translations.db")
+writeTranslationsToSRT(transcript, "en", {"es": "talk.es.srt"}, region, memory=memory)
+```
+
+Classes
+-------
+
+    * translationMemory - SQLite store of translations by source text and language pair
+
+Functions
+---------
+
+    * normalize_text - The form of a text the memory is keyed on
+
+Attributes
+----------
+DEFAULT_FILENAME (str): Name of the database file in the cache directory
+DEFAULT_MAX_BYTES (int): Default limit on the size of the text kept
+"""
+
+import os
+import time
+import sqlite3
+import unicodedata
+
+DEFAULT_FILENAME = "translations.db"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+##The most texts looked up in a single query, older SQLite builds allow 999 parameters
+QUERY_BATCH = 500
+
+
+def normalize_text(text):
+    """
+    Return the form of a text the memory is keyed on: Unicode NFC with
+    runs of whitespace collapsed to single spaces. Case and punctuation
+    are kept, as they change the translation
+
+    Args
+    ----
+    text (str): The text to normalize
+
+    Returns
+    -------
+        str: The normalized text
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class translationMemory(object):
+    """
+    Translations keyed by (source language, target language, normalized
+    source text), stored in a SQLite database. Each entry's size is the
+    UTF-8 size of its source and translated text, and once the total is
+    over 'max_bytes' the least recently used entries are evicted. A
+    connection is opened for each operation, so one instance can be
+    shared by the threads of a batch and the file by several processes.
+
+    Methods
+    -------
+    get_many(texts, source_lang, target_lang)
+        Return the translations held for the texts
+
+    put_many(translations, source_lang, target_lang)
+        Store translations of texts
+
+    size()
+        Return the total size of the entries
+
+    evict()
+        Evict the least recently used entries beyond max_bytes
+    """
+
+    def __init__(self, db_filepath, max_bytes=DEFAULT_MAX_BYTES, clock=time.time):
+        """
+        Args
+        ----
+        db_filepath (str): The SQLite database file, created if needed
+        max_bytes (int): The most text to keep in bytes, None for no
+        limit (default is DEFAULT_MAX_BYTES)
+        clock (callable): Function giving the current time in seconds
+        """
+        self.db_filepath = os.path.expandvars(os.path.expanduser(db_filepath))
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+        directory = os.path.dirname(self.db_filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS translations (source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, "
+                       "source TEXT NOT NULL, translation TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL, "
+                       "PRIMARY KEY (source_lang, target_lang, source))")
+            db.execute("CREATE INDEX IF NOT EXISTS translations_used ON translations (used)")
+
+
+    def get_many(self, texts, source_lang, target_lang):
+        """
+        Look up the translations of texts, marking those found as
+        recently used
+
+        Args
+        ----
+        texts (iterable): The source texts
+        source_lang (str): The language code of the texts (e.g. "en")
+        target_lang (str): The language code of the translations (e.g. "es")
+
+        Returns
+        -------
+            dict: The translation of each text that is in the memory,
+            keyed by the text as given
+        """
+        by_key = {}
+        for text in texts:
+            by_key.setdefault(normalize_text(text), []).append(text)
+
+        keys = [key for key in by_key if key]
+        source_lang, target_lang = source_lang.lower(), target_lang.lower()
+        found = {}
+
+        with self._connect() as db:
+            for start in range(0, len(keys), QUERY_BATCH):
+                batch = keys[start:start + QUERY_BATCH]
+                rows = db.execute("SELECT source, translation FROM translations WHERE source_lang = ? AND target_lang = ? "
+                                  "AND source IN (%s)"%(", ".join("?" * len(batch))), [source_lang, target_lang] + batch).fetchall()
+
+                for source, translation in rows:
+                    for text in by_key[source]:
+                        found[text] = translation
+
+                if rows:
+                    db.execute("UPDATE translations SET used = ? WHERE source_lang = ? AND target_lang = ? AND source IN (%s)"
+                               %(", ".join("?" * len(rows))), [self.clock(), source_lang, target_lang] + [row[0] for row in rows])
+
+        return found
+
+
+    def put_many(self, translations, source_lang, target_lang):
+        """
+        Store the translations of texts, replacing any held already,
+        then evict entries if the memory is over max_bytes
+
+        Args
+        ----
+        translations (dict): The translation of each source text
+        source_lang (str): The language code of the texts (e.g. "en")
+        target_lang (str): The language code of the translations (e.g. "es")
+        """
+        now = self.clock()
+        rows = []
+        for text, translation in translations.items():
+            key = normalize_text(text)
+            if key and translation:
+                rows.append((source_lang.lower(), target_lang.lower(), key, translation,
+                             len(key.encode("utf-8")) + len(translation.encode("utf-8")), now))
+
+        if not rows:
+            return
+
+        with self._connect() as db:
+            db.executemany("INSERT OR REPLACE INTO translations (source_lang, target_lang, source, translation, size, used) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._evict(db)
+
+
+    def size(self):
+        """
+        Return the total size in bytes of the entries
+        """
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the memory is no
+        bigger than max_bytes
+        """
+        with self._connect() as db:
+            self._evict(db)
+
+
+    def _evict(self, db):
+        if self.max_bytes is None:
+            return
+
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+
+        ##Walk the entries from the least recently used, until enough has been freed
+        doomed = []
+        for rowid, size in db.execute("SELECT rowid, size FROM translations ORDER BY used"):
+            doomed.append((rowid,))
+            excess -= size
+            if excess <= 0:
+                break
+
+        db.executemany("DELETE FROM translations WHERE rowid = ?", doomed)
+
+
+    def _connect(self):
+        ##The connection is used as a context manager, which commits (or rolls back) but doesn't close it
+        return _closingConnection(sqlite3.connect(self.db_filepath, timeout=30))
+
+
+class _closingConnection(object):
+    """
+    Use a sqlite3 connection for a single transaction and close it
+    afterwards
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection.__enter__()
+
+    def __exit__(self, *exc_info):
+        try:
+            return self.connection.__exit__(*exc_info)
+        finally:
+            self.connection.close()